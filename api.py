@@ -0,0 +1,216 @@
+"""
+Headless JSON API over the same search code as the Streamlit app (no
+Streamlit import on this path). Shares the connection pool, result cache
+and fuzzy index of src/ within its process.
+
+    python api.py [--host 127.0.0.1] [--port 8600]
+
+    GET /api/filters?year=&province=
+    GET /api/search?q=drywall&mode=contains|ranked|fuzzy&year=&month=&province=
+                    &city=&uom=&min_score=70&page_size=200&after=<next from the previous page>
+    GET /api/rate-stats?q=...&breakdown=Province|City|Invoice Year|Invoice Month
+    GET /api/stats
+"""
+import argparse
+import base64
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from src.cache import get_result_cache
+from src.config import CONFIG
+from src.db import SEARCH_MODES, filter_options, load_filter_dims, month_numbers
+from src.pool import pool_stats
+from src.search import Search
+from src.stats import DIM_OF_FILTER
+from src.trace import trace
+
+MODES = SEARCH_MODES + ("fuzzy",)
+MAX_PAGE_SIZE = 1000
+
+# Blocking SQLite / rapidfuzz work runs here, off the event loop
+EXECUTOR = ThreadPoolExecutor(max_workers=CONFIG.db_pool_size, thread_name_prefix="api")
+
+
+def encode_cursor(after) -> str:
+    return base64.urlsafe_b64encode(json.dumps(after).encode()).decode()
+
+
+def is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, mode: str):
+    """
+    `after` of a `next` cursor, checked against the shape Search.page() takes
+    in `mode`: an offset for fuzzy, (_score, _rowid) for the SQL modes.
+    Raises ValueError for anything else.
+    """
+    after = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if mode == "fuzzy":
+        if not is_int(after) or after < 0:
+            raise ValueError("fuzzy cursor must be a non-negative offset")
+        return after
+    if not (
+        isinstance(after, list) and len(after) == 2
+        and (is_int(after[0]) or isinstance(after[0], float)) and is_int(after[1])
+    ):
+        raise ValueError(f"{mode} cursor must be [score, rowid]")
+    return float(after[0]), after[1]
+
+
+def frame_records(df: pd.DataFrame):
+    """JSON-ready rows: internal columns dropped, Invoice Year as an integer."""
+    df = df.drop(columns=["_score", "_rowid"], errors="ignore")
+    if "Invoice Year" in df.columns:
+        df = df.assign(**{"Invoice Year": pd.to_numeric(df["Invoice Year"], errors="coerce").astype("Int64")})
+    return json.loads(df.to_json(orient="records"))
+
+
+class ApiHandler(tornado.web.RequestHandler):
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def write_error(self, status_code: int, **kwargs):
+        self.finish({"error": self._reason, "status": status_code})
+
+    def bad_request(self, message: str):
+        raise tornado.web.HTTPError(400, reason=message)
+
+    async def blocking(self, fn, *args):
+        # run in a copy of this context so the work's spans land in the request's trace
+        context = contextvars.copy_context()
+        return await tornado.ioloop.IOLoop.current().run_in_executor(EXECUTOR, context.run, fn, *args)
+
+    def filter_arg(self, name: str) -> str:
+        return self.get_argument(name, "(All)").strip() or "(All)"
+
+    def search_from_args(self, month_name_to_num: Dict[str, int]) -> Search:
+        query = self.get_argument("q", "").strip()
+        if not query:
+            self.bad_request("q (search text) is required")
+
+        mode = self.get_argument("mode", SEARCH_MODES[0])
+        if mode not in MODES:
+            self.bad_request(f"mode must be one of {', '.join(MODES)}")
+
+        year = self.filter_arg("year")
+        if year != "(All)" and not year.isdigit():
+            self.bad_request("year must be a number")
+        month = self.filter_arg("month")
+        if month != "(All)" and month not in month_name_to_num:
+            self.bad_request(f"unknown month {month!r}")
+
+        try:
+            min_score = int(self.get_argument("min_score", "70"))
+        except ValueError:
+            self.bad_request("min_score must be an integer")
+
+        controls = {
+            "query": query,
+            "mode": mode,
+            "min_score": min_score,
+            "year_filter": year,
+            "month_filter": month,
+            "province": self.filter_arg("province"),
+            "city": self.filter_arg("city"),
+            "uom": self.filter_arg("uom"),
+        }
+        return Search(controls, month_name_to_num)
+
+
+class FiltersHandler(ApiHandler):
+    async def get(self):
+        dims = await self.blocking(load_filter_dims, CONFIG.db_path, CONFIG.table)
+        year = self.filter_arg("year")
+        if year != "(All)" and not year.isdigit():
+            self.bad_request("year must be a number")
+        self.write(filter_options(dims, year, self.filter_arg("province")))
+
+
+class SearchHandler(ApiHandler):
+    async def get(self):
+        with trace("api.search") as run:
+            await self.search(run)
+
+    async def search(self, run):
+        dims = await self.blocking(load_filter_dims, CONFIG.db_path, CONFIG.table)
+        search = self.search_from_args(month_numbers(dims))
+        run.attrs.update(mode=search.mode, query=search.controls["query"])
+
+        try:
+            page_size = int(self.get_argument("page_size", str(CONFIG.page_size)))
+        except ValueError:
+            self.bad_request("page_size must be an integer")
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+        cursor = self.get_argument("after", "")
+        try:
+            after = decode_cursor(cursor, search.mode) if cursor else None
+        except ValueError:
+            self.bad_request("invalid after cursor")
+
+        def fetch():
+            total, facets = search.summary()
+            page_df, next_after = search.page(page_size, after)
+            return total, facets, page_df, next_after
+
+        total, facets, page_df, next_after = await self.blocking(fetch)
+        self.write({
+            "total": total,
+            "facets": facets,
+            "rows": frame_records(page_df),
+            "next": encode_cursor(next_after) if next_after is not None else None,
+        })
+
+
+class RateStatsHandler(ApiHandler):
+    async def get(self):
+        with trace("api.rate_stats"):
+            await self.rate_stats()
+
+    async def rate_stats(self):
+        dims = await self.blocking(load_filter_dims, CONFIG.db_path, CONFIG.table)
+        search = self.search_from_args(month_numbers(dims))
+        breakdown = self.get_argument("breakdown", None)
+        if breakdown is not None and breakdown not in DIM_OF_FILTER:
+            self.bad_request(f"breakdown must be one of {', '.join(DIM_OF_FILTER)}")
+
+        stats = await self.blocking(search.rate_stats, breakdown)
+        if stats is None:
+            raise tornado.web.HTTPError(404, reason="no rate statistics in this database; re-run import_excel.py")
+        self.write({"rows": frame_records(stats)})
+
+
+class StatsHandler(ApiHandler):
+    def get(self):
+        self.write({"result_cache": get_result_cache().stats(), "pools": pool_stats()})
+
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/api/filters", FiltersHandler),
+        (r"/api/search", SearchHandler),
+        (r"/api/rate-stats", RateStatsHandler),
+        (r"/api/stats", StatsHandler),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON search API for the unit rate database.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+
+    make_app().listen(args.port, address=args.host)
+    print(f"Serving {CONFIG.db_path} on http://{args.host}:{args.port}/api/")
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,78 +1,138 @@
-import streamlit as st
-from src.config import CONFIG
-from src.db import (
-    load_filter_options,
-    build_search_sql,
-    run_search,
-    build_candidate_sql,
-    fuzzy_rank_results,
-)
-from src.ui import render_header, render_controls, render_results
-from src.render import render_table
-from src.format import format_output_df
-
-def main():
-    render_header(CONFIG.page_title, CONFIG.logo_path)
-
-    years, months, provinces, cities, month_name_to_num = load_filter_options(
-        CONFIG.db_path, CONFIG.table
-    )
-
-    controls = render_controls(years, months, provinces, cities)
-
-    if not controls["query"]:
-        st.info("Enter text to search.")
-        return
-
-    if controls.get("fuzzy_on"):
-        # 1) Pull candidates using filters only
-        cand_sql, cand_params = build_candidate_sql(
-            table=CONFIG.table,
-            year_filter=controls["year_filter"],
-            month_filter=controls["month_filter"],
-            province=controls["province"],
-            city=controls["city"],
-            month_name_to_num=month_name_to_num,
-            candidate_limit=10000,  # ok for your total size
-        )
-        candidates = run_search(CONFIG.db_path, cand_sql, cand_params)
-
-        # 2) Fuzzy rank in Python
-        FUZZY_MAX_RESULTS = 500  # or 2000
-        df = fuzzy_rank_results(
-            candidates,
-            query=controls["query"],
-            limit=FUZZY_MAX_RESULTS,
-            min_score=controls["min_score"],
-        )
-        df = df.drop(columns=["_score", "Score", "_rowid"], errors="ignore")
-        st.caption("Fuzzy search is ON (typo tolerant). Results ranked by Score.")
-
-    else:
-        # Standard LIKE search
-        sql, params = build_search_sql(
-            table=CONFIG.table,
-            query=controls["query"],
-            year_filter=controls["year_filter"],
-            month_filter=controls["month_filter"],
-            province=controls["province"],
-            city=controls["city"],
-            month_name_to_num=month_name_to_num,
-        )
-        df = run_search(CONFIG.db_path, sql, params)
-        df = df.drop(columns=["_score", "Score", "_rowid"], errors="ignore")
-
-    df = format_output_df(df)
-    
-    # ✅ Safety guard (prevents huge renders / memory spikes)
-    MAX_RENDER_ROWS = 5000
-    if len(df) > MAX_RENDER_ROWS:
-        st.warning(
-            f"Too many results. ({len(df)} rows). Showing first {MAX_RENDER_ROWS} rows. Please refine your search.")
-        df = df.head(MAX_RENDER_ROWS)
-
-    df = render_results(df)
-    render_table(df, max_height_px=CONFIG.max_table_height_px)
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import streamlit as st
+from src.cache import get_result_cache
+from src.config import CONFIG
+from src.db import load_filter_dims, month_numbers
+from src.fuzzy import fuzzy_index_loaded, get_fuzzy_index
+from src.pool import db_version, pool_stats
+from src.search import INTERNAL_COLUMNS, Search, is_refinement
+from src.trace import in_trace, span, trace
+from src.ui import (
+    render_header,
+    render_controls,
+    render_facets,
+    render_pager,
+    render_rate_stats,
+    render_rate_stats_controls,
+    render_results,
+    render_perf_panel,
+    render_stats_panel,
+)
+from src.render import render_table
+from src.format import format_output_df
+
+def _session_id() -> str:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else ""
+
+
+def _match_scope(controls: Dict) -> Tuple:
+    """Everything but the query text that decides the matches (and the DB they come from)."""
+    filters = tuple(controls[k] for k in ("mode", "year_filter", "month_filter", "province", "city", "uom"))
+    return filters + (db_version(CONFIG.db_path),)
+
+
+def _previous_matches(controls: Dict, month_name_to_num: Dict[str, int]) -> Optional[np.ndarray]:
+    """
+    The last search's matched rowids when this query refines it (see
+    is_refinement), only fetched then.
+    """
+    last = st.session_state.get("last_search")
+    if last is None or last["scope"] != _match_scope(controls):
+        return None
+    if not is_refinement(controls["mode"], last["controls"]["query"], controls["query"]):
+        return None
+    previous = Search(last["controls"], month_name_to_num, within_rowids=last["within"])
+    with span("app.previous_matches"):
+        return previous.matched_rowids(last["total"], CONFIG.incremental_max_rows)
+
+
+def _remember_search(controls: Dict, search: Search, total: int):
+    st.session_state["last_search"] = {
+        "scope": _match_scope(controls),
+        "controls": controls,
+        "within": search.within_rowids,
+        "total": total,
+    }
+
+
+def main():
+    # One trace per script run: stage timings for the perf panel and AppConfig.trace_log_path
+    with trace("app.run", session=_session_id()) as run:
+        search_page(run)
+        if CONFIG.perf_panel or st.query_params.get("perf") == "1":
+            render_perf_panel(run)
+
+
+def search_page(run):
+    with span("app.header"):
+        render_header(CONFIG.page_title, CONFIG.logo_path)
+
+    dims = load_filter_dims(CONFIG.db_path, CONFIG.table)
+    month_name_to_num = month_numbers(dims)
+
+    with span("app.controls"):
+        controls = render_controls(dims)
+
+    if not controls["query"]:
+        st.info("Enter text to search.")
+        return
+
+    # Identical searches (any session, or the API) are served from the shared result cache;
+    # a query refining the previous one only searches the previous matches
+    within = _previous_matches(controls, month_name_to_num) if CONFIG.incremental_max_rows else None
+    search = Search(controls, month_name_to_num, within_rowids=within)
+    page_size = CONFIG.page_size
+    run.attrs.update(
+        mode=search.mode,
+        query=controls["query"],
+        filters={k: controls[k] for k in ("year_filter", "month_filter", "province", "city", "uom")},
+        refined=within is not None,
+    )
+
+    if search.mode == "fuzzy":
+        if not fuzzy_index_loaded(CONFIG.db_path, CONFIG.table):
+            with st.spinner("Building fuzzy index..."):
+                get_fuzzy_index(CONFIG.db_path, CONFIG.table)
+        st.caption("Fuzzy search is ON (typo tolerant). Results ranked by Score.")
+
+    # Count + facets in one pass, then read only the requested page (keyset on _score, _rowid)
+    total, facets = search.summary()
+    run.attrs["total"] = total
+    if CONFIG.incremental_max_rows:
+        _remember_search(controls, search, total)
+
+    page = render_pager(total, page_size, search.key)
+    cursors = st.session_state["page_cursors"]
+    if page not in cursors:
+        page = 0
+    page_df, cursors[page + 1] = search.page(page_size, cursors[page])
+
+    with span("app.format_output_df"):
+        page_df = page_df.drop(columns=INTERNAL_COLUMNS, errors="ignore")
+        page_df = format_output_df(page_df)
+
+    # The export runs when the download is requested, outside this run: its own trace
+    export = in_trace("app.export", search.exporter(), mode=search.mode, query=controls["query"])
+    with span("app.render_results"):
+        page_df = render_results(page_df, total, offset=page * page_size, export=export)
+    with span("app.render_facets"):
+        render_facets(facets, controls)
+    with span("app.render_table"):
+        render_table(page_df, max_height_px=CONFIG.max_table_height_px)
+
+    show_stats, breakdown = render_rate_stats_controls()
+    if show_stats:
+        stats = search.rate_stats(breakdown)
+        with span("app.render_rate_stats"):
+            render_rate_stats(stats)
+
+    render_stats_panel("Result cache", get_result_cache().stats())
+    render_stats_panel("Connection pool", pool_stats())
+
+if __name__ == "__main__":
+    main()
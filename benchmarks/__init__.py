@@ -0,0 +1 @@
+# makes benchmarks a package
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Benchmark the HTML table renderer against the previous implementation
+(copy + astype(str).map(html.escape) per cell, then DataFrame.to_html).
+
+    python -m benchmarks.bench_render [--rows 5000] [--repeat 5]
+"""
+import argparse
+import html
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.render import table_html
+
+
+def legacy_table_html(df: pd.DataFrame) -> str:
+    safe_df = df.copy()
+    for col in safe_df.columns:
+        safe_df[col] = safe_df[col].astype(str).map(html.escape)
+    return safe_df.to_html(index=False, escape=False, classes="custom-table")
+
+
+def sample_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A result page shaped like the app's (S. No. + 12 result columns)."""
+    rng = np.random.default_rng(seed)
+    words = ["drywall", "repair", "ceiling", "paint", "demolition", "labour", "air",
+             "scrubber", "fan", "removal", "install", "carpet", "baseboard", "<b>", "&", '"2x4"']
+    descriptions = [" ".join(rng.choice(words, size=8)) for _ in range(rows)]
+    rate = rng.gamma(2.0, 50.0, rows).round(2)
+    rate[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        "S. No.": np.arange(1, rows + 1),
+        "Invoice Year": rng.choice(["2023", "2024", "2025", ""], rows),
+        "Invoice Month": rng.choice(["January", "June", "October", None], rows),
+        "Province": rng.choice(["Ontario", "Alberta", "Manitoba"], rows),
+        "City": rng.choice(["Ottawa", "Toronto", "Edmonton", "Winnipeg"], rows),
+        "Item Description": descriptions,
+        "Qty": rng.integers(1, 100, rows).astype(float),
+        "UOM": rng.choice(["EA", "HR", "DA", "SF", "LF"], rows),
+        "Unit Rate": rate,
+        "Subtotal": (rate * 3).round(2),
+        "GNC File": rng.integers(1000, 3000, rows),
+        "File Name": rng.choice([f"File {i} & Co." for i in range(200)], rows),
+    })
+
+
+def cell_texts(table: str):
+    return re.findall(r"<td>(.*?)</td>", table, flags=re.S)
+
+
+def best_of(fn, df: pd.DataFrame, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = sample_frame(rows)
+        old, new = legacy_table_html(df), table_html(df)
+        assert cell_texts(old) == cell_texts(new), "renderers disagree on cell contents"
+
+        t_old = best_of(legacy_table_html, df, args.repeat)
+        t_new = best_of(table_html, df, args.repeat)
+        print(
+            f"{rows:>6} rows: legacy {t_old * 1000:8.1f} ms {len(old) / 1e6:6.2f} MB | "
+            f"new {t_new * 1000:8.1f} ms {len(new) / 1e6:6.2f} MB | {t_old / t_new:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
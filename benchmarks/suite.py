@@ -0,0 +1,326 @@
+"""
+Benchmark suite over synthetic data (benchmarks.synthetic) at several sizes:
+import_excel.py's import, the search SQL builders + run_search, the
+columnar backend, the fuzzy path, format_output_df and the table renderer. Writes a JSON report that
+--compare checks against an earlier one.
+
+    python -m benchmarks.suite [--sizes 10k 100k 1m 10m] [--out report.json]
+                               [--compare baseline.json] [--threshold 1.25]
+
+Workbooks and databases are kept in --work-dir and reused across runs
+(--skip-import reuses the database too, leaving the import out of the report).
+Sizes above EXCEL_MAX_ROWS are bulk loaded from generated frames instead of
+a workbook ("import.frames" rather than "import.workbook"). --schema
+normalized imports with import_excel.py's dictionary-encoded schema (its
+databases are kept apart), so a report compares against a wide baseline.
+"""
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import rapidfuzz
+
+import import_excel
+from benchmarks.synthetic import (
+    EXCEL_MAX_ROWS,
+    merged_chunks,
+    parse_size,
+    size_label,
+    write_workbook,
+)
+from src.columnar import ColumnarIndex, get_columnar_index, match_score
+from src.config import CONFIG
+from src.db import (
+    build_fts_search_sql,
+    build_search_sql,
+    build_substring_search_sql,
+    is_normalized,
+    load_filter_dims,
+    month_numbers,
+    paginate_sql,
+    run_facets,
+    run_search,
+)
+from src.format import format_output_df
+from src.fuzzy import FuzzyIndex, fuzzy_search
+from src.render import table_html
+from src.search import FUZZY_MAX_RESULTS
+
+REPORT_FORMAT = 1
+
+SEARCH_BUILDERS = {
+    "like": build_search_sql,
+    "ranked": build_fts_search_sql,
+    "contains": build_substring_search_sql,
+}
+# Words of benchmarks.synthetic's vocabulary: common, multi-word and rare
+SEARCH_QUERIES = ["drywall", "remove baseboard", "air scrubber basement", "crown moulding", "flood"]
+FUZZY_QUERIES = ["drywal repiar", "demoltion cabinets", "air scruber", "remove basebord in kitchen"]
+FILTER_SETS = ("none", "province", "province+year")
+
+
+def timed(fn: Callable, repeat: int) -> Dict:
+    """min / median wall time of `repeat` calls (min is the number to compare)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "rapidfuzz": rapidfuzz.__version__,
+    }
+
+
+# ---------------- Benchmarks ----------------
+
+def bench_import(rows: int, work_dir: str, db_path: str, seed: int, mode: str, schema: str = "wide") -> List[Dict]:
+    """One import (it is the slow part of a run); the total plus import_excel's phases."""
+    timer = import_excel.PhaseTimer()
+    if rows <= EXCEL_MAX_ROWS:
+        excel_path = os.path.join(work_dir, f"synthetic-{size_label(rows)}.xlsx")
+        if not os.path.exists(excel_path):
+            print(f"  generating {excel_path}")
+            write_workbook(excel_path, rows, seed)
+        name = "import.workbook"
+        if mode == "stream":
+            frames = import_excel.iter_workbook_chunks(excel_path)
+        else:
+            frames = iter([import_excel.read_workbook(excel_path)])
+    else:
+        name = "import.frames"
+        frames = merged_chunks(rows, seed)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import_excel.bulk_load(db_path, frames, timer, schema=schema)
+    total = time.perf_counter() - start
+
+    results = [{"name": name, "seconds": total, "median": total, "repeat": 1, "mode": mode}]
+    results += [
+        {"name": f"import.phase.{phase}", "seconds": secs, "median": secs, "repeat": 1}
+        for phase, secs in timer.phases.items()
+    ]
+    return results
+
+
+def _filters(db_path: str, table: str):
+    """Filter values per FILTER_SETS (the most common province and its most common year)."""
+    dims = load_filter_dims(db_path, table)
+    month_name_to_num = month_numbers(dims)
+    by_province = dims.dropna(subset=["province"]).groupby("province")["n"].sum()
+    province = by_province.idxmax()
+    years = dims[dims["province"] == province].dropna(subset=["year"]).groupby("year")["n"].sum()
+    year = str(int(years.idxmax()))
+    filters = {
+        "none": ("(All)", "(All)", "(All)", "(All)"),
+        "province": ("(All)", "(All)", province, "(All)"),
+        "province+year": (year, "(All)", province, "(All)"),
+    }
+    return filters, month_name_to_num
+
+
+def bench_search(db_path: str, table: str, repeat: int) -> List[Dict]:
+    """First result page and total + facets per search builder x filter set, summed over SEARCH_QUERIES."""
+    filters, month_name_to_num = _filters(db_path, table)
+    normalized = is_normalized(db_path, table)
+    results = []
+    for mode, build in SEARCH_BUILDERS.items():
+        for filter_set in FILTER_SETS:
+            queries = [
+                build(table, q, *filters[filter_set], month_name_to_num, normalized=normalized)
+                for q in SEARCH_QUERIES
+            ]
+
+            def first_pages():
+                for sql, params in queries:
+                    run_search(db_path, *paginate_sql(sql, params, CONFIG.page_size))
+
+            def facets():
+                for sql, params in queries:
+                    run_facets(db_path, sql, params)
+
+            matches = sum(run_facets(db_path, sql, params)[0] for sql, params in queries)
+            results.append({"name": f"search.{mode}.page[{filter_set}]", **timed(first_pages, repeat),
+                            "queries": len(queries), "matches": matches})
+            results.append({"name": f"search.{mode}.facets[{filter_set}]", **timed(facets, repeat),
+                            "queries": len(queries), "matches": matches})
+    return results
+
+
+def bench_columnar(db_path: str, table: str, repeat: int) -> List[Dict]:
+    """
+    The in-memory columnar backend: building its arrays, then first page and
+    facets per filter set (each including the match), like bench_search.
+    """
+    filters, month_name_to_num = _filters(db_path, table)
+    results = [{"name": "columnar.index_build", **timed(lambda: ColumnarIndex.load(db_path, table), 1)}]
+
+    index = get_columnar_index(db_path, table)
+    for filter_set in FILTER_SETS:
+        def first_pages():
+            for q in SEARCH_QUERIES:
+                positions = index.match("ranked", q, *filters[filter_set], month_name_to_num)
+                index.page(positions, match_score(q), CONFIG.page_size)
+
+        def facets():
+            for q in SEARCH_QUERIES:
+                index.facets(index.match("ranked", q, *filters[filter_set], month_name_to_num))
+
+        matches = sum(len(index.match("ranked", q, *filters[filter_set], month_name_to_num)) for q in SEARCH_QUERIES)
+        results.append({"name": f"search.columnar.page[{filter_set}]", **timed(first_pages, repeat),
+                        "queries": len(SEARCH_QUERIES), "matches": matches})
+        results.append({"name": f"search.columnar.facets[{filter_set}]", **timed(facets, repeat),
+                        "queries": len(SEARCH_QUERIES), "matches": matches})
+    return results
+
+
+def bench_fuzzy(db_path: str, table: str, repeat: int) -> List[Dict]:
+    """Building the in-memory fuzzy index, then top-k queries against the warm index."""
+    filters, month_name_to_num = _filters(db_path, table)
+    results = [{"name": "fuzzy.index_build", **timed(lambda: FuzzyIndex.load(db_path, table), 1)}]
+
+    fuzzy_search(db_path, table, FUZZY_QUERIES[0], *filters["none"], month_name_to_num)  # warm the index
+    for filter_set in ("none", "province"):
+        def queries():
+            for q in FUZZY_QUERIES:
+                fuzzy_search(
+                    db_path, table, q, *filters[filter_set], month_name_to_num,
+                    limit=FUZZY_MAX_RESULTS,
+                    parallel_threshold=CONFIG.fuzzy_parallel_threshold,
+                    chunk_size=CONFIG.fuzzy_chunk_size,
+                    workers=CONFIG.fuzzy_workers,
+                )
+        results.append({"name": f"fuzzy.query[{filter_set}]", **timed(queries, repeat),
+                        "queries": len(FUZZY_QUERIES)})
+    return results
+
+
+def bench_render(db_path: str, table: str, repeat: int) -> List[Dict]:
+    """format_output_df and the HTML table of one result page and of 5000 rows."""
+    filters, month_name_to_num = _filters(db_path, table)
+    sql, params = build_search_sql(table, "", *filters["none"], month_name_to_num)
+    results = []
+    for label, rows in (("page", CONFIG.page_size), ("5k", 5000)):
+        df = run_search(db_path, *paginate_sql(sql, params, rows))
+        df = df.drop(columns=["_score", "_rowid"])
+        df.insert(0, "S. No.", range(1, len(df) + 1))
+        formatted = format_output_df(df)
+        results.append({"name": f"format_output_df[{label}]", **timed(lambda: format_output_df(df), repeat),
+                        "frame_rows": len(df)})
+        results.append({"name": f"render_table[{label}]", **timed(lambda: table_html(formatted), repeat),
+                        "frame_rows": len(df)})
+    return results
+
+
+# ---------------- Report ----------------
+
+def run_size(rows: int, args) -> List[Dict]:
+    label = size_label(rows)
+    suffix = "" if args.schema == "wide" else f"-{args.schema}"
+    db_path = os.path.join(args.work_dir, f"synthetic-{label}{suffix}.db")
+    table = import_excel.TABLE_NAME
+
+    results = []
+    if not (args.skip_import and os.path.exists(db_path)):
+        print(f"[{label}] import")
+        results += bench_import(rows, args.work_dir, db_path, args.seed, args.import_mode, args.schema)
+    benches = (("search", bench_search), ("columnar", bench_columnar), ("fuzzy", bench_fuzzy), ("render", bench_render))
+    for name, bench in benches:
+        print(f"[{label}] {name}")
+        results += bench(db_path, table, args.repeat)
+
+    for r in results:
+        r["size"] = label
+        r["rows"] = rows
+        r["schema"] = args.schema
+        print(f"  {r['name']:<40} {r['seconds'] * 1000:12.1f} ms")
+    return results
+
+
+def compare(report: Dict, baseline: Dict, threshold: float, min_delta: float) -> List[str]:
+    """
+    Benchmarks slower than `threshold` x the baseline's time (same size and
+    name) by more than `min_delta` seconds (sub-millisecond timings are noise).
+    """
+    before = {(r["size"], r["name"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    print(f"\nvs {baseline['environment'].get('commit') or 'baseline'} ({baseline['environment'].get('created')}):")
+    for r in report["results"]:
+        old = before.get((r["size"], r["name"]))
+        if not old:
+            continue
+        ratio = r["seconds"] / old
+        flag = ""
+        if ratio > threshold and r["seconds"] - old > min_delta:
+            flag = "  REGRESSION"
+            regressions.append(f"{r['size']} {r['name']}")
+        print(f"  {r['size']:>5} {r['name']:<40} {old * 1000:10.1f} -> {r['seconds'] * 1000:10.1f} ms  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import, search, fuzzy and render on synthetic data.")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"], help="rows per dataset, e.g. 10k 100k 1m 10m")
+    parser.add_argument("--work-dir", default=".bench", help="where workbooks and databases are kept")
+    parser.add_argument("--out", default="", help="JSON report path (default: <work-dir>/report-<time>.json)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--import-mode", choices=["stream", "pandas"], default="stream")
+    parser.add_argument("--schema", choices=["wide", "normalized"], default="wide", help="import_excel.py --schema")
+    parser.add_argument("--skip-import", action="store_true", help="reuse databases from an earlier run")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    report = {"format": REPORT_FORMAT, "environment": environment(), "results": []}
+    for size in args.sizes:
+        report["results"] += run_size(parse_size(size), args)
+
+    out = args.out or os.path.join(args.work_dir, f"report-{dt.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nWrote {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold}x: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+Synthetic master workbooks / databases for benchmarking, shaped like the
+real one: "Compiled Data" (title row, then the same header) and
+"File Details", with repeated descriptions (Zipf-like popularity, typo and
+case variants), per-description UOM and rate levels, files spread over
+provinces/cities and 2021-2025 invoice dates.
+
+    python -m benchmarks.synthetic --rows 100k [--out .bench] [--seed 0]
+
+Sizes above EXCEL_MAX_ROWS don't fit in a worksheet; for those only the
+cleaned frames are generated (merged_chunks), to be bulk loaded directly.
+"""
+import argparse
+import datetime as dt
+import os
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from import_excel import COMPILED_SHEET, DETAILS_SHEET, clean_merged, header_names
+
+# Data rows a worksheet holds below the title and header rows
+EXCEL_MAX_ROWS = 1_048_576 - 2
+
+CHUNK_ROWS = 100_000
+
+# Header cells of the real workbook (None = unnamed column; the empty
+# trailing ones are left out, a saved sheet doesn't keep them either)
+COMPILED_HEADER = (
+    "S. No.", "GNC File", "File Name", "Type", "Category 1", "Category 2", "Category 3", "Room ",
+    "Invoice No.", "Invoice Date", "Company", "Employee Name", "Mileage\n(km)", "Item Description",
+    "Assigned date", "Returned date", "Days on site", "Days Charging", "Regular Hrs ", "O T Hours",
+    "D/OT", "Qty", "No. of trucks", "Truck unit Rate", "LOA", "Truck Fee", "UOM", "Reset", "Remove",
+    "Replace", "Unit Rate", "XA Rates", "OT Rate", "Phoenix Restoration Subtotal", "Less Per Scott",
+    "Subtotal", "Consumables Fee", "Contactor fess", "O&P", "PST", "GST", "HST", "Total Amount",
+    "GNC Qty.", "GNC Reg Hr", "GNC OT Hr", "GNC OT Rate", "GNC Unit Rate", "GNC Group Recommendation",
+    None, "Variance", "GNC Comments", "Comment ",
+)
+DETAILS_HEADER = (
+    "S. No. ", "GNC File", "File Name", "Province", "City", "File Type", "Status", "Comments",
+    "Sheet Name", None,
+)
+
+# province -> (share of files, cities)
+PLACES = {
+    "British Columbia": (0.35, ["Vancouver", "Port Coquitlam", "Richmond", "Terrace", "Kelowna", "Surrey"]),
+    "Alberta": (0.26, ["Edmonton", "Calgary", "Grande Prairie", "Red Deer", "Lethbridge"]),
+    "Ontario": (0.22, ["Ottawa", "Napanee", "Scarborough", "Toronto", "Orangeville", "Kingston"]),
+    "Saskatchewan": (0.12, ["Regina", "Saskatoon", "Moose Jaw"]),
+    "Manitoba": (0.04, ["Winnipeg", "Brandon"]),
+    "Northwest Territories": (0.01, ["Yellowknife"]),
+}
+
+ACTIONS = [
+    "Remove", "Remove and dispose", "Install", "Replace", "Supply and install", "Clean", "Disinfect",
+    "Dry", "Demolition of", "Cut out", "HEPA vacuum", "Patch", "Paint", "Tape and mud", "Move out",
+    "Move back", "Set up", "Monitor", "Detach and reset", "Seal",
+]
+# object -> UOM
+OBJECTS = {
+    "drywall": "SF", "wet drywall": "SF", "ceiling drywall": "SF", "insulation": "SF", "carpet": "SF",
+    "carpet pad": "SF", "underlay": "SF", "vinyl flooring": "SF", "laminate flooring": "SF",
+    "hardwood floor": "SF", "subfloor": "SF", "ceiling tiles": "SF", "wallpaper": "SF",
+    "tile backsplash": "SF", "poly sheeting": "SF", "baseboard": "LF", "door casing": "LF",
+    "trim": "LF", "crown moulding": "LF", "kitchen cabinets": "EA", "vanity": "EA", "toilet": "EA",
+    "interior door": "EA", "light fixture": "EA", "air scrubber": "DA", "dehumidifier": "DA",
+    "air mover": "DA", "containment": "HR", "contents": "HR", "mould affected materials": "HR",
+    "debris": "ROLL", "studs": "LF",
+}
+PLACES_IN = [
+    "in basement", "in kitchen", "in bathroom", "in living room", "in bedroom", "in hallway",
+    "in storage", "in office", "in warehouse", "in all areas", "", "", "",
+]
+EXTRAS = [
+    "", "", "", "", "up to 2ft", "4ft flood cut", "per room", "(hourly charge)",
+    "- after business hours", "- during business hours", "including disposal", "2 coats",
+    '1/2"', '5/8" type X', "& haul away",
+]
+# UOM -> typical unit rate
+RATE_LEVEL = {"SF": 3.5, "LF": 4.5, "EA": 160.0, "HR": 70.0, "DA": 60.0, "ROLL": 40.0, None: 95.0}
+ROOMS = ["Basement", "Kitchen", "Bathroom", "Living Room", "All areas", "Bedroom 1", "Hallway", None]
+TYPES = ["Emergency", "Repair", "Contents", "Mitigation"]
+CATEGORIES = ["Cleaning works", "Equipment", "Demolition", "Drywall", "Flooring", "Painting", "Labour"]
+BUSINESSES = [
+    "Restaurant", "Pharmacy", "Resort Ltd", "Construction", "Holdings Inc", "Properties", "Apartments",
+    "Dental Clinic", "School", "Church", "Condominium Corp", "Storage Ltd",
+]
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10_000, '1m' -> 1_000_000, '2500' -> 2500."""
+    text = text.strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def size_label(rows: int) -> str:
+    for scale, suffix in ((1_000_000, "m"), (1_000, "k")):
+        if rows >= scale and rows % scale == 0:
+            return f"{rows // scale}{suffix}"
+    return str(rows)
+
+
+def _typo(text: str, rng: np.random.Generator) -> str:
+    """One dropped, doubled or swapped letter."""
+    if len(text) < 4:
+        return text
+    i = int(rng.integers(1, len(text) - 2))
+    kind = rng.integers(3)
+    if kind == 0:
+        return text[:i] + text[i + 1:]
+    if kind == 1:
+        return text[:i] + text[i] + text[i:]
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def description_pool(rows: int, seed: int) -> pd.DataFrame:
+    """
+    Distinct descriptions (about rows ** 0.75 of them) with UOM, rate level
+    and a popularity weight, most popular first.
+    """
+    rng = np.random.default_rng([seed, 1])
+    size = max(300, int(rows ** 0.75))
+    objects = list(OBJECTS)
+
+    texts, uoms, rates = [], [], []
+    for _ in range(size):
+        obj = objects[rng.integers(len(objects))]
+        uom = OBJECTS[obj] if rng.random() > 0.12 else None
+        if texts and rng.random() < 0.15:
+            # variant of an earlier description: typo or different case
+            j = int(rng.integers(len(texts)))
+            text = _typo(texts[j], rng) if rng.random() < 0.6 else texts[j].upper()
+            uom, rate = uoms[j], rates[j]
+        else:
+            parts = [ACTIONS[rng.integers(len(ACTIONS))], obj,
+                     PLACES_IN[rng.integers(len(PLACES_IN))], EXTRAS[rng.integers(len(EXTRAS))]]
+            text = " ".join(p for p in parts if p)
+            rate = RATE_LEVEL[uom] * float(rng.lognormal(0.0, 0.5))
+        texts.append(text)
+        uoms.append(uom)
+        rates.append(rate)
+
+    weights = 1.0 / np.arange(1, size + 1) ** 1.1
+    return pd.DataFrame({"text": texts, "uom": uoms, "rate": rates, "weight": weights / weights.sum()})
+
+
+def file_details(rows: int, seed: int) -> pd.DataFrame:
+    """One "File Details" row per file (about one file per 60 rows)."""
+    rng = np.random.default_rng([seed, 2])
+    files = max(20, rows // 60)
+    provinces = list(PLACES)
+    shares = np.array([PLACES[p][0] for p in provinces])
+    province = rng.choice(len(provinces), files, p=shares / shares.sum())
+
+    records = []
+    for i in range(files):
+        prov = provinces[province[i]]
+        cities = PLACES[prov][1]
+        city = cities[min(int(rng.geometric(0.45)) - 1, len(cities) - 1)]
+        name = f"{rng.integers(100_000, 99_999_999)} {prov} {BUSINESSES[rng.integers(len(BUSINESSES))]}"
+        records.append((i + 1, 1000 + i, name, prov, city, None, "Done", None, "Active Files List", None))
+    return pd.DataFrame.from_records(records, columns=header_names(DETAILS_HEADER))
+
+
+def compiled_chunks(rows: int, seed: int, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    "Compiled Data" rows as the sheet holds them (before clean_merged),
+    `chunk_rows` at a time. Each file's rows are contiguous, like the real sheet.
+    """
+    pool = description_pool(rows, seed)
+    details = file_details(rows, seed)
+    files = len(details)
+    names = header_names(COMPILED_HEADER)
+
+    rng = np.random.default_rng([seed, 3])
+    # Invoice dates cluster per file, later years more common
+    years = rng.choice([2021, 2022, 2023, 2024, 2025], files, p=[0.02, 0.04, 0.08, 0.3, 0.56])
+    file_start = pd.to_datetime(
+        [dt.date(int(y), 1, 1) for y in years]) + pd.to_timedelta(rng.integers(0, 300, files), unit="D")
+    # ~3% of rows point at GNC files missing from File Details (no Province/City)
+    gnc = details["GNC File"].to_numpy().copy()
+    gnc[rng.random(files) < 0.03] += 100_000
+    file_names = details["File Name"].to_numpy()
+
+    for index, start in enumerate(range(0, rows, chunk_rows)):
+        n = min(chunk_rows, rows - start)
+        rng = np.random.default_rng([seed, 4, index])
+        row = np.arange(start, start + n)
+        file = row * files // rows
+
+        desc = rng.choice(len(pool), n, p=pool["weight"].to_numpy())
+        uom = pool["uom"].to_numpy()[desc]
+        rate = np.round(pool["rate"].to_numpy()[desc] * rng.lognormal(0.0, 0.15, n), 2)
+        rate[rng.random(n) < 0.05] = np.nan
+        area = np.isin(uom, ["SF", "LF"])
+        qty = np.where(area, rng.integers(10, 600, n), rng.integers(1, 12, n))
+
+        dates = (file_start[file] + pd.to_timedelta(rng.integers(0, 45, n), unit="D")
+                 + pd.to_timedelta(rng.integers(0, 86_400, n), unit="s"))
+        dates = pd.Series(dates).where(rng.random(n) >= 0.02)
+
+        chunk = pd.DataFrame({name: None for name in names}, index=range(n))
+        chunk["S. No."] = row + 1
+        chunk["GNC File"] = gnc[file]
+        chunk["File Name"] = file_names[file]
+        chunk["Type"] = np.array(TYPES)[rng.integers(len(TYPES), size=n)]
+        chunk["Category 2"] = np.array(CATEGORIES)[rng.integers(len(CATEGORIES), size=n)]
+        chunk["Room"] = np.array(ROOMS, dtype=object)[rng.integers(len(ROOMS), size=n)]
+        chunk["Invoice No."] = [f"{g}_{k}" for g, k in zip(gnc[file], row // 40 % 4 + 1)]
+        chunk["Invoice Date"] = dates.to_numpy()
+        chunk["Item Description"] = pool["text"].to_numpy()[desc]
+        chunk["Qty"] = qty
+        chunk["UOM"] = uom
+        chunk["Unit Rate"] = rate
+        chunk["Subtotal"] = np.round(qty * rate, 2)
+        chunk["GST"] = np.round(qty * rate * 0.05, 4)
+        chunk["Total Amount"] = np.round(qty * rate * 1.05, 4)
+        yield chunk
+
+
+def details_lookup(details: pd.DataFrame) -> Dict:
+    """File Details as {GNC File: (Province, City)}, like import_excel.load_details_lookup."""
+    return {g: (p, c) for g, p, c in details[["GNC File", "Province", "City"]].itertuples(index=False)}
+
+
+def merged_chunks(rows: int, seed: int, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """The cleaned, merged frames the importer would produce from the workbook (for bulk_load)."""
+    lookup = details_lookup(file_details(rows, seed))
+    for chunk in compiled_chunks(rows, seed, chunk_rows):
+        places = [lookup.get(g, (None, None)) for g in chunk["GNC File"]]
+        chunk["Province"] = [p for p, _ in places]
+        chunk["City"] = [c for _, c in places]
+        yield clean_merged(chunk)
+
+
+def _sheet_rows(frame: pd.DataFrame) -> Iterator[Tuple]:
+    frame = frame.astype(object).where(frame.notna(), None)
+    for values in frame.itertuples(index=False, name=None):
+        yield tuple(v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in values)
+
+
+def write_workbook(path: str, rows: int, seed: int = 0) -> str:
+    """Synthetic master workbook with `rows` Compiled Data rows (at most EXCEL_MAX_ROWS)."""
+    from openpyxl import Workbook
+
+    if rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"{rows:,} rows don't fit in one worksheet (max {EXCEL_MAX_ROWS:,})")
+
+    wb = Workbook(write_only=True)
+    details = wb.create_sheet(DETAILS_SHEET)
+    details.append(list(DETAILS_HEADER))
+    for values in _sheet_rows(file_details(rows, seed)):
+        details.append(list(values))
+
+    compiled = wb.create_sheet(COMPILED_SHEET)
+    compiled.append(["Synthetic data"] + [None] * (len(COMPILED_HEADER) - 1))  # title row above the header
+    compiled.append(list(COMPILED_HEADER))
+    for chunk in compiled_chunks(rows, seed):
+        for values in _sheet_rows(chunk):
+            compiled.append(list(values))
+
+    tmp_path = f"{path}.building"
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic master workbook for benchmarks.")
+    parser.add_argument("--rows", default="10k", help="Compiled Data rows, e.g. 10k, 100k, 1m")
+    parser.add_argument("--out", default=".bench", help="output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = parse_size(args.rows)
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"synthetic-{size_label(rows)}.xlsx")
+    write_workbook(path, rows, args.seed)
+    print(f"Wrote {path} ({rows:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
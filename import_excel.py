@@ -1,87 +1,897 @@
-import pandas as pd
-import sqlite3
-
-EXCEL_PATH = "master.xlsx"
-DB_PATH = "data.db"
-TABLE_NAME = "records"
-
-# --- Read both sheets ---
-compiled = pd.read_excel(EXCEL_PATH, sheet_name="Compiled Data", header=1)
-details  = pd.read_excel(EXCEL_PATH, sheet_name="File Details", header=0)
-
-# --- Clean column names (strip spaces, keep exact names) ---
-compiled.columns = [str(c).strip() for c in compiled.columns]
-details.columns  = [str(c).strip() for c in details.columns]
-
-# --- Validate required columns ---
-required_compiled = {"GNC File", "Item Description"}
-required_details  = {"GNC File", "Province", "City"}
-
-missing_c = required_compiled - set(compiled.columns)
-missing_d = required_details - set(details.columns)
-
-if missing_c:
-    raise ValueError(f"Compiled Data missing columns: {missing_c}")
-if missing_d:
-    raise ValueError(f"File Details missing columns: {missing_d}")
-
-# --- Reduce details to needed columns + dedupe on GNC File (important) ---
-details_small = (
-    details[["GNC File", "Province", "City"]]
-    .copy()
-    .drop_duplicates(subset=["GNC File"], keep="first")
-)
-
-
-# --- Merge Province/City into compiled using GNC File ---
-merged = compiled.merge(details_small, on="GNC File", how="left")
-
-# Normalize column names hard (removes leading/trailing + multiple spaces)
-merged.columns = [" ".join(str(c).split()) for c in merged.columns]
-
-# --- Clean Invoice Date (date only) ---
-if "Invoice Date" in merged.columns:
-    merged["Invoice Date"] = pd.to_datetime(
-        merged["Invoice Date"], errors="coerce"
-    )
-
-    # Extract Year and Month
-    merged["Invoice Year"] = merged["Invoice Date"].dt.year
-    merged["Invoice Month"] = merged["Invoice Date"].dt.month
-    merged["Invoice Month Name"] = merged["Invoice Date"].dt.strftime("%B")
-
-    # Store Invoice Date as ISO date string (no time)
-    merged["Invoice Date"] = merged["Invoice Date"].dt.date.astype("string")
-
-# Optional: move Province/City near the front
-front_cols = [c for c in ["GNC File", "Province", "City"] if c in merged.columns]
-other_cols = [c for c in merged.columns if c not in front_cols]
-merged = merged[front_cols + other_cols]
-
-for col in ["Subtotal", "Unit Rate"]:
-    if col in merged.columns:
-        merged[col] = (
-            pd.to_numeric(merged[col], errors="coerce")
-            .round(2)
-        )
-
-# --- Write to SQLite ---
-conn = sqlite3.connect(DB_PATH)
-merged.to_sql(TABLE_NAME, conn, if_exists="replace", index=False)
-
-# --- Index for faster searches (index the correct column) ---
-conn.execute(f'CREATE INDEX IF NOT EXISTS idx_item_desc ON {TABLE_NAME}("Item Description");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS idx_gnc_file ON {TABLE_NAME}("GNC File");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS idx_province ON {TABLE_NAME}("Province");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS idx_city ON {TABLE_NAME}("City");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS idx_invoice_year ON {TABLE_NAME}("Invoice Year");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS idx_invoice_month ON {TABLE_NAME}("Invoice Month");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS idx_invoice_month_name ON {TABLE_NAME}("Invoice Month Name");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS Qty ON {TABLE_NAME}("Qty");')
-conn.execute(f'CREATE INDEX IF NOT EXISTS Subtotal ON {TABLE_NAME}("Subtotal");')
-
-
-conn.commit()
-conn.close()
-
-print("Loaded merged data (Compiled Data + Province/City) into data.db successfully.")
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from src.advisor import analyze_workload, generate_workload
+from src.db import (
+    ENCODED_COLUMNS, data_table, dictionary_table, dims_sql, dims_table, fts_table, id_column, trigram_table,
+)
+from src.fuzzy import description_rows_table, descriptions_table, normalize_text
+from src.stats import clean_rate_rows, rate_rollups, rate_rows_sql, rate_stats_table
+
+EXCEL_PATH = "master.xlsx"
+DB_PATH = "data.db"
+TABLE_NAME = "records"
+FTS_TABLE = fts_table(TABLE_NAME)
+TRIGRAM_TABLE = trigram_table(TABLE_NAME)
+DESCRIPTIONS_TABLE = descriptions_table(TABLE_NAME)
+DESCRIPTION_ROWS_TABLE = description_rows_table(TABLE_NAME)
+DIMS_TABLE = dims_table(TABLE_NAME)
+RATE_STATS_TABLE = rate_stats_table(TABLE_NAME)
+DATA_TABLE = data_table(TABLE_NAME)
+
+COMPILED_SHEET = "Compiled Data"
+DETAILS_SHEET = "File Details"
+
+required_compiled = {"GNC File", "Item Description"}
+required_details  = {"GNC File", "Province", "City"}
+
+
+def clean_merged(merged: pd.DataFrame) -> pd.DataFrame:
+    """
+    Column/date/number cleanup of Compiled Data rows that already carry
+    Province/City. Shared by the pandas and the streaming import, so it must
+    work on one chunk at a time (no whole-table logic here).
+    """
+    # Normalize column names hard (removes leading/trailing + multiple spaces)
+    merged.columns = [" ".join(str(c).split()) for c in merged.columns]
+
+    # --- Clean Invoice Date (date only) ---
+    if "Invoice Date" in merged.columns:
+        # Text dates are parsed one by one (format="mixed") so the result
+        # doesn't depend on which row pandas would guess a format from, which
+        # differs between chunks of the streaming import.
+        dates = merged["Invoice Date"]
+        is_text = dates.map(lambda v: isinstance(v, str))
+        parsed = pd.to_datetime(dates.where(~is_text), errors="coerce")
+        if is_text.any():
+            parsed[is_text] = pd.to_datetime(dates[is_text], errors="coerce", format="mixed")
+        merged["Invoice Date"] = parsed
+
+        # Extract Year and Month
+        merged["Invoice Year"] = merged["Invoice Date"].dt.year
+        merged["Invoice Month"] = merged["Invoice Date"].dt.month
+        merged["Invoice Month Name"] = merged["Invoice Date"].dt.strftime("%B")
+
+        # Store Invoice Date as ISO date string (no time)
+        merged["Invoice Date"] = merged["Invoice Date"].dt.date.astype("string")
+
+    # Optional: move Province/City near the front
+    front_cols = [c for c in ["GNC File", "Province", "City"] if c in merged.columns]
+    other_cols = [c for c in merged.columns if c not in front_cols]
+    merged = merged[front_cols + other_cols]
+
+    for col in ["Subtotal", "Unit Rate"]:
+        if col in merged.columns:
+            merged[col] = (
+                pd.to_numeric(merged[col], errors="coerce")
+                .round(2)
+            )
+
+    return merged
+
+
+def read_workbook(excel_path: str) -> pd.DataFrame:
+    """Whole-workbook import: both sheets in memory, merged with pandas."""
+    # --- Read both sheets ---
+    compiled = pd.read_excel(excel_path, sheet_name=COMPILED_SHEET, header=1)
+    details  = pd.read_excel(excel_path, sheet_name=DETAILS_SHEET, header=0)
+
+    # --- Clean column names (strip spaces, keep exact names) ---
+    compiled.columns = [str(c).strip() for c in compiled.columns]
+    details.columns  = [str(c).strip() for c in details.columns]
+
+    # --- Validate required columns ---
+    missing_c = required_compiled - set(compiled.columns)
+    missing_d = required_details - set(details.columns)
+
+    if missing_c:
+        raise ValueError(f"Compiled Data missing columns: {missing_c}")
+    if missing_d:
+        raise ValueError(f"File Details missing columns: {missing_d}")
+
+    # --- Reduce details to needed columns + dedupe on GNC File (important) ---
+    details_small = (
+        details[["GNC File", "Province", "City"]]
+        .copy()
+        .drop_duplicates(subset=["GNC File"], keep="first")
+    )
+
+    # --- Merge Province/City into compiled using GNC File ---
+    merged = compiled.merge(details_small, on="GNC File", how="left")
+
+    return clean_merged(merged)
+
+
+# ---------------- Streaming import ----------------
+
+# pd.read_excel's default na_values
+_NA_STRINGS = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+
+def _cell(value):
+    """Cell value as pd.read_excel would give it (NA strings, 3.0 -> 3)."""
+    if isinstance(value, str):
+        return None if value in _NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def header_names(cells: Tuple) -> List[str]:
+    """Header row -> column names the way pd.read_excel names them."""
+    names, seen = [], {}
+    for i, c in enumerate(cells):
+        name = f"Unnamed: {i}" if c is None else str(c).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _gnc_key(value):
+    """GNC File as a lookup key: 2110, 2110.0 and '2110' are the same file."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        return int(value) if value.isdigit() else value
+    return value
+
+
+def load_details_lookup(excel_path: str) -> Dict:
+    """File Details as {GNC File: (Province, City)}; small enough to keep in memory."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = wb[DETAILS_SHEET].iter_rows(values_only=True)
+        names = header_names(next(rows))
+
+        missing_d = required_details - set(names)
+        if missing_d:
+            raise ValueError(f"File Details missing columns: {missing_d}")
+
+        i_gnc, i_prov, i_city = (names.index(c) for c in ("GNC File", "Province", "City"))
+        lookup = {}
+        for row in rows:
+            if len(row) <= max(i_gnc, i_prov, i_city) or row[i_gnc] is None:
+                continue
+            # keep="first", like the pandas import
+            lookup.setdefault(_gnc_key(row[i_gnc]), (_cell(row[i_prov]), _cell(row[i_city])))
+        return lookup
+    finally:
+        wb.close()
+
+
+def iter_workbook_chunks(excel_path: str, chunk_size: int = 50_000) -> Iterator[pd.DataFrame]:
+    """
+    Streaming import: Compiled Data is read row by row (openpyxl read-only)
+    and yielded as cleaned, merged frames of at most `chunk_size` rows, so
+    memory is bounded by the chunk instead of the workbook.
+    """
+    from openpyxl import load_workbook
+
+    details = load_details_lookup(excel_path)
+
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = wb[COMPILED_SHEET].iter_rows(values_only=True)
+        next(rows)  # title row above the header (header=1 in the pandas import)
+        names = header_names(next(rows))
+
+        missing_c = required_compiled - set(names)
+        if missing_c:
+            raise ValueError(f"Compiled Data missing columns: {missing_c}")
+        i_gnc = names.index("GNC File")
+
+        def to_frame(batch: List[Tuple]) -> pd.DataFrame:
+            # Values stay as read: a column's type depends on all its rows, so it is
+            # settled over the whole sheet (ColumnTypes), like pd.read_excel does
+            chunk = pd.DataFrame(batch, columns=names, dtype=object)
+            empty = [c for c in names if chunk[c].isna().all()]
+            chunk[empty] = chunk[empty].astype(float)  # pd.read_excel reads an empty column as float
+            places = [details.get(_gnc_key(g), (None, None)) for g in chunk["GNC File"]]
+            chunk["Province"] = [p for p, _ in places]
+            chunk["City"] = [c for _, c in places]
+            return clean_merged(chunk)
+
+        batch: List[Tuple] = []
+        pending_blank: List[Tuple] = []
+        width = len(names)
+        for row in rows:
+            row = tuple(_cell(v) for v in row[:width]) + (None,) * (width - len(row))
+            # Blank rows only count if data follows them (pd.read_excel drops trailing ones)
+            if all(v is None for v in row):
+                pending_blank.append(row)
+                continue
+            if pending_blank:
+                batch.extend(pending_blank)
+                pending_blank = []
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield to_frame(batch)
+                batch = []
+        if batch:
+            yield to_frame(batch)
+    finally:
+        wb.close()
+
+
+# ---------------- Column types ----------------
+
+# SQLite type by pd.api.types.infer_dtype kind, the ones to_sql picks; anything else is TEXT
+_SQL_TYPES = {
+    "floating": "REAL",
+    "integer": "INTEGER",
+    "boolean": "INTEGER",
+    "datetime64": "TIMESTAMP",
+    "datetime": "TIMESTAMP",
+    "date": "DATE",
+    "time": "TIME",
+}
+
+# infer_dtype kinds of columns holding one kind of value
+_UNIFORM_KINDS = {"empty", "string", "integer", "floating", "boolean", "datetime64", "datetime", "date", "time"}
+
+
+def _type_sample(values: pd.Series) -> pd.Series:
+    """
+    A few of `values`, in its dtype: one of each Python type it holds and a
+    missing one if any. The concatenated samples of every chunk infer the
+    same dtype as the whole column would.
+    """
+    missing = values.isna().to_numpy()
+    present = np.flatnonzero(~missing)
+    if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) not in _UNIFORM_KINDS:
+        kinds = pd.Series(values.to_numpy()[present]).map(type)
+        present = present[kinds.drop_duplicates().index]
+    else:
+        present = present[:1]
+    return values.iloc[np.concatenate([present, np.flatnonzero(missing)[:1]])]
+
+
+class ColumnTypes:
+    """
+    SQLite type of each column over every frame seen: what to_sql would pick
+    for all the frames as one, so it doesn't depend on where chunks split.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[pd.Series]] = {}
+
+    def update(self, frame: pd.DataFrame):
+        for col in frame.columns:
+            self.samples.setdefault(col, []).append(_type_sample(frame[col]))
+
+    def sql_types(self) -> Dict[str, str]:
+        types = {}
+        for col, samples in self.samples.items():
+            values = pd.concat(samples, ignore_index=True).infer_objects()
+            types[col] = _SQL_TYPES.get(pd.api.types.infer_dtype(values, skipna=True), "TEXT")
+        return types
+
+
+def create_table(conn: sqlite3.Connection, table: str, types: Dict[str, str]):
+    """`types` maps each column to its SQLite type ("" for none, values kept as given)."""
+    columns = ",\n    ".join(f'"{col}" {sql_type}'.rstrip() for col, sql_type in types.items())
+    conn.execute(f'CREATE TABLE "{table}" (\n    {columns}\n)')
+
+
+# ---------------- Snapshot cache ----------------
+# Parsing the workbook dominates import time. The cleaned, merged frame is
+# kept as Parquet next to the database and reused while the workbook is
+# unchanged, so rebuilding the DB (e.g. after index changes) skips openpyxl.
+
+SNAPSHOT_DIR = ".import_cache"
+SNAPSHOT_FORMAT = 2  # bump when clean_merged() output or the part encoding changes
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sqlite_text(value) -> str:
+    """A value as SQLite stores it in a TEXT column (REAL uses %!.15g)."""
+    if isinstance(value, float):
+        text = f"{value:.15g}"
+        return text if any(ch in text for ch in ".einf") else text + ".0"
+    return str(value)
+
+
+def _arrow_safe(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Object columns holding several kinds of values (ints next to text, dates
+    next to numbers...) can't go to Parquet as-is. Such a column is TEXT
+    whatever the other frames hold (see ColumnTypes), so its values become
+    the text SQLite would have stored. Numbers alone or dates alone are left
+    to Parquet (see Snapshot.read_frames).
+    """
+    frame = frame.copy()
+    for col in frame.columns:
+        values = frame[col]
+        if values.dtype != object:
+            continue
+        # ints next to floats go to Parquet as doubles
+        if pd.api.types.infer_dtype(values, skipna=True) in _UNIFORM_KINDS | {"mixed-integer-float"}:
+            continue
+        present = values.notna()
+        frame[col] = values.where(~present, values[present].map(_sqlite_text))
+    return frame
+
+
+class Snapshot:
+    """
+    Parquet snapshot of the cleaned frames for one workbook: one part file
+    per chunk plus meta.json with the workbook's size, mtime and sha256.
+    """
+
+    def __init__(self, snapshot_dir: str, excel_path: str):
+        self.excel_path = excel_path
+        stem = os.path.splitext(os.path.basename(excel_path))[0]
+        self.path = os.path.join(snapshot_dir, stem)
+        self.meta_path = os.path.join(self.path, "meta.json")
+
+    def _source_stat(self) -> Dict:
+        st_ = os.stat(self.excel_path)
+        return {"size": st_.st_size, "mtime_ns": st_.st_mtime_ns, "format": SNAPSHOT_FORMAT}
+
+    def is_fresh(self) -> bool:
+        if not os.path.exists(self.meta_path):
+            return False
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        source = self._source_stat()
+        if meta.get("format") != source["format"] or meta.get("size") != source["size"]:
+            return False
+        if meta.get("mtime_ns") == source["mtime_ns"]:
+            return True
+        # Touched or copied: only the content decides
+        return meta.get("sha256") == _file_sha256(self.excel_path)
+
+    def column_types(self) -> Dict[str, str]:
+        """The ColumnTypes of the snapshot's frames, for bulk_load."""
+        with open(self.meta_path) as f:
+            return json.load(f)["column_types"]
+
+    def read_frames(self) -> Iterator[pd.DataFrame]:
+        text_columns = [col for col, sql_type in self.column_types().items() if sql_type == "TEXT"]
+        parts = sorted(p for p in os.listdir(self.path) if p.endswith(".parquet"))
+        for part in parts:
+            frame = pd.read_parquet(os.path.join(self.path, part))
+            for col in text_columns:
+                # A part that only held numbers: its ints come back as floats (next
+                # to floats or missing values) but must become text as ints
+                if frame[col].dtype.kind == "f":
+                    ints = frame[col].notna() & (frame[col] % 1 == 0)
+                    values = frame[col].astype(object)
+                    values[ints] = [int(v) for v in frame[col][ints]]
+                    frame[col] = values
+            yield frame
+
+    def write_through(self, frames: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Pass frames through unchanged while writing them as parts. The
+        snapshot only replaces the old one once every frame was consumed.
+        """
+        building = f"{self.path}.building"
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(building)
+
+        types = ColumnTypes()
+        for i, frame in enumerate(frames):
+            types.update(frame)
+            _arrow_safe(frame).to_parquet(os.path.join(building, f"part-{i:05d}.parquet"), index=False)
+            yield frame
+
+        meta = {
+            **self._source_stat(),
+            "sha256": _file_sha256(self.excel_path),
+            "column_types": types.sql_types(),
+        }
+        with open(os.path.join(building, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(building, self.path)
+
+
+# ---------------- SQLite ----------------
+
+class PhaseTimer:
+    """Wall time per import phase, printed as each phase finishes."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+        print(f"  {name}: {self.phases[name]:.2f}s")
+
+    def report(self):
+        total = sum(self.phases.values())
+        print(f"Total: {total:.2f}s (" + ", ".join(f"{k} {v:.2f}s" for k, v in self.phases.items()) + ")")
+
+
+def _frame_rows(frame: pd.DataFrame) -> Iterator[Tuple]:
+    """Rows as plain Python tuples for executemany (NaN/NA/NaT -> NULL)."""
+    frame = frame.copy()
+    for col in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[col]):
+            frame[col] = frame[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.itertuples(index=False, name=None)
+
+
+class DictionaryEncoder:
+    """
+    --schema normalized: replaces the ENCODED_COLUMNS of each chunk with
+    integer ids, adding values not seen in earlier chunks to their dictionary
+    table as they come in.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ids: Dict[str, Dict[str, int]] = {column: {} for column in ENCODED_COLUMNS}
+        for column in ENCODED_COLUMNS:
+            conn.execute(
+                f'''CREATE TABLE "{dictionary_table(TABLE_NAME, column)}" (
+                    id INTEGER PRIMARY KEY,
+                    value TEXT NOT NULL UNIQUE
+                );'''
+            )
+
+    def encode(self, frame: pd.DataFrame) -> pd.DataFrame:
+        frame = frame.copy()
+        for column in ENCODED_COLUMNS:
+            ids = self.ids[column]
+            # Keyed by the text SQLite stores, so 12 and "12" share an id like they share a TEXT value
+            keys = frame[column].map(_sqlite_text, na_action="ignore")
+            new = [key for key in keys.dropna().unique() if key not in ids]
+            ids.update({key: len(ids) + i + 1 for i, key in enumerate(new)})
+            self.conn.executemany(
+                f'INSERT INTO "{dictionary_table(TABLE_NAME, column)}" (id, value) VALUES (?, ?)',
+                ((ids[key], key) for key in new),
+            )
+            frame[column] = keys.map(ids).astype("Int64")
+        return frame.rename(columns={column: id_column(column) for column in ENCODED_COLUMNS})
+
+
+def create_records_view(conn: sqlite3.Connection, columns: List[str]):
+    # --- Compatibility view of the normalized schema ---
+    # Same name, column names and order (and rowid) as the wide records table, so
+    # the indexes, rollups and the app read it unchanged; the id columns are
+    # exposed too for the search builders' filters.
+    select = ["d.rowid AS rowid"]
+    joins = []
+    for column in columns:
+        if column in ENCODED_COLUMNS:
+            alias = ENCODED_COLUMNS[column]
+            select.append(f'{alias}.value AS "{column}"')
+            joins.append(
+                f'LEFT JOIN "{dictionary_table(TABLE_NAME, column)}" AS {alias} '
+                f'ON {alias}.id = d."{id_column(column)}"'
+            )
+        else:
+            select.append(f'd."{column}"')
+    select += [f'd."{id_column(column)}"' for column in ENCODED_COLUMNS]
+
+    fields = ",\n            ".join(select)
+    conn.execute(
+        f'''CREATE VIEW "{TABLE_NAME}" AS
+        SELECT
+            {fields}
+        FROM "{DATA_TABLE}" AS d
+        {" ".join(joins)};'''
+    )
+
+
+def bulk_load(
+    db_path: str,
+    frames: Iterator[pd.DataFrame],
+    timer: PhaseTimer,
+    progress: bool = False,
+    index_set: str = "basic",
+    schema: str = "wide",
+    column_types: Optional[Dict[str, str]] = None,
+) -> int:
+    """
+    Build the database from scratch in `<db_path>.building` and swap it in:
+    bulk pragmas (no journal, no fsync), one transaction, executemany inserts,
+    indexes built once after all rows are in, then ANALYZE + PRAGMA optimize.
+    `index_set` picks the B-tree indexes (see build_indexes). `schema`
+    "normalized" stores the ENCODED_COLUMNS as integer ids into dictionary
+    tables, the rows in DATA_TABLE and a view named TABLE_NAME with the wide
+    table's columns over them. Returns the row count.
+
+    Column types are those of all the frames as one (see ColumnTypes). Given
+    as `column_types` (a snapshot's), the table is created up front; else the
+    rows go to an untyped staging table first and are copied once every frame
+    was seen, the column affinities converting them as a direct insert would.
+    """
+    tmp_path = f"{db_path}.building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        # Safe to skip journaling/fsync: a failed build only loses the temp file
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -262144")  # 256 MiB for index builds
+        conn.execute("BEGIN")
+
+        total = 0
+        columns: List[str] = []
+        names = insert_sql = ""
+        encoder = DictionaryEncoder(conn) if schema == "normalized" else None
+        target = DATA_TABLE if encoder else TABLE_NAME
+        types = ColumnTypes()
+        load_table = target if column_types is not None else f"{target}_load"
+        with timer.phase("load rows"):
+            start = time.perf_counter()
+            for i, frame in enumerate(frames):
+                if i == 0:
+                    columns = list(frame.columns)
+                else:
+                    frame = frame.reindex(columns=columns)
+                if encoder:
+                    frame = encoder.encode(frame)
+                if column_types is None:
+                    types.update(frame)
+                if i == 0:
+                    if column_types is None:
+                        create_table(conn, load_table, {c: "" for c in frame.columns})
+                    else:
+                        # Types of the wide columns; the normalized schema stores ids for the encoded ones
+                        encoded = set(ENCODED_COLUMNS) if encoder else set()
+                        create_table(conn, target, {
+                            id_column(c) if c in encoded else c: "INTEGER" if c in encoded else column_types[c]
+                            for c in columns
+                        })
+                    names = ", ".join(f'"{c}"' for c in frame.columns)
+                    marks = ", ".join("?" for _ in frame.columns)
+                    insert_sql = f'INSERT INTO "{load_table}" ({names}) VALUES ({marks})'
+
+                conn.executemany(insert_sql, _frame_rows(frame))
+                total += len(frame)
+                if progress:
+                    elapsed = time.perf_counter() - start
+                    print(f"    chunk {i + 1}: {total:,} rows ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        if load_table != target:
+            with timer.phase("column types"):
+                create_table(conn, target, types.sql_types())
+                conn.execute(f'INSERT INTO "{target}" ({names}) SELECT {names} FROM "{load_table}" ORDER BY rowid')
+                conn.execute(f'DROP TABLE "{load_table}"')
+
+        if encoder:
+            create_records_view(conn, columns)
+        build_indexes(conn, timer, index_set, schema)
+        conn.execute("COMMIT")
+
+        with timer.phase("analyze"):
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+
+    with timer.phase("swap in"):
+        try:
+            os.replace(tmp_path, db_path)
+        except PermissionError as e:
+            raise SystemExit(
+                f"Built {tmp_path} but could not replace {db_path} ({e}). "
+                "Stop the app holding it open and rename the file by hand."
+            )
+
+    return total
+
+
+def build_indexes(conn: sqlite3.Connection, timer: PhaseTimer, index_set: str = "basic", schema: str = "wide"):
+    """
+    All secondary indexes, built once the records table is fully loaded.
+    B-tree indexes come last so the advisor can explain the full-text queries too.
+    """
+    with timer.phase("fts index"):
+        build_fts_index(conn)
+    with timer.phase("trigram index"):
+        build_trigram_index(conn)
+    with timer.phase("description dictionary"):
+        build_description_dictionary(conn)
+    with timer.phase("filter dims"):
+        build_dims_table(conn)
+    with timer.phase("rate rollups"):
+        build_rate_stats(conn)
+    with timer.phase(f"btree indexes ({index_set})"):
+        if index_set == "recommended":
+            build_recommended_indexes(conn)
+        else:
+            build_btree_indexes(conn, schema)
+
+
+def build_recommended_indexes(conn: sqlite3.Connection):
+    # --- Composite / covering indexes for the app's workload (src/advisor.py) ---
+    # Derived from the plans of the queries the app generates, so every filter
+    # combination is served by an index prefix instead of one column's index.
+    # On the normalized schema they go on DATA_TABLE, encoded columns by their ids.
+    report = analyze_workload(conn, TABLE_NAME, generate_workload(conn, TABLE_NAME))
+    for sql in report["recommended"]:
+        print(f"    {sql}")
+        conn.execute(sql)
+
+
+def build_btree_indexes(conn: sqlite3.Connection, schema: str = "wide"):
+    # --- Index for faster searches (index the correct column) ---
+    # The normalized schema indexes its fact table, encoded columns by their ids
+    table = DATA_TABLE if schema == "normalized" else TABLE_NAME
+
+    def col(name: str) -> str:
+        return id_column(name) if schema == "normalized" and name in ENCODED_COLUMNS else name
+
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_item_desc ON {table}("Item Description");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_gnc_file ON {table}("GNC File");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_province ON {table}("{col("Province")}");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_city ON {table}("{col("City")}");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_invoice_year ON {table}("Invoice Year");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_invoice_month ON {table}("Invoice Month");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_invoice_month_name ON {table}("{col("Invoice Month Name")}");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS Qty ON {table}("Qty");')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS Subtotal ON {table}("Subtotal");')
+
+
+def build_fts_index(conn: sqlite3.Connection):
+    # --- Full-text index on Item Description (FTS5, ranked with bm25) ---
+    # Contentless: search only needs match + rank, rows are joined back by rowid.
+    # Rebuilt on every import so rowids always line up with the records table.
+    conn.execute(f'DROP TABLE IF EXISTS {FTS_TABLE};')
+    conn.execute(
+        f'''CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            description,
+            content='',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        );'''
+    )
+    conn.execute(
+        f'''INSERT INTO {FTS_TABLE}(rowid, description)
+            SELECT rowid, "Item Description" FROM {TABLE_NAME}
+            WHERE "Item Description" IS NOT NULL;'''
+    )
+
+
+def build_trigram_index(conn: sqlite3.Connection):
+    # --- Trigram index for substring ("contains") search ---
+    # Any fragment of 3+ characters ('dryw', part of an invoice / file number) is
+    # answered from this index instead of a %term% LIKE scan.
+    conn.execute(f'DROP TABLE IF EXISTS {TRIGRAM_TABLE};')
+    conn.execute(
+        f'''CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5(
+            description,
+            file_name,
+            gnc_file,
+            content='',
+            tokenize='trigram'
+        );'''
+    )
+    conn.execute(
+        f'''INSERT INTO {TRIGRAM_TABLE}(rowid, description, file_name, gnc_file)
+            SELECT rowid, "Item Description", "File Name", CAST("GNC File" AS TEXT)
+            FROM {TABLE_NAME};'''
+    )
+
+
+def build_description_dictionary(conn: sqlite3.Connection):
+    # --- Unique normalized descriptions + their rows, for fuzzy search ---
+    # Invoices repeat the same item descriptions thousands of times; fuzzy
+    # search scores each distinct normalized description once and fans the
+    # score out to its rows.
+    conn.execute(f'DROP TABLE IF EXISTS {DESCRIPTION_ROWS_TABLE};')
+    conn.execute(f'DROP TABLE IF EXISTS {DESCRIPTIONS_TABLE};')
+    conn.execute(
+        f'''CREATE TABLE {DESCRIPTIONS_TABLE} (
+            id          INTEGER PRIMARY KEY,
+            description TEXT NOT NULL UNIQUE
+        );'''
+    )
+    conn.execute(
+        f'''CREATE TABLE {DESCRIPTION_ROWS_TABLE} (
+            desc_id INTEGER NOT NULL,
+            rid     INTEGER NOT NULL,
+            PRIMARY KEY (desc_id, rid)
+        ) WITHOUT ROWID;'''
+    )
+    # Rows stream from the cursor straight into the postings; only the
+    # distinct descriptions are held in memory
+    desc_rows = conn.execute(
+        f'SELECT rowid, "Item Description" FROM {TABLE_NAME} WHERE "Item Description" IS NOT NULL;'
+    )
+    normalized = {}  # raw description -> normalized text, so each raw string is tokenized once
+    ids = {}  # normalized text -> id
+
+    def postings() -> Iterator[Tuple[int, int]]:
+        for rid, desc in desc_rows:
+            norm = normalized.get(desc)
+            if norm is None:
+                norm = normalized[desc] = normalize_text(str(desc))
+            desc_id = ids.get(norm)
+            if desc_id is None:
+                desc_id = ids[norm] = len(ids) + 1
+            yield desc_id, rid
+
+    conn.executemany(
+        f'INSERT INTO {DESCRIPTION_ROWS_TABLE}(desc_id, rid) VALUES (?, ?);', postings()
+    )
+    conn.executemany(
+        f'INSERT INTO {DESCRIPTIONS_TABLE}(id, description) VALUES (?, ?);',
+        ((desc_id, norm) for norm, desc_id in ids.items()),
+    )
+
+
+def build_dims_table(conn: sqlite3.Connection):
+    # --- Dimension table behind the filter dropdowns ---
+    # A few hundred rows (province, city, year, month, count) the app loads in
+    # one query, instead of DISTINCT scans over the records table per dropdown.
+    conn.execute(f'DROP TABLE IF EXISTS {DIMS_TABLE};')
+    conn.execute(f'CREATE TABLE {DIMS_TABLE} AS {dims_sql(TABLE_NAME, materialized=False)};')
+
+
+# Rows per batch of the rate rollups (whole descriptions at a time, so the
+# last description of a batch can add to it)
+RATE_STATS_BATCH_ROWS = 50_000
+
+
+def _rate_stat_batches(cursor: sqlite3.Cursor, batch_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    The rollup input rows of a cursor ordered by description id, a batch of
+    whole descriptions at a time: every group rate_rollups forms is complete
+    within one batch.
+    """
+    columns = [c[0] for c in cursor.description]
+    carry: List[Tuple] = []
+    while True:
+        fetched = cursor.fetchmany(batch_rows)
+        if not fetched:
+            break
+        rows = carry + fetched
+        cut = len(rows)
+        while cut and rows[cut - 1][0] == rows[-1][0]:
+            cut -= 1
+        carry = rows[cut:]
+        if cut:
+            yield pd.DataFrame(rows[:cut], columns=columns)
+    if carry:
+        yield pd.DataFrame(carry, columns=columns)
+
+
+def build_rate_stats(conn: sqlite3.Connection):
+    # --- Unit Rate statistics rollups (min / median / p90 / max per description x UOM) ---
+    # One row per normalized description x UOM x filter combination of
+    # ROLLUP_LEVELS (src/stats.py), so the app's statistics panel is a lookup
+    # instead of aggregating raw rows.
+    # desc_key is the description dictionary's normalized text; rows are read in
+    # its id order, so a batch of whole descriptions is aggregated at a time and
+    # memory doesn't grow with the table.
+    conn.execute(f'DROP TABLE IF EXISTS {RATE_STATS_TABLE};')
+    conn.execute(
+        f'''CREATE TABLE {RATE_STATS_TABLE} (
+            desc_key TEXT NOT NULL,
+            uom TEXT NOT NULL,
+            province TEXT NOT NULL,
+            city TEXT NOT NULL,
+            year TEXT NOT NULL,
+            month TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            rate_min REAL,
+            rate_p50 REAL,
+            rate_p90 REAL,
+            rate_max REAL,
+            rate_mean REAL
+        );'''
+    )
+    cursor = conn.execute(rate_rows_sql(TABLE_NAME))
+    insert_sql = ""
+    for rows in _rate_stat_batches(cursor, RATE_STATS_BATCH_ROWS):
+        stats = rate_rollups(clean_rate_rows(rows))
+        insert_sql = insert_sql or f'INSERT INTO {RATE_STATS_TABLE} VALUES ({", ".join("?" for _ in stats.columns)});'
+        conn.executemany(insert_sql, stats.itertuples(index=False, name=None))
+    conn.execute(
+        f'''CREATE INDEX IF NOT EXISTS idx_{RATE_STATS_TABLE}_lookup
+            ON {RATE_STATS_TABLE}(desc_key, province, city, year, month);'''
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load master.xlsx into the SQLite database.")
+    parser.add_argument("--excel", default=EXCEL_PATH)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument(
+        "--mode",
+        choices=["pandas", "stream"],
+        default="pandas",
+        help="pandas: read whole sheets in memory. stream: read Compiled Data in "
+             "row chunks with bounded memory (for very large workbooks).",
+    )
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="rows per chunk in stream mode")
+    parser.add_argument(
+        "--snapshot-dir",
+        default=SNAPSHOT_DIR,
+        help="where the Parquet snapshot of the parsed workbook is kept",
+    )
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="always parse the workbook and don't write a snapshot",
+    )
+    parser.add_argument(
+        "--indexes",
+        choices=["basic", "recommended"],
+        default="basic",
+        help="basic: one index per filter column. recommended: composite/covering "
+             "indexes derived from the app's query workload (python -m src.advisor), "
+             "on the fact table with --schema normalized.",
+    )
+    parser.add_argument(
+        "--schema",
+        choices=["wide", "normalized"],
+        default="wide",
+        help="wide: one table with every column as stored. normalized: Province, City, "
+             "UOM, Invoice Month Name and File Name as integer ids into dictionary "
+             "tables, with a view under the usual table name.",
+    )
+    args = parser.parse_args()
+
+    timer = PhaseTimer()
+    snapshot = None if args.no_snapshot else Snapshot(args.snapshot_dir, args.excel)
+
+    column_types = None
+    if snapshot is not None and snapshot.is_fresh():
+        print(f"Workbook unchanged, loading from snapshot {snapshot.path}")
+        frames = snapshot.read_frames()
+        column_types = snapshot.column_types()
+    else:
+        if args.mode == "stream":
+            # reading happens chunk by chunk inside "load rows"
+            frames = iter_workbook_chunks(args.excel, args.chunk_size)
+        else:
+            with timer.phase("read workbook"):
+                frames = iter([read_workbook(args.excel)])
+        if snapshot is not None:
+            frames = snapshot.write_through(frames)
+
+    # --- Write to SQLite ---
+    rows = bulk_load(
+        args.db, frames, timer, progress=args.mode == "stream", index_set=args.indexes, schema=args.schema,
+        column_types=column_types,
+    )
+
+    print(f"Loaded merged data (Compiled Data + Province/City) into {args.db} successfully ({rows:,} rows).")
+    timer.report()
+
+
+if __name__ == "__main__":
+    main()
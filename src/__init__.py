@@ -1,2 +1,2 @@
-
+
 # makes src a package
\ No newline at end of file
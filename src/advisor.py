@@ -0,0 +1,379 @@
+"""
+Index advisor: explains the app's search workload and suggests B-tree
+indexes for it.
+
+    python -m src.advisor [--db data.db] [--log queries.jsonl] [--json]
+
+The workload is either the SQL the app actually ran (AppConfig.query_log_path,
+passed with --log) or, by default, every search mode x a set of typical filter
+combinations generated with the same builders the app uses.
+"""
+import argparse
+import json
+import re
+import sqlite3
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.config import CONFIG
+from src.db import (
+    build_fts_search_sql,
+    build_search_sql,
+    build_substring_search_sql,
+    ENCODED_COLUMNS,
+    data_table,
+    facet_sql,
+    dims_sql,
+    get_conn,
+    id_column,
+    paginate_sql,
+)
+
+# Filter combinations of the generated workload: each dropdown alone plus the
+# usual drill-downs (year -> month, province -> city -> period)
+FILTER_COMBOS = (
+    (),
+    ("year",),
+    ("month",),
+    ("province",),
+    ("city",),
+    ("year", "month"),
+    ("province", "city"),
+    ("province", "year"),
+    ("province", "city", "year"),
+    ("province", "city", "year", "month"),
+)
+
+# Column order used to break ties between equally common filter columns
+FILTER_COLUMNS = ("Province", "City", "Invoice Year", "Invoice Month")
+
+# How plans refer to the records table: "r" in the search builders' joins, "d" for
+# the fact table inside a --schema normalized view
+TABLE_ALIASES = ("r", "d")
+
+# `"col" = ?`, or a normalized id column compared to its dictionary lookup (db._filter_clauses)
+_EQUALITY = re.compile(r'(?:\b\w+\.)?"([^"]+)" = (?:\?|\(SELECT id FROM "[^"]+" WHERE value = \?\))')
+_DISTINCT = re.compile(r"SELECT\s+DISTINCT\s+(.*?)\s+FROM", re.S | re.I)
+_QUOTED = re.compile(r'"([^"]+)"')
+
+
+class WorkloadQuery(NamedTuple):
+    name: str
+    sql: str
+    params: List
+    weight: int = 1
+
+
+class Need(NamedTuple):
+    """Columns one query wants indexed; `ordered` when their order matters (DISTINCT ... ORDER BY)."""
+    columns: Tuple[str, ...]
+    ordered: bool
+
+
+# ---------------- Workload ----------------
+
+def _sample_filters(conn: sqlite3.Connection, table: str) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """One real value per filter, so the generated queries look like the app's."""
+    row = conn.execute(
+        f'''SELECT "Invoice Year", "Invoice Month", "Invoice Month Name", "Province", "City"
+            FROM "{table}"
+            WHERE "Invoice Year" IS NOT NULL AND "Invoice Month" IS NOT NULL
+              AND "Province" IS NOT NULL AND "City" IS NOT NULL
+            LIMIT 1'''
+    ).fetchone() or (2024, 1, "January", "", "")
+    year, month, month_name, province, city = row
+    values = {"year": str(int(year)), "month": month_name, "province": province, "city": city}
+    return values, {month_name: int(month)}
+
+
+def _is_normalized(conn: sqlite3.Connection, table: str) -> bool:
+    """Whether `table` is a --schema normalized view over data_table(table)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (data_table(table),)
+    ).fetchone() is not None
+
+
+def generate_workload(conn: sqlite3.Connection, table: str, query: str = "drywall repair") -> List[WorkloadQuery]:
+    """The app's queries for every search mode x FILTER_COMBOS, plus the dropdown query."""
+    values, month_name_to_num = _sample_filters(conn, table)
+    normalized = _is_normalized(conn, table)
+    builders = {
+        "ranked": build_fts_search_sql,
+        "contains": build_substring_search_sql,
+        "like": build_search_sql,
+    }
+
+    workload = [WorkloadQuery("filter options", dims_sql(table), [])]
+    for combo in FILTER_COMBOS:
+        filters = [values[f] if f in combo else "(All)" for f in ("year", "month", "province", "city")]
+        label = "+".join(combo) or "no filters"
+
+        for mode, build in builders.items():
+            sql, params = build(table, query, *filters, month_name_to_num, normalized=normalized)
+            workload.append(WorkloadQuery(f"{mode} facets [{label}]", *facet_sql(sql, params)))
+            workload.append(WorkloadQuery(f"{mode} page [{label}]", *paginate_sql(sql, params, CONFIG.page_size)))
+
+    return workload
+
+
+def load_workload(path: str) -> List[WorkloadQuery]:
+    """Queries logged by the app (see db.log_query), identical SQL counted once with a weight."""
+    counts: Counter = Counter()
+    params_of: Dict[str, List] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            counts[entry["sql"]] += 1
+            params_of.setdefault(entry["sql"], entry["params"])
+
+    return [
+        WorkloadQuery(f"logged #{i + 1}", sql, params_of[sql], weight)
+        for i, (sql, weight) in enumerate(counts.most_common())
+    ]
+
+
+# ---------------- Plans ----------------
+
+def explain(conn: sqlite3.Connection, sql: str, params: Sequence) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", list(params))]
+
+
+def _target(line: str) -> Optional[str]:
+    parts = line.split()
+    if len(parts) >= 2 and parts[0] in ("SCAN", "SEARCH"):
+        return parts[1]
+    return None
+
+
+def classify_plan(plan: List[str], table: str) -> str:
+    """
+    How a query reaches the records table:
+      'rowid'    - looked up by rowid from a full-text index (nothing to add)
+      'covering' - answered from an index alone
+      'index'    - index search, then the rows
+      'scan'     - full table (or full index) scan
+      'none'     - doesn't read the table
+    The worst access wins when the table is read more than once.
+    """
+    names = {table, *TABLE_ALIASES}
+    rank = {"none": 0, "rowid": 1, "covering": 2, "index": 3, "scan": 4}
+    worst = "none"
+    for line in plan:
+        if _target(line) not in names:
+            continue
+        if "INTEGER PRIMARY KEY" in line:
+            kind = "rowid"
+        elif line.startswith("SCAN"):
+            kind = "scan"  # whole table, or a whole index
+        elif "COVERING INDEX" in line:
+            kind = "covering"
+        else:
+            kind = "index"
+        if rank[kind] > rank[worst]:
+            worst = kind
+    return worst
+
+
+def indexes_used(plan: List[str]) -> List[str]:
+    return re.findall(r"USING (?:COVERING )?INDEX (\w+)", " ".join(plan))
+
+
+def temp_btrees(plan: List[str]) -> List[str]:
+    """What the query sorts/deduplicates in a temp B-tree (ORDER BY, DISTINCT, GROUP BY)."""
+    return [line[len("USE TEMP B-TREE FOR "):] for line in plan if line.startswith("USE TEMP B-TREE FOR ")]
+
+
+# ---------------- Recommendations ----------------
+
+def query_need(sql: str, plan: List[str], table: str, normalized: bool = False) -> Optional[Need]:
+    """
+    Index one query would benefit from: its equality filter columns, or the
+    selected columns of a DISTINCT dropdown query (covering, in order).
+    Queries that reach the table by rowid only have nothing to gain.
+    `normalized` reads the view's string columns as the fact table's id columns.
+    """
+    if classify_plan(plan, table) in ("none", "rowid"):
+        return None
+
+    distinct = _DISTINCT.search(sql)
+    if distinct:
+        columns = _QUOTED.findall(distinct.group(1))
+        if normalized:
+            columns = [id_column(c) if c in ENCODED_COLUMNS else c for c in columns]
+        return Need(tuple(columns), ordered=True)
+
+    columns = tuple(dict.fromkeys(_EQUALITY.findall(sql)))
+    return Need(columns, ordered=False) if columns else None
+
+
+def _satisfies(index: List[str], need: Need) -> bool:
+    prefix = index[:len(need.columns)]
+    if need.ordered:
+        return tuple(prefix) == need.columns
+    return set(prefix) == set(need.columns)
+
+
+def _extends(index: List[str], need: Need) -> bool:
+    """`index` can grow into an index satisfying `need` by appending columns."""
+    if need.ordered:
+        return tuple(index) == need.columns[:len(index)]
+    return set(index) < set(need.columns)
+
+
+def recommend_indexes(needs: Sequence[Tuple[Need, int]]) -> List[Tuple[str, ...]]:
+    """
+    Fewest composite indexes that serve every (need, weight) through an index
+    prefix. Shorter needs seed indexes that longer needs extend; unordered
+    column sets put the most requested columns first.
+    """
+    popularity: Counter = Counter()
+    for need, weight in needs:
+        for col in need.columns:
+            popularity[col] += weight
+
+    # FILTER_COLUMNS by name, or by id column on a normalized fact table
+    tie = {}
+    for i, c in enumerate(FILTER_COLUMNS):
+        tie[c] = i
+        if c in ENCODED_COLUMNS:
+            tie[id_column(c)] = i
+
+    def order(columns) -> List[str]:
+        return sorted(columns, key=lambda c: (-popularity[c], tie.get(c, len(tie)), c))
+
+    distinct_needs = sorted(
+        {need for need, _ in needs},
+        key=lambda n: (len(n.columns), not n.ordered, order(n.columns)),
+    )
+
+    indexes: List[List[str]] = []
+    for need in distinct_needs:
+        if any(_satisfies(index, need) for index in indexes):
+            continue
+        for index in indexes:
+            if _extends(index, need):
+                index.extend(
+                    need.columns[len(index):] if need.ordered
+                    else order(set(need.columns) - set(index))
+                )
+                break
+        else:
+            indexes.append(list(need.columns) if need.ordered else order(need.columns))
+
+    return [tuple(index) for index in indexes]
+
+
+def index_name(table: str, columns: Sequence[str]) -> str:
+    slug = "_".join(re.sub(r"\W+", "_", c.lower()).strip("_") for c in columns)
+    return f"idx_{table}_{slug}"
+
+
+def create_index_sql(table: str, columns: Sequence[str]) -> str:
+    cols = ", ".join(f'"{c}"' for c in columns)
+    return f'CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON "{table}"({cols});'
+
+
+# ---------------- Report ----------------
+
+def analyze_workload(conn: sqlite3.Connection, table: str, workload: List[WorkloadQuery]) -> Dict:
+    """
+    Plans of every workload query, index usage and the recommended index set.
+    For a --schema normalized `table` (a view) the plans and indexes are those
+    of its fact table, data_table(table).
+    """
+    normalized = _is_normalized(conn, table)
+    if normalized:
+        table = data_table(table)
+    queries, needs = [], []
+    used: Counter = Counter()
+
+    for q in workload:
+        try:
+            plan = explain(conn, q.sql, q.params)
+        except sqlite3.OperationalError as e:
+            # e.g. a full-text table this database doesn't have
+            queries.append({"name": q.name, "weight": q.weight, "error": str(e)})
+            continue
+
+        need = query_need(q.sql, plan, table, normalized)
+        if need is not None:
+            needs.append((need, q.weight))
+        for name in indexes_used(plan):
+            used[name] += q.weight
+
+        queries.append({
+            "name": q.name,
+            "weight": q.weight,
+            "access": classify_plan(plan, table),
+            "indexes": indexes_used(plan),
+            "temp_btree": temp_btrees(plan),
+            "plan": plan,
+        })
+
+    existing = [
+        name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,),
+        )
+    ]
+    recommended = recommend_indexes(needs)
+    access = Counter()
+    for q in queries:
+        access[q.get("access", "error")] += q["weight"]
+
+    return {
+        "table": table,
+        "queries": queries,
+        "access": dict(access),
+        "indexes_used": dict(used),
+        "indexes_unused": [name for name in existing if name not in used],
+        "recommended": [create_index_sql(table, cols) for cols in recommended],
+    }
+
+
+def print_report(report: Dict):
+    print(f"{len(report['queries'])} queries against {report['table']}\n")
+    for q in report["queries"]:
+        if "error" in q:
+            print(f"  {q['name']:<55} ERROR {q['error']}")
+            continue
+        extra = ", ".join(q["indexes"]) or "-"
+        if q["temp_btree"]:
+            extra += f"  (temp b-tree: {', '.join(q['temp_btree'])})"
+        print(f"  {q['name']:<55} {q['access']:<9} {extra}")
+
+    print("\nTable access (weighted): " + ", ".join(f"{k}={v}" for k, v in sorted(report["access"].items())))
+    print("Indexes used: " + (", ".join(f"{k} ({v})" for k, v in report["indexes_used"].items()) or "none"))
+    print("Indexes never used: " + (", ".join(report["indexes_unused"]) or "none"))
+    print("\nRecommended indexes:")
+    for sql in report["recommended"]:
+        print(f"  {sql}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain the search workload and recommend indexes.")
+    parser.add_argument("--db", default=CONFIG.db_path)
+    parser.add_argument("--table", default=CONFIG.table)
+    parser.add_argument("--log", help="JSON-lines query log written by the app (AppConfig.query_log_path)")
+    parser.add_argument("--query", default="drywall repair", help="search text of the generated workload")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    conn = get_conn(args.db)
+    try:
+        workload = load_workload(args.log) if args.log else generate_workload(conn, args.table, args.query)
+        report = analyze_workload(conn, args.table, workload)
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""
+Batch bill-of-quantities matcher: prices every line of a BOQ against the
+historical unit rates in one pass.
+
+    python -m src.boq lines.xlsx [-o priced.xlsx] [--top 5] [--min-score 70]
+
+The input (CSV or Excel) needs a description column and may carry Province,
+City and Invoice Year columns that narrow each line's rates. The corpus is
+the deduplicated description keys of the rate rollups (src.stats), so each
+block of lines is scored against it with one multi-core rapidfuzz call
+instead of a fuzzy search per line (at --min-score 90 and up only pairs
+sharing enough character trigrams are scored). Output: the top matches
+of every line, one row per matched description x UOM, with its rate
+statistics.
+"""
+import argparse
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+from src.config import CONFIG
+from src.db import has_table, read_conn
+from src.fuzzy import normalize_text
+from src.stats import STAT_COLUMNS, format_rate_stats, load_rate_stats, matched_descriptions, rate_stats_table
+
+# Lines per scoring block: at most this many (line, corpus key) pairs
+BLOCK_PAIRS = 16 * 1024 * 1024
+
+# Rollup dimension -> input column of the per-line filters
+LINE_FILTERS = {"province": "Province", "city": "City", "year": "Invoice Year"}
+
+Matches = List[Tuple[int, int]]
+
+# Below this min_score a match can share few or no trigrams with the line
+# (token_set_ratio credits common pieces of 1-2 characters too), so no gram
+# overlap is a safe prefilter and every key is scored instead.
+# Without any shared trigram, common pieces are at most 3 characters long
+# ("x y" across a word break) with an edit between them, which keeps scores
+# of all but the shortest strings under ~86.
+PREFILTER_MIN_SCORE = 90
+
+
+def _filter_value(value) -> str:
+    """A line's filter cell in the rollup vocabulary (blank -> "(All)", 2024.0 -> "2024")."""
+    if value is None or pd.isna(value):
+        return "(All)"
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return str(int(value))
+    text = str(value).strip()
+    return text or "(All)"
+
+
+def load_descriptions(db_path: str, table: str) -> pd.DataFrame:
+    """desc_key, uom and the most common description text of every key x UOM (see matched_descriptions)."""
+    with read_conn(db_path) as conn:
+        groups = pd.read_sql_query(
+            f'''SELECT "Item Description", "UOM", COUNT(*) AS n
+                FROM "{table}"
+                WHERE "Item Description" IS NOT NULL
+                GROUP BY "Item Description", "UOM"''',
+            conn,
+        )
+    return matched_descriptions(groups, limit=len(groups))
+
+
+def load_rollup(db_path: str, table: str, province: str, city: str, year: str) -> pd.DataFrame:
+    """Rate statistics of every description key x UOM under one filter combination (all months)."""
+    selected = {"province": province, "city": city, "year": year, "month": "(All)"}
+    return load_rate_stats(db_path, table, selected)[["desc_key", "uom", *STAT_COLUMNS]]
+
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """
+    Character n-grams of each word, padded with spaces so short words and
+    word starts/ends still produce grams. `text` should be normalized.
+    """
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def prefilter_overlap(min_score: int) -> Optional[float]:
+    """
+    Fraction of the smaller gram set (line or key) a key scoring >= min_score
+    shares with the line, with a wide margin: 0.25 at PREFILTER_MIN_SCORE up
+    to 0.5 at 100 (matches of real queries measure 0.64 and 0.98 there).
+    None below PREFILTER_MIN_SCORE: score everything.
+    """
+    if min_score < PREFILTER_MIN_SCORE:
+        return None
+    return (min_score - 80) / 40
+
+
+class GramPostings:
+    """
+    Character-trigram postings of the corpus keys, to find each line's
+    candidate keys before scoring.
+    """
+
+    def __init__(self, choices: np.ndarray):
+        postings: Dict[str, List[int]] = {}
+        counts = []
+        for i, choice in enumerate(choices):
+            grams = char_ngrams(choice)
+            counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.size = len(choices)
+        self.gram_counts = np.array(counts, dtype=np.int32)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def candidates(self, query: str, min_score: int) -> np.ndarray:
+        """
+        Positions that may score >= min_score against `query`: those sharing
+        prefilter_overlap(min_score) of the smaller gram set with it, so a
+        short key fully contained in a longer line still qualifies; all of
+        them below PREFILTER_MIN_SCORE.
+        """
+        min_overlap = prefilter_overlap(min_score)
+        if min_overlap is None:
+            return np.arange(self.size)
+        grams = char_ngrams(query)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        shared = np.bincount(np.concatenate(hits), minlength=self.size)
+        needed = np.maximum(np.ceil(min_overlap * np.minimum(len(grams), self.gram_counts)), 1)
+        return np.flatnonzero(shared >= needed)
+
+
+def top_matches(
+    queries: Sequence[str],
+    choices: np.ndarray,
+    limit: int,
+    min_score: int,
+    workers: int = -1,
+) -> List[Matches]:
+    """
+    token_set_ratio of every (normalized) query against its candidate choices
+    (GramPostings), all pairs of a block of queries scored by one cpdist call
+    on `workers` cores (-1 = all); below PREFILTER_MIN_SCORE every choice is
+    a candidate and the block is one cdist call.
+    Returns, per query, [(choice position, score)] best first, at most
+    `limit`, all >= min_score; ties in choice order.
+    """
+    # Repeated lines are scored once
+    distinct = list(dict.fromkeys(queries))
+    if len(distinct) < len(queries):
+        by_query = dict(zip(distinct, top_matches(distinct, choices, limit, min_score, workers)))
+        return [list(by_query[q]) for q in queries]
+
+    out: List[Matches] = [[] for _ in queries]
+    if len(choices) == 0:
+        return out
+
+    # No safe prefilter below PREFILTER_MIN_SCORE: each block is scored against every choice
+    postings = None if prefilter_overlap(min_score) is None else GramPostings(choices)
+    block_rows = max(1, BLOCK_PAIRS // len(choices))
+    for start in range(0, len(queries), block_rows):
+        block = range(start, min(start + block_rows, len(queries)))
+        if postings is None:
+            matrix = process.cdist(
+                [queries[q] for q in block], choices, scorer=fuzz.token_set_ratio,
+                score_cutoff=min_score, dtype=np.uint8, workers=workers,
+            )
+            rows, candidates = np.nonzero(matrix >= min_score)
+            lines, scores = rows + start, matrix[rows, candidates]
+            kept = np.array([bool(queries[q]) for q in lines], dtype=bool)
+            lines, candidates, scores = lines[kept], candidates[kept].astype(np.int64), scores[kept]
+        else:
+            lines, candidates = [], []
+            for q in block:
+                found = postings.candidates(queries[q], min_score) if queries[q] else []
+                lines.append(np.full(len(found), q, dtype=np.int64))
+                candidates.append(found)
+            lines, candidates = np.concatenate(lines), np.concatenate(candidates).astype(np.int64)
+            if not len(lines):
+                continue
+
+            scores = process.cpdist(
+                [queries[q] for q in lines], choices[candidates], scorer=fuzz.token_set_ratio,
+                score_cutoff=min_score, dtype=np.uint8, workers=workers,
+            )
+            kept = scores >= min_score
+            lines, candidates, scores = lines[kept], candidates[kept], scores[kept]
+
+        # Best first per query, ties in choice order; keep the first `limit` of each
+        order = np.lexsort((candidates, -scores.astype(np.int16), lines))
+        lines, candidates, scores = lines[order], candidates[order], scores[order]
+        firsts = np.searchsorted(lines, lines, side="left")
+        rank = np.arange(len(lines)) - firsts
+        for q, i, score in zip(lines[rank < limit], candidates[rank < limit], scores[rank < limit]):
+            out[q].append((int(i), int(score)))
+    return out
+
+
+def match_boq(
+    lines: pd.DataFrame,
+    db_path: str,
+    table: str,
+    description_column: str = "Item Description",
+    limit: int = 5,
+    min_score: int = 70,
+    workers: int = -1,
+) -> pd.DataFrame:
+    """
+    Top `limit` matching description keys of every line of `lines`, each with
+    its rate statistics per UOM under the line's Province / City / Invoice
+    Year (the LINE_FILTERS columns it has). Lines keep their columns after a
+    leading "Line" number; lines without a match get one row with empty
+    match columns.
+    """
+    lines = lines.reset_index(drop=True)
+    descriptions = load_descriptions(db_path, table)
+    queries = [
+        normalize_text(text) or text.strip().lower()
+        for text in lines[description_column].fillna("").astype(str)
+    ]
+    filters = [
+        lines[column].map(_filter_value) if column in lines.columns else pd.Series("(All)", index=lines.index)
+        for column in LINE_FILTERS.values()
+    ]
+    combos = pd.Series(list(zip(*filters)), index=lines.index)
+
+    parts = []
+    for combo, members in combos.groupby(combos, sort=False).groups.items():
+        # Only keys with rates under this line filter are candidates
+        stats = descriptions.merge(load_rollup(db_path, table, *combo), on=["desc_key", "uom"])
+        keys = stats.drop_duplicates("desc_key")["desc_key"].to_numpy(dtype=object)
+
+        picked = top_matches([queries[p] for p in members], keys, limit, min_score, workers)
+        scores = pd.DataFrame(
+            [(p + 1, rank, keys[i], score)
+             for p, hits in zip(members, picked)
+             for rank, (i, score) in enumerate(hits, start=1)],
+            columns=["Line", "Match", "desc_key", "Score"],
+        )
+        if not scores.empty:
+            parts.append(scores.merge(stats, on="desc_key"))
+
+    if not parts:
+        return lines.assign(Line=range(1, len(lines) + 1))[["Line", *lines.columns]]
+
+    rows = pd.concat(parts, ignore_index=True)
+    rows = rows.sort_values(["Line", "Match", "matches"], ascending=[True, True, False], kind="stable")
+    priced = format_rate_stats(rows).rename(
+        columns={"Item Description": "Matched Description", "UOM": "Matched UOM"}
+    )
+    priced["Mean"] = np.round(rows["rate_mean"].astype(float).to_numpy(), 2)
+    priced.insert(0, "Score", rows["Score"].to_numpy())
+    priced.insert(0, "Match", rows["Match"].to_numpy())
+    priced.insert(0, "Line", rows["Line"].to_numpy())
+
+    numbered = lines.copy()
+    numbered.insert(0, "Line", range(1, len(lines) + 1))
+    return numbered.merge(priced, on="Line", how="left")
+
+
+def read_lines(path: str, sheet=0) -> pd.DataFrame:
+    if path.lower().endswith((".xlsx", ".xlsm", ".xls")):
+        return pd.read_excel(path, sheet_name=sheet)
+    return pd.read_csv(path)
+
+
+def write_priced(df: pd.DataFrame, path: str):
+    if path.lower().endswith(".xlsx"):
+        df.to_excel(path, sheet_name="Priced BOQ", index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match a bill of quantities against the historical unit rates.")
+    parser.add_argument("input", help="CSV or Excel file of BOQ lines")
+    parser.add_argument("-o", "--output", help="CSV or .xlsx (default: <input>_priced with the input's extension)")
+    parser.add_argument("--sheet", default=0, help="Excel sheet name or index")
+    parser.add_argument("--description-column", default="Item Description")
+    parser.add_argument("--top", type=int, default=5, help="matches per line")
+    parser.add_argument("--min-score", type=int, default=70)
+    parser.add_argument("--workers", type=int, default=CONFIG.fuzzy_workers, help="cores for scoring (-1 = all)")
+    parser.add_argument("--db", default=CONFIG.db_path)
+    parser.add_argument("--table", default=CONFIG.table)
+    args = parser.parse_args()
+
+    if not has_table(args.db, rate_stats_table(args.table)):
+        parser.error(f"{args.db} has no rate statistics; re-run import_excel.py")
+
+    sheet = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+    lines = read_lines(args.input, sheet)
+    if args.description_column not in lines.columns:
+        parser.error(
+            f"no {args.description_column!r} column in {args.input} "
+            f"(columns: {', '.join(map(str, lines.columns))}); see --description-column"
+        )
+
+    start = time.perf_counter()
+    priced = match_boq(
+        lines, args.db, args.table, args.description_column,
+        limit=args.top, min_score=args.min_score, workers=args.workers,
+    )
+    elapsed = time.perf_counter() - start
+
+    stem, ext = os.path.splitext(args.input)
+    output = args.output or f"{stem}_priced{ext if ext.lower() in ('.csv', '.xlsx') else '.xlsx'}"
+    write_priced(priced, output)
+
+    unmatched = len(lines) - (priced.dropna(subset=["Match"])["Line"].nunique() if "Match" in priced else 0)
+    print(f"{len(lines)} lines matched in {elapsed:.2f}s ({unmatched} without a match) -> {output}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,115 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from src.config import CONFIG
+from src.db import tokenize
+from src.pool import db_version
+
+
+def result_cache_key(
+    mode: str,
+    query: str,
+    min_score: int,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    uom: str = "(All)",
+) -> Tuple:
+    """
+    Cache key for a search. Queries that tokenize the same ("Drywall  repair",
+    "drywall, repair") share an entry; min_score only matters for fuzzy.
+    """
+    terms = tuple(tokenize(query)) or (query.lower().strip(),)
+    score = min_score if mode == "fuzzy" else None
+    return mode, terms, score, year_filter, month_filter, province, city, uom
+
+
+class ResultCache:
+    """
+    LRU cache of search result frames (and match counts), bounded by their
+    memory size, shared by all sessions. Entries belong to one version of the database file and the
+    whole cache is dropped when import_excel.py rebuilds it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._versions: Dict[str, Tuple] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_version(self, db_path: str):
+        version = db_version(db_path)
+        if self._versions.get(db_path, version) != version:
+            stale = [k for k in self._entries if k[0] == db_path]
+            for k in stale:
+                self._bytes -= self._entries.pop(k)[1]
+            self._stats["invalidations"] += 1
+        self._versions[db_path] = version
+
+    def get(self, db_path: str, key: Tuple):
+        with self._lock:
+            self._check_version(db_path)
+            entry = self._entries.get((db_path,) + key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end((db_path,) + key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, db_path: str, key: Tuple, df):
+        """Store a result frame (or a small value such as a match count)."""
+        if isinstance(df, pd.DataFrame):
+            size = int(df.memory_usage(index=True, deep=True).sum())
+        else:
+            size = sys.getsizeof(df)
+        if size > self.max_bytes:
+            return  # would evict everything else for one entry
+
+        with self._lock:
+            self._check_version(db_path)
+            full_key = (db_path,) + key
+            old = self._entries.pop(full_key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[full_key] = (df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_RESULT_CACHE: Optional[ResultCache] = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache, sized from AppConfig."""
+    global _RESULT_CACHE
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = ResultCache(CONFIG.result_cache_max_bytes)
+        return _RESULT_CACHE
@@ -0,0 +1,256 @@
+"""
+In-memory columnar search backend (AppConfig.search_backend = "columnar"):
+the records are loaded once per database version into NumPy / categorical
+columns, descriptions pre-lowercased into Arrow string arrays, and searched
+with vectorized masks instead of a SQLite query (and a DataFrame built from
+it) per keystroke.
+
+Matching follows build_query_sql, so both backends find the same rows: in
+"ranked" mode every token must start a word of Item Description (words as
+the FTS5 unicode61 tokenizer splits and folds them, see fts_words), in
+"contains" mode be a substring of Item Description, File Name or GNC File
+(like the trigram search), or, for a query without tokens, the whole query
+a substring of the lowercased Item Description. Plus the four filters and
+the UOM facet. A database without the FTS5 / trigram index falls back to
+substrings of Item Description, like build_query_sql. _score is the number
+of matched tokens, so results come in rowid order. There is no bm25
+ranking; fuzzy search keeps its own index (src.fuzzy).
+"""
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.db import FACET_COLUMNS, fts_table, has_table, read_conn, tokenize, trigram_table
+from src.memindex import FilteredIndex, IndexCache
+from src.trace import count, span
+
+# Result columns, as build_search_sql names them after _score / _rowid
+RESULT_COLUMNS = (
+    "Invoice Year", "Invoice Month", "Province", "City", "Item Description",
+    "Qty", "UOM", "Unit Rate", "Subtotal", "GNC File", "File Name",
+)
+
+# Low-cardinality result columns, held as categoricals (codes + one copy of each value)
+CATEGORICAL_COLUMNS = ("Invoice Month", "Province", "City", "UOM", "File Name")
+
+
+def _decode(values: pd.Categorical, positions: np.ndarray) -> np.ndarray:
+    """Values of a categorical at `positions` as objects, missing -> None (like SQLite's NULL)."""
+    lookup = np.append(values.categories.to_numpy(dtype=object), None)
+    return lookup[values.codes[positions]]
+
+
+def fts_words(text: str) -> str:
+    """
+    `text` as the words FTS5's unicode61 tokenizer (remove_diacritics 2)
+    indexes, each preceded by a space, so " " + token is a substring exactly
+    when the token is a prefix of a word. Letters and numbers make words,
+    everything else separates them; diacritics are dropped, case folded.
+    """
+    out = [" "]
+    for ch in unicodedata.normalize("NFD", text):
+        category = unicodedata.category(ch)
+        if category == "Mn":
+            continue
+        if category[0] in "LN" or category == "Co":
+            out.append(ch.lower())
+        elif out[-1] != " ":
+            out.append(" ")
+    return "".join(out)
+
+
+def match_score(query: str) -> int:
+    """_score of every match of `query` (all tokens are required, so all score the same)."""
+    return len(tokenize(query))
+
+
+class ColumnarIndex(FilteredIndex):
+    """
+    Long-lived, in-memory copy of the records table's result columns and
+    filter codes (FilteredIndex), aligned by position with `rowids` (rowid
+    order), for the columnar search backend.
+    """
+
+    def __init__(self, df: pd.DataFrame, db_path: str = "", table: str = ""):
+        self.db_path = db_path
+        self.table = table
+        # Modes whose index the database lacks match like build_search_sql, as build_query_sql does
+        self.has_fts = bool(db_path) and has_table(db_path, fts_table(table))
+        self.has_trigram = bool(db_path) and has_table(db_path, trigram_table(table))
+
+        self.columns: Dict[str, object] = {
+            col: pd.Categorical(df[col]) if col in CATEGORICAL_COLUMNS else df[col].to_numpy()
+            for col in RESULT_COLUMNS
+        }
+        # Facets and the filters go by codes; the year column itself keeps its dtype
+        codes = {col: self.columns[col] for col in FACET_COLUMNS if col in CATEGORICAL_COLUMNS}
+        codes["Invoice Year"] = pd.Categorical(df["Invoice Year"])
+        super().__init__(df["_rowid"].to_numpy(dtype=np.int64), df["_month"], codes)
+
+        # Lowercased by SQLite's LOWER() at load, so matching folds case exactly like the SQL
+        self.descriptions = pa.array(df["_description"], type=pa.string(), from_pandas=True)
+        self.file_names = pa.array(df["_file_name"], type=pa.string(), from_pandas=True)
+        self.gnc_files = pa.array(df["_gnc_file"], type=pa.string(), from_pandas=True)
+        # Word-prefix matching for ranked mode; tokenized once per distinct description
+        codes, uniques = pd.factorize(df["Item Description"])
+        words = np.array([fts_words(str(d)) for d in uniques] + [None], dtype=object)
+        self.words = pa.array(words[codes], type=pa.string(), from_pandas=True)
+
+    @classmethod
+    def load(cls, db_path: str, table: str) -> "ColumnarIndex":
+        with read_conn(db_path) as conn:
+            df = pd.read_sql_query(
+                f'''SELECT
+                        rowid                   AS _rowid,
+                        "Invoice Month"         AS _month,
+                        LOWER("Item Description")          AS _description,
+                        LOWER("File Name")                 AS _file_name,
+                        LOWER(CAST("GNC File" AS TEXT))    AS _gnc_file,
+                        "Invoice Year"          AS "Invoice Year",
+                        "Invoice Month Name"    AS "Invoice Month",
+                        "Province"              AS "Province",
+                        "City"                  AS "City",
+                        "Item Description"      AS "Item Description",
+                        "Qty"                   AS "Qty",
+                        "UOM"                   AS "UOM",
+                        "Unit Rate"             AS "Unit Rate",
+                        "Subtotal"              AS "Subtotal",
+                        "GNC File"              AS "GNC File",
+                        "File Name"             AS "File Name"
+                    FROM "{table}"
+                    ORDER BY rowid''',
+                conn,
+            )
+        return cls(df, db_path, table)
+
+    def positions_of(self, rowids: np.ndarray) -> np.ndarray:
+        """Sorted positions of `rowids` in the index (rowids it doesn't have are dropped)."""
+        rowids = np.sort(np.asarray(rowids, dtype=np.int64))
+        positions = np.minimum(np.searchsorted(self.rowids, rowids), max(len(self) - 1, 0))
+        return positions[self.rowids[positions] == rowids] if len(self) else positions[:0]
+
+    def match(
+        self,
+        mode: str,
+        query: str,
+        year_filter: str,
+        month_filter: str,
+        province: str,
+        city: str,
+        month_name_to_num: Dict[str, int],
+        uom: str = "(All)",
+        within: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Positions of the rows matching a ranked / contains search, in rowid
+        order. Each token is only checked against the rows still matching,
+        starting from the positions `within` (sorted) when given.
+        """
+        mask = self.filter_mask(year_filter, month_filter, province, city, month_name_to_num, uom)
+        positions = np.flatnonzero(mask) if within is None else within[mask[within]]
+        terms = tokenize(query)
+        if not terms:
+            # build_search_sql's LIKE on the query itself ('%' / '_' are wildcards there too)
+            hit = pc.match_like(self.descriptions.take(positions), f"%{query.lower().strip()}%")
+            return positions[pc.fill_null(hit, False).to_numpy(zero_copy_only=False)]
+
+        columns, prefix = [self.descriptions], ""
+        if mode == "ranked" and self.has_fts:
+            columns, prefix = [self.words], " "
+        if mode == "contains" and self.has_trigram and any(len(t) >= 3 for t in terms):
+            columns += [self.file_names, self.gnc_files]
+
+        for t in terms:
+            if positions.size == 0:
+                break
+            hit = np.zeros(positions.size, dtype=bool)
+            for values in columns:
+                found = pc.match_substring(values.take(positions), prefix + t)
+                hit |= pc.fill_null(found, False).to_numpy(zero_copy_only=False)
+            positions = positions[hit]
+        return positions
+
+    def frame(self, positions: np.ndarray, score: int) -> pd.DataFrame:
+        """Result rows at `positions`, with build_search_sql's columns."""
+        data = {
+            "_score": np.full(len(positions), score, dtype=np.int64),
+            "_rowid": self.rowids[positions],
+        }
+        for col, values in self.columns.items():
+            data[col] = _decode(values, positions) if isinstance(values, pd.Categorical) else values[positions]
+        return pd.DataFrame(data)
+
+    def page(
+        self,
+        positions: np.ndarray,
+        score: int,
+        page_size: int,
+        after: Optional[Tuple[float, int]] = None,
+    ) -> pd.DataFrame:
+        """A keyset page of the matches (`after` as paginate_sql takes it; every match has the same _score)."""
+        start = 0 if after is None else int(np.searchsorted(self.rowids[positions], after[1], side="right"))
+        return self.frame(positions[start:start + page_size], score)
+
+    def facets(self, positions: np.ndarray) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        """
+        run_facets over the matches, counted per code: values most frequent
+        first, ties in value order (categories are sorted), missing values
+        counted in the total only.
+        """
+        facets = {}
+        for col in FACET_COLUMNS:
+            values = self.codes[col]
+            codes = values.codes[positions]
+            counts = np.bincount(codes[codes >= 0], minlength=len(values.categories))
+            present = np.flatnonzero(counts)
+            order = present[np.argsort(-counts[present], kind="stable")]
+            label = (lambda v: str(int(v))) if col == "Invoice Year" else str
+            facets[col] = {label(values.categories[i]): int(counts[i]) for i in order}
+        return len(positions), facets
+
+    def description_groups(self, positions: np.ndarray) -> pd.DataFrame:
+        """Matches per (Item Description, UOM), as description_groups_sql returns them."""
+        df = pd.DataFrame({
+            "Item Description": self.columns["Item Description"][positions],
+            "UOM": _decode(self.columns["UOM"], positions),
+        })
+        return df.groupby(["Item Description", "UOM"], dropna=False).size().reset_index(name="n")
+
+
+_COLUMNAR_INDEXES = IndexCache(ColumnarIndex.load, "columnar.index_build")
+
+
+def get_columnar_index(db_path: str, table: str) -> ColumnarIndex:
+    """The process-wide ColumnarIndex of the database (see IndexCache)."""
+    return _COLUMNAR_INDEXES.get(db_path, table)
+
+
+def columnar_search(
+    db_path: str,
+    table: str,
+    mode: str,
+    query: str,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    month_name_to_num: Dict[str, int],
+    uom: str = "(All)",
+    within_rowids: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Positions of the matches in the cached index (see ColumnarIndex.match),
+    only looking at `within_rowids` when given (a known superset of them).
+    """
+    index = get_columnar_index(db_path, table)
+    with span("columnar.match"):
+        within = None if within_rowids is None else index.positions_of(within_rowids)
+        positions = index.match(
+            mode, query, year_filter, month_filter, province, city, month_name_to_num, uom, within
+        )
+        count(rows_scanned=len(index) if within is None else len(within), rows_returned=len(positions))
+    return positions
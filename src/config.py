@@ -1,12 +1,36 @@
-from dataclasses import dataclass
-
-@dataclass(frozen=True)
-class AppConfig:
-    page_title: str = "Unit Rate Explorer"
-    layout: str = "wide"
-    db_path: str = "data.db"
-    table: str = "records"
-    logo_path: str = "logo.jpg"  # or logo.png
-    max_table_height_px: int = 520
-
-CONFIG = AppConfig()
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class AppConfig:
+    page_title: str = "Unit Rate Explorer"
+    layout: str = "wide"
+    db_path: str = "data.db"
+    table: str = "records"
+    logo_path: str = "logo.jpg"  # or logo.png
+    max_table_height_px: int = 520
+    page_size: int = 200  # result rows per page
+    export_chunk_rows: int = 10_000  # rows fetched per step when exporting all results
+    # Read-only connection pool shared by all sessions (src/pool.py)
+    db_pool_size: int = 8
+    db_mmap_size: int = 256 * 1024 * 1024
+    db_cache_size_kib: int = 64 * 1024
+    # "sqlite", or "columnar": ranked / contains searches run in memory on arrays loaded
+    # once per import (src/columnar.py), with LIKE-search matching and no bm25 ranking
+    search_backend: str = "sqlite"
+    # Search-as-you-type: a query refining the previous one (more / longer tokens) only
+    # searches the previous matches, fetched then if there are at most this many (0 = off)
+    incremental_max_rows: int = 100_000
+    # Shared search result cache (src/cache.py), LRU-evicted beyond this size
+    result_cache_max_bytes: int = 256 * 1024 * 1024
+    # Append every search query to this JSON-lines file for src/advisor.py ("" = off)
+    query_log_path: str = ""
+    # Per-stage timings of every app run / API request as JSON lines for src/trace.py ("" = off)
+    trace_log_path: str = ""
+    # Show those timings in a sidebar panel (also on with ?perf=1 in the URL)
+    perf_panel: bool = False
+    # Fuzzy scoring goes multi-core above this many candidates
+    fuzzy_parallel_threshold: int = 50_000
+    fuzzy_chunk_size: int = 100_000
+    fuzzy_workers: int = -1  # -1 = all cores
+
+CONFIG = AppConfig()
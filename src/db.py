@@ -1,227 +1,689 @@
-import sqlite3
-import pandas as pd
-from typing import Dict, List, Tuple
-import streamlit as st
-from rapidfuzz import process, fuzz
-
-def get_conn(db_path: str) -> sqlite3.Connection:
-    return sqlite3.connect(db_path, check_same_thread=False)
-
-
-@st.cache_data(show_spinner=False)
-def load_filter_options(
-    db_path: str, table: str
-) -> Tuple[List[str], List[str], List[str], List[str], Dict[str, int]]:
-    """
-    Returns: years, months(names), provinces, cities, month_name_to_num
-    """
-    conn = get_conn(db_path)
-
-    year_df = pd.read_sql_query(
-        f'''SELECT DISTINCT "Invoice Year" AS year FROM "{table}" WHERE "Invoice Year" IS NOT NULL ORDER BY year''',
-        conn,
-    )
-    month_df = pd.read_sql_query(
-        f'''SELECT DISTINCT "Invoice Month" AS month_num, "Invoice Month Name" AS month_name
-            FROM "{table}" WHERE "Invoice Month" IS NOT NULL ORDER BY month_num''',
-        conn,
-    )
-    prov_df = pd.read_sql_query(
-        f'''SELECT DISTINCT "Province" AS province FROM "{table}" WHERE "Province" IS NOT NULL ORDER BY province''',
-        conn,
-    )
-    city_df = pd.read_sql_query(
-        f'''SELECT DISTINCT "City" AS city FROM "{table}" WHERE "City" IS NOT NULL ORDER BY city''',
-        conn,
-    )
-
-    conn.close()
-
-    years = ["(All)"] + year_df["year"].dropna().astype(int).astype(str).tolist()
-    months = ["(All)"] + month_df["month_name"].dropna().tolist()
-    provinces = ["(All)"] + prov_df["province"].dropna().tolist()
-    cities = ["(All)"] + city_df["city"].dropna().tolist()
-    month_name_to_num = dict(zip(month_df["month_name"], month_df["month_num"]))
-
-    return years, months, provinces, cities, month_name_to_num
-
-def tokenize(q: str):
-    import re
-    q = q.lower()
-    terms = re.findall(r"[a-z0-9]+", q)
-    stop = {"and","or","the","a","an","to","of","for","in","on","with"}
-    terms = [t for t in terms if t not in stop and len(t) >= 2]
-    return terms
-
-def build_search_sql(
-    table: str,
-    query: str,
-    year_filter: str,
-    month_filter: str,
-    province: str,
-    city: str,
-    month_name_to_num: Dict[str, int],
-):
-
-    # --- NEW: tokenize and AND each token ---
-    terms = tokenize(query)
-
-    # WHERE: require all tokens (AND)
-    where = []
-    where_params = []
-
-    if terms:
-        for t in terms:
-            where.append('LOWER("Item Description") LIKE ?')
-            where_params.append(f"%{t}%")
-    else:
-        where.append('LOWER("Item Description") LIKE ?')
-        where_params.append(f"%{query.lower().strip()}%")
-
-    # Score: count how many tokens match (for sorting)
-    if terms:
-        score_exprs = ['CASE WHEN LOWER("Item Description") LIKE ? THEN 1 ELSE 0 END' for _ in terms]
-        score_sql = "(" + " + ".join(score_exprs) + ")"   # <-- parentheses are correct now
-        score_params = [f"%{t}%" for t in terms]
-    else:
-        score_sql = "0"
-        score_params = []
-
-    # Filters
-    if year_filter != "(All)":
-        where.append('"Invoice Year" = ?')
-        where_params.append(int(year_filter))
-    if month_filter != "(All)":
-        where.append('"Invoice Month" = ?')
-        where_params.append(int(month_name_to_num[month_filter]))
-    if province != "(All)":
-        where.append('"Province" = ?')
-        where_params.append(province)
-    if city != "(All)":
-        where.append('"City" = ?')
-        where_params.append(city)
-
-    where_sql = " AND ".join(where)
-
-    sql = f'''
-        SELECT
-            {score_sql} AS _score,
-            "Invoice Year"          AS "Invoice Year",
-            "Invoice Month Name"    AS "Invoice Month",
-            "Province"              AS "Province",
-            "City"                  AS "City",
-            "Item Description"      AS "Item Description",
-            "Qty"                   AS "Qty",
-            "UOM"                   AS "UOM",
-            "Unit Rate"             AS "Unit Rate",
-            "Subtotal"              AS "Subtotal",
-            "GNC File"             AS "GNC File",
-            "File Name"            AS "File Name"
-        FROM "{table}"
-        WHERE {where_sql}
-        ORDER BY _score DESC
-    '''
-    # IMPORTANT: score params come first, then WHERE params, then LIMIT
-    params = score_params + where_params
-
-    return sql, params
-
-#---------Fuzzy Logic----------------------------------
-
-def build_candidate_sql(
-    table: str,
-    year_filter: str,
-    month_filter: str,
-    province: str,
-    city: str,
-    month_name_to_num: Dict[str, int],
-    candidate_limit: int = 10000,  # for 10k total rows, ok
-):
-    """
-    Pull candidates based on filters only (no LIKE). Then fuzzy rank in Python.
-    """
-    where = ['"Item Description" IS NOT NULL']
-    params: List = []
-
-    if year_filter != "(All)":
-        where.append('"Invoice Year" = ?')
-        params.append(int(year_filter))
-    if month_filter != "(All)":
-        where.append('"Invoice Month" = ?')
-        params.append(int(month_name_to_num[month_filter]))
-    if province != "(All)":
-        where.append('"Province" = ?')
-        params.append(province)
-    if city != "(All)":
-        where.append('"City" = ?')
-        params.append(city)
-
-    where_sql = " AND ".join(where)
-
-    sql = f'''
-        SELECT
-            rowid as _rowid,
-            "Invoice Year"          AS "Invoice Year",
-            "Invoice Month Name"    AS "Invoice Month",
-            "Province"              AS "Province",
-            "City"                  AS "City",
-            "Item Description"      AS "Item Description",
-            "Qty"                   AS "Qty",
-            "UOM"                   AS "UOM",
-            "Unit Rate"             AS "Unit Rate",
-            "Subtotal"              AS "Subtotal",
-            "GNC File"             AS "GNC File",
-            "File Name"            AS "File Name"
-        FROM "{table}"
-        WHERE {where_sql}
-        LIMIT ?
-    '''
-    params.append(candidate_limit)
-    return sql, params
-
-
-def fuzzy_rank_results(df: pd.DataFrame, query: str, limit: int = 200, min_score: int = 70) -> pd.DataFrame:
-    """
-    Fuzzy-rank Item Description and return top matches.
-    Adds a 'Score' column.
-    """
-    if df.empty:
-        return df
-
-    choices = df["Item Description"].fillna("").astype(str).tolist()
-
-    terms = tokenize(query)
-    norm_query = " ".join(terms) if terms else query.strip()
-
-    if not norm_query:
-        return df.iloc[0:0].copy()
-
-    # Returns list of tuples: (matched_text, score, index)
-    matches = process.extract(
-        norm_query,
-        choices,
-        scorer=fuzz.token_set_ratio, #fuzz.WRatio,
-        limit=min(limit * 10, len(choices)),  # grab more then filter by score
-    )
-
-    picked = []
-    for _, score, idx in matches:
-        if score >= min_score:
-            picked.append((idx, score))
-        if len(picked) >= limit:
-            break
-
-    if not picked:
-        return df.iloc[0:0].copy()  # empty same columns
-
-    out = df.iloc[[i for i, _ in picked]].copy()
-    out.insert(0, "Score", [s for _, s in picked])
-    out = out.sort_values("Score", ascending=False)
-    return out
-
-
-def run_search(db_path: str, sql: str, params: List) -> pd.DataFrame:
-    conn = get_conn(db_path)
-    df = pd.read_sql_query(sql, conn, params=params)
-    conn.close()
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple
+from src.config import CONFIG
+from src.pool import db_version, get_pool
+from src.trace import count, current_trace, span, traced
+
+# Every search query ends with this; _rowid breaks ties so keyset pages are stable
+ORDER_BY = "ORDER BY _score DESC, _rowid"
+
+# Search modes offered in the UI and the API, the default first: "contains" finds
+# every substring match the original LIKE search did, "ranked" only word starts.
+# Fuzzy search is a separate switch, served by src.fuzzy.
+SEARCH_MODES = ("contains", "ranked")
+
+
+def get_conn(db_path: str) -> sqlite3.Connection:
+    return sqlite3.connect(db_path, check_same_thread=False)
+
+
+def read_conn(db_path: str):
+    """
+    Pooled read-only connection (context manager); use this for queries
+    instead of opening a fresh connection per call.
+    """
+    return get_pool(db_path).connection()
+
+
+# SQLite VM instructions per progress-handler call, the vm_steps counter's resolution
+VM_STEP_SAMPLE = 1000
+
+
+@contextmanager
+def counted(conn: sqlite3.Connection):
+    """
+    While tracing, count the SQLite VM instructions a query runs (vm_steps,
+    the rows-scanned proxy SQLite exposes to Python) on the current span.
+    """
+    if current_trace() is None:
+        yield
+        return
+    steps = [0]
+
+    def tick():
+        steps[0] += 1
+        return 0
+
+    conn.set_progress_handler(tick, VM_STEP_SAMPLE)
+    try:
+        yield
+    finally:
+        conn.set_progress_handler(None, 0)
+        count(vm_steps=steps[0] * VM_STEP_SAMPLE)
+
+
+_QUERY_LOG_LOCK = threading.Lock()
+
+
+def log_query(sql: str, params: List):
+    """
+    Append a search query to AppConfig.query_log_path (JSON lines), the
+    workload `python -m src.advisor --log ...` explains. Off when the path is empty.
+    """
+    if not CONFIG.query_log_path:
+        return
+    line = json.dumps({"sql": sql, "params": list(params)}, default=str)
+    with _QUERY_LOG_LOCK, open(CONFIG.query_log_path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def fts_table(table: str) -> str:
+    """Name of the FTS5 index built by import_excel.py for `table`."""
+    return f"{table}_fts"
+
+
+def trigram_table(table: str) -> str:
+    """Name of the trigram (substring) index built by import_excel.py for `table`."""
+    return f"{table}_trigram"
+
+
+# Columns covered by the trigram index, in index column order
+TRIGRAM_COLUMNS = ("Item Description", "File Name", "GNC File")
+
+
+def has_table(db_path: str, name: str) -> bool:
+    with read_conn(db_path) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (name,)
+        ).fetchone()
+    return row is not None
+
+
+# Low-cardinality TEXT columns `import_excel.py --schema normalized` stores as
+# integer ids into one dictionary table each (column -> table / id column stem)
+ENCODED_COLUMNS = {
+    "Province": "province",
+    "City": "city",
+    "UOM": "uom",
+    "Invoice Month Name": "month_name",
+    "File Name": "file_name",
+}
+
+
+def data_table(table: str) -> str:
+    """Name of the normalized schema's fact table; `table` is then a view over it."""
+    return f"{table}_data"
+
+
+def dictionary_table(table: str, column: str) -> str:
+    """Name of the (id, value) dictionary table of an ENCODED_COLUMNS column."""
+    return f"{table}_{ENCODED_COLUMNS[column]}"
+
+
+def id_column(column: str) -> str:
+    """The fact table's integer id column for an ENCODED_COLUMNS column."""
+    return f"{ENCODED_COLUMNS[column]}_id"
+
+
+def is_normalized(db_path: str, table: str) -> bool:
+    """Whether `table` was imported with --schema normalized (see _filter_clauses)."""
+    return has_table(db_path, data_table(table))
+
+
+def dims_table(table: str) -> str:
+    """Name of the filter dimension table built by import_excel.py for `table`."""
+    return f"{table}_dims"
+
+
+def dims_sql(table: str, materialized: bool = True) -> str:
+    """
+    Row counts per (province, city, year, month): read from the dimension
+    table, or (materialized=False) the GROUP BY over the records table that
+    import_excel.py builds it with.
+    """
+    if materialized:
+        return f'''SELECT province, city, year, month, month_name, n FROM "{dims_table(table)}"'''
+    return f'''
+        SELECT
+            "Province"            AS province,
+            "City"                AS city,
+            "Invoice Year"        AS year,
+            "Invoice Month"       AS month,
+            "Invoice Month Name"  AS month_name,
+            COUNT(*)              AS n
+        FROM "{table}"
+        GROUP BY 1, 2, 3, 4, 5
+    '''
+
+
+@lru_cache(maxsize=4)
+def _load_filter_dims(db_path: str, table: str, version: Tuple) -> pd.DataFrame:
+    materialized = has_table(db_path, dims_table(table))
+    with read_conn(db_path) as conn:
+        return pd.read_sql_query(dims_sql(table, materialized), conn)
+
+
+@traced("db.load_filter_dims")
+def load_filter_dims(db_path: str, table: str) -> pd.DataFrame:
+    """
+    Everything the filter dropdowns need, in one small query (see dims_sql).
+    Databases built before the dimension table existed aggregate the records
+    table instead. Reloaded when import_excel.py rewrites the DB.
+    """
+    return _load_filter_dims(db_path, table, db_version(db_path))
+
+
+def _counts(dims: pd.DataFrame, col: str, sort_by: str = "") -> Dict[str, int]:
+    present = dims[dims[col].notna()]
+    counts = present.groupby(col, sort=False)["n"].sum()
+    if sort_by:
+        order = present.groupby(col, sort=False)[sort_by].min()
+        counts = counts[order.sort_values(kind="stable").index]
+    else:
+        counts = counts.sort_index()
+    return {str(k): int(v) for k, v in counts.items()}
+
+
+def filter_options(
+    dims: pd.DataFrame, year_filter: str = "(All)", province: str = "(All)"
+) -> Dict[str, Dict[str, int]]:
+    """
+    Dropdown values with their row counts, in display order: every year and
+    province; months of the selected year; cities of the selected province.
+    """
+    years = dims[dims["year"].notna()].assign(year=lambda d: d["year"].astype(int).astype(str))
+
+    in_year = dims
+    if year_filter != "(All)":
+        in_year = dims[dims["year"] == int(year_filter)]
+    in_province = dims
+    if province != "(All)":
+        in_province = dims[dims["province"] == province]
+
+    return {
+        "year": _counts(years, "year"),
+        "month": _counts(in_year, "month_name", sort_by="month"),
+        "province": _counts(dims, "province"),
+        "city": _counts(in_province, "city"),
+    }
+
+
+def month_numbers(dims: pd.DataFrame) -> Dict[str, int]:
+    """Month name -> number, as used by the filter clauses."""
+    months = dims[dims["month"].notna()].drop_duplicates("month_name")
+    return {name: int(num) for name, num in zip(months["month_name"], months["month"])}
+
+def tokenize(q: str):
+    import re
+    q = q.lower()
+    terms = re.findall(r"[a-z0-9]+", q)
+    stop = {"and","or","the","a","an","to","of","for","in","on","with"}
+    terms = [t for t in terms if t not in stop and len(t) >= 2]
+    return terms
+
+def build_search_sql(
+    table: str,
+    query: str,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    month_name_to_num: Dict[str, int],
+    uom: str = "(All)",
+    normalized: bool = False,
+):
+
+    # --- NEW: tokenize and AND each token ---
+    terms = tokenize(query)
+
+    # WHERE: require all tokens (AND)
+    where = []
+    where_params = []
+
+    if terms:
+        for t in terms:
+            where.append('LOWER("Item Description") LIKE ?')
+            where_params.append(f"%{t}%")
+    else:
+        where.append('LOWER("Item Description") LIKE ?')
+        where_params.append(f"%{query.lower().strip()}%")
+
+    # Score: count how many tokens match (for sorting)
+    if terms:
+        score_exprs = ['CASE WHEN LOWER("Item Description") LIKE ? THEN 1 ELSE 0 END' for _ in terms]
+        score_sql = "(" + " + ".join(score_exprs) + ")"   # <-- parentheses are correct now
+        score_params = [f"%{t}%" for t in terms]
+    else:
+        score_sql = "0"
+        score_params = []
+
+    # Filters
+    filter_where, filter_params = _filter_clauses(
+        year_filter, month_filter, province, city, month_name_to_num, uom,
+        normalized_table=table if normalized else "",
+    )
+    where += filter_where
+    where_params += filter_params
+
+    where_sql = " AND ".join(where)
+
+    sql = f'''
+        SELECT
+            {score_sql} AS _score,
+            rowid                   AS _rowid,
+            "Invoice Year"          AS "Invoice Year",
+            "Invoice Month Name"    AS "Invoice Month",
+            "Province"              AS "Province",
+            "City"                  AS "City",
+            "Item Description"      AS "Item Description",
+            "Qty"                   AS "Qty",
+            "UOM"                   AS "UOM",
+            "Unit Rate"             AS "Unit Rate",
+            "Subtotal"              AS "Subtotal",
+            "GNC File"             AS "GNC File",
+            "File Name"            AS "File Name"
+        FROM "{table}"
+        WHERE {where_sql}
+        {ORDER_BY}
+    '''
+    # IMPORTANT: score params come first, then WHERE params, then LIMIT
+    params = score_params + where_params
+
+    return sql, params
+
+def _filter_clauses(
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    month_name_to_num: Dict[str, int],
+    uom: str = "(All)",
+    alias: str = "",
+    normalized_table: str = "",
+) -> Tuple[List[str], List]:
+    """
+    WHERE clauses + params for the four dropdown filters and the UOM facet.
+    `alias` prefixes the column names when the records table is joined (e.g. "r.").
+    With `normalized_table` (a --schema normalized database) Province, City and
+    UOM compare the view's integer id columns, each value's id looked up once
+    in its dictionary table, instead of strings.
+    """
+    where: List[str] = []
+    params: List = []
+
+    def equals(column: str, value: str):
+        if normalized_table:
+            where.append(
+                f'{alias}"{id_column(column)}" = '
+                f'(SELECT id FROM "{dictionary_table(normalized_table, column)}" WHERE value = ?)'
+            )
+        else:
+            where.append(f'{alias}"{column}" = ?')
+        params.append(value)
+
+    if year_filter != "(All)":
+        where.append(f'{alias}"Invoice Year" = ?')
+        params.append(int(year_filter))
+    if month_filter != "(All)":
+        where.append(f'{alias}"Invoice Month" = ?')
+        params.append(int(month_name_to_num[month_filter]))
+    if province != "(All)":
+        equals("Province", province)
+    if city != "(All)":
+        equals("City", city)
+    if uom != "(All)":
+        equals("UOM", uom)
+
+    return where, params
+
+
+def fts_match_expr(terms: List[str]) -> str:
+    """
+    FTS5 MATCH expression: every token required, each as a prefix query so a
+    partial word ('dryw') still finds 'drywall'.
+    """
+    return " AND ".join(f'"{t}"*' for t in terms)
+
+
+def build_fts_search_sql(
+    table: str,
+    query: str,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    month_name_to_num: Dict[str, int],
+    uom: str = "(All)",
+    normalized: bool = False,
+):
+    """
+    Ranked search through the FTS5 index on Item Description.
+    Tokens are ANDed like build_search_sql, but matched via the index and
+    ranked with bm25(); filters are applied on the records joined back by rowid.
+    """
+    terms = tokenize(query)
+    if not terms:
+        # Nothing the index can match on (stopwords / 1-char input): plain LIKE
+        return build_search_sql(
+            table, query, year_filter, month_filter, province, city, month_name_to_num, uom, normalized
+        )
+
+    fts = fts_table(table)
+    where, where_params = _filter_clauses(
+        year_filter, month_filter, province, city, month_name_to_num, uom, alias="r.",
+        normalized_table=table if normalized else "",
+    )
+    where_sql = "".join(f" AND {w}" for w in where)
+
+    # bm25() is "lower is better", negate so _score sorts like the LIKE path
+    sql = f'''
+        SELECT
+            -bm25({fts})              AS _score,
+            r.rowid                   AS _rowid,
+            r."Invoice Year"          AS "Invoice Year",
+            r."Invoice Month Name"    AS "Invoice Month",
+            r."Province"              AS "Province",
+            r."City"                  AS "City",
+            r."Item Description"      AS "Item Description",
+            r."Qty"                   AS "Qty",
+            r."UOM"                   AS "UOM",
+            r."Unit Rate"             AS "Unit Rate",
+            r."Subtotal"              AS "Subtotal",
+            r."GNC File"              AS "GNC File",
+            r."File Name"             AS "File Name"
+        FROM {fts}
+        JOIN "{table}" AS r ON r.rowid = {fts}.rowid
+        WHERE {fts} MATCH ?{where_sql}
+        {ORDER_BY}
+    '''
+    params = [fts_match_expr(terms)] + where_params
+
+    return sql, params
+
+
+def build_substring_search_sql(
+    table: str,
+    query: str,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    month_name_to_num: Dict[str, int],
+    uom: str = "(All)",
+    normalized: bool = False,
+):
+    """
+    "Contains" search through the trigram index over Item Description,
+    File Name and GNC File. Every token must appear somewhere in one of those
+    columns (AND across tokens, any column per token).
+
+    Trigrams need 3+ characters, so 2-character tokens are checked with LIKE
+    on the rows the index already narrowed down.
+    """
+    terms = tokenize(query)
+    long_terms = [t for t in terms if len(t) >= 3]
+    if not long_terms:
+        return build_search_sql(
+            table, query, year_filter, month_filter, province, city, month_name_to_num, uom, normalized
+        )
+
+    tri = trigram_table(table)
+    where, where_params = [], []
+
+    for t in terms:
+        if len(t) >= 3:
+            continue
+        any_col = " OR ".join(f'LOWER(r."{c}") LIKE ?' for c in TRIGRAM_COLUMNS)
+        where.append(f"({any_col})")
+        where_params += [f"%{t}%"] * len(TRIGRAM_COLUMNS)
+
+    filter_where, filter_params = _filter_clauses(
+        year_filter, month_filter, province, city, month_name_to_num, uom, alias="r.",
+        normalized_table=table if normalized else "",
+    )
+    where += filter_where
+    where_params += filter_params
+    where_sql = "".join(f" AND {w}" for w in where)
+
+    # Each token is a phrase of its trigrams, i.e. a substring match
+    match = " AND ".join(f'"{t}"' for t in long_terms)
+
+    sql = f'''
+        SELECT
+            -bm25({tri})              AS _score,
+            r.rowid                   AS _rowid,
+            r."Invoice Year"          AS "Invoice Year",
+            r."Invoice Month Name"    AS "Invoice Month",
+            r."Province"              AS "Province",
+            r."City"                  AS "City",
+            r."Item Description"      AS "Item Description",
+            r."Qty"                   AS "Qty",
+            r."UOM"                   AS "UOM",
+            r."Unit Rate"             AS "Unit Rate",
+            r."Subtotal"              AS "Subtotal",
+            r."GNC File"              AS "GNC File",
+            r."File Name"             AS "File Name"
+        FROM {tri}
+        JOIN "{table}" AS r ON r.rowid = {tri}.rowid
+        WHERE {tri} MATCH ?{where_sql}
+        {ORDER_BY}
+    '''
+    params = [match] + where_params
+
+    return sql, params
+
+
+def build_query_sql(
+    db_path: str,
+    mode: str,
+    table: str,
+    query: str,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    month_name_to_num: Dict[str, int],
+    uom: str = "(All)",
+):
+    """
+    Pick the SQL builder for a search mode. "ranked" needs the FTS5 index and
+    "contains" the trigram index; databases built before they existed fall
+    back to the LIKE search. Filters of a --schema normalized database compare ids.
+    """
+    args = (
+        table, query, year_filter, month_filter, province, city, month_name_to_num, uom,
+        is_normalized(db_path, table),
+    )
+
+    if mode == "ranked" and has_table(db_path, fts_table(table)):
+        return build_fts_search_sql(*args)
+    if mode == "contains" and has_table(db_path, trigram_table(table)):
+        return build_substring_search_sql(*args)
+    return build_search_sql(*args)
+
+def _strip_order_by(sql: str) -> str:
+    sql = sql.rstrip()
+    if not sql.endswith(ORDER_BY):
+        raise ValueError("expected a search query ending with ORDER_BY")
+    return sql[: -len(ORDER_BY)]
+
+
+def paginate_sql(
+    sql: str,
+    params: List,
+    page_size: int,
+    after: Optional[Tuple[float, int]] = None,
+) -> Tuple[str, List]:
+    """
+    Keyset page of a search query from the builders above: the `page_size`
+    rows following `after` = (_score, _rowid) of the previous page's last
+    row (None for the first page). Only the page is read into Python.
+    """
+    inner = _strip_order_by(sql)
+    page_params = list(params)
+    keyset = ""
+    if after is not None:
+        keyset = "WHERE _score < ? OR (_score = ? AND _rowid > ?)"
+        page_params += [after[0], after[0], after[1]]
+
+    page_sql = f'''
+        SELECT * FROM ({inner}) {keyset}
+        {ORDER_BY}
+        LIMIT ?
+    '''
+    page_params.append(page_size)
+    return page_sql, page_params
+
+
+def count_sql(sql: str, params: List) -> Tuple[str, List]:
+    """Total number of matches of a search query (run separately from the pages)."""
+    return f"SELECT COUNT(*) AS n FROM ({_strip_order_by(sql)})", list(params)
+
+
+def within_rowids_sql(sql: str, params: List, rowids: Sequence[int]) -> Tuple[str, List]:
+    """
+    A search query narrowed to `rowids`, a known superset of its matches (the
+    previous query's when this one refines it), still ending with ORDER_BY.
+    SQLite pushes the rowid list into the query, so a LIKE search reads those
+    rows by rowid instead of scanning the table.
+    """
+    return (
+        f"SELECT * FROM ({_strip_order_by(sql)}) WHERE _rowid IN (SELECT value FROM json_each(?)) {ORDER_BY}",
+        list(params) + [json.dumps([int(r) for r in rowids])],
+    )
+
+
+def rowids_sql(sql: str, params: List) -> Tuple[str, List]:
+    """The _rowid of every match of a search query."""
+    return f"SELECT _rowid FROM ({_strip_order_by(sql)})", list(params)
+
+
+# Result columns reported as facets (each one can be applied as a filter)
+FACET_COLUMNS = ("Province", "City", "Invoice Year", "UOM")
+
+
+def facet_sql(sql: str, params: List) -> Tuple[str, List]:
+    """
+    Match count per combination of FACET_COLUMNS over a search query's matches.
+    One GROUP BY pass gives the total and every facet (see facet_counts), so it
+    replaces count_sql instead of adding a query per facet.
+    """
+    cols = ", ".join(f'"{c}"' for c in FACET_COLUMNS)
+    return (
+        f"SELECT {cols}, COUNT(*) AS n FROM ({_strip_order_by(sql)}) GROUP BY {cols}",
+        list(params),
+    )
+
+
+def facet_counts(groups: pd.DataFrame) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """
+    (total, {facet column: {value: count}}) from facet_sql's rows, values
+    most frequent first. Missing values are counted in the total only.
+    """
+    total = int(groups["n"].sum())
+    facets = {}
+    for col in FACET_COLUMNS:
+        values = groups[col]
+        if col == "Invoice Year":
+            values = pd.to_numeric(values, errors="coerce").astype("Int64").astype(str).replace("<NA>", None)
+        counts = groups["n"].groupby(values.astype(object).where(values.notna(), None)).sum()
+        counts = counts.sort_index().sort_values(ascending=False, kind="stable")
+        facets[col] = {str(k): int(v) for k, v in counts.items()}
+    return total, facets
+
+
+def frame_facets(df: pd.DataFrame) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """facet_counts for results already in memory (fuzzy top-k)."""
+    groups = df.groupby(list(FACET_COLUMNS), dropna=False).size().reset_index(name="n")
+    return facet_counts(groups)
+
+
+@traced("db.run_facets")
+def run_facets(db_path: str, sql: str, params: List) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    return facet_counts(run_search(db_path, *facet_sql(sql, params)))
+
+
+def description_groups_sql(sql: str, params: List) -> Tuple[str, List]:
+    """Match count per (Item Description, UOM) of a search query, for the rate statistics."""
+    return (
+        f'SELECT "Item Description", "UOM", COUNT(*) AS n FROM ({_strip_order_by(sql)}) GROUP BY 1, 2',
+        list(params),
+    )
+
+
+def result_column_types(db_path: str, sql: str, params: List) -> Dict[str, str]:
+    """
+    Storage class of each result column of a search query, over all its rows:
+    'text' if any value is text (or blob), else 'real' if any is a float,
+    else 'integer', or 'null' when the column is entirely NULL.
+    """
+    inner = _strip_order_by(sql)
+    with read_conn(db_path) as conn:
+        columns = [d[0] for d in conn.execute(f"SELECT * FROM ({inner}) LIMIT 0", params).description]
+        flags = []
+        for col in columns:
+            quoted = '"' + col.replace('"', '""') + '"'
+            flags += [
+                f"MAX(typeof({quoted}) IN ('text', 'blob'))",
+                f"MAX(typeof({quoted}) = 'real')",
+                f"MAX(typeof({quoted}) = 'integer')",
+            ]
+        # Materialized, so SQLite doesn't flatten the search into the aggregate (no bm25() there)
+        row = conn.execute(
+            f"WITH r AS MATERIALIZED ({inner}) SELECT {', '.join(flags)} FROM r", params
+        ).fetchone()
+
+    types = {}
+    for i, col in enumerate(columns):
+        is_text, is_real, is_int = row[3 * i:3 * i + 3]
+        types[col] = "text" if is_text else "real" if is_real else "integer" if is_int else "null"
+    return types
+
+
+def page_cursor(page_df: pd.DataFrame) -> Optional[Tuple[float, int]]:
+    """`after` for the page following `page_df`."""
+    if page_df.empty:
+        return None
+    last = page_df.iloc[-1]
+    return float(last["_score"]), int(last["_rowid"])
+
+
+@traced("db.run_count")
+def run_count(db_path: str, sql: str, params: List) -> int:
+    log_query(sql, params)
+    with read_conn(db_path) as conn, counted(conn):
+        return int(conn.execute(sql, params).fetchone()[0])
+
+
+def run_search(db_path: str, sql: str, params: List) -> pd.DataFrame:
+    log_query(sql, params)
+    with span("db.run_search"):
+        with read_conn(db_path) as conn, counted(conn):
+            df = pd.read_sql_query(sql, conn, params=params)
+        count(rows_returned=len(df))
+    return df
+
+
+@traced("db.fetch_rows_by_rowid")
+def fetch_rows_by_rowid(db_path: str, table: str, rowids: List[int]) -> pd.DataFrame:
+    """
+    Full result rows for the given rowids, in the given order.
+    Same columns as the search builders, less _score.
+    """
+    placeholders = ", ".join("?" for _ in rowids) or "NULL"
+    sql = f'''
+        SELECT
+            rowid as _rowid,
+            "Invoice Year"          AS "Invoice Year",
+            "Invoice Month Name"    AS "Invoice Month",
+            "Province"              AS "Province",
+            "City"                  AS "City",
+            "Item Description"      AS "Item Description",
+            "Qty"                   AS "Qty",
+            "UOM"                   AS "UOM",
+            "Unit Rate"             AS "Unit Rate",
+            "Subtotal"              AS "Subtotal",
+            "GNC File"             AS "GNC File",
+            "File Name"            AS "File Name"
+        FROM "{table}"
+        WHERE rowid IN ({placeholders})
+    '''
+    df = run_search(db_path, sql, list(rowids))
+    order = {rowid: i for i, rowid in enumerate(rowids)}
+    df = df.sort_values("_rowid", key=lambda s: s.map(order)).reset_index(drop=True)
     return df
\ No newline at end of file
@@ -0,0 +1,192 @@
+import csv
+import io
+import tempfile
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from src.db import read_conn, result_column_types
+from src.trace import count, span
+
+# label -> (file extension, mime type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+# Internal columns of the search queries, not shown in the table nor exported
+HIDDEN_COLUMNS = ("_score", "Score", "_rowid")
+
+# Exports are written to a temp file that only moves to disk past this size
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+ARROW_TYPES = {"text": pa.string(), "real": pa.float64(), "integer": pa.int64(), "null": pa.string()}
+
+Rows = List[tuple]
+
+
+# ---------------- Sources ----------------
+
+def sql_rows(db_path: str, sql: str, params: List, chunk_rows: int) -> Tuple[List[str], Iterator[Rows]]:
+    """
+    Column names and an iterator over the rows of a search query, fetched
+    `chunk_rows` at a time from one cursor (nothing else is held in memory).
+    """
+    with read_conn(db_path) as conn:
+        columns = [d[0] for d in conn.execute(f"SELECT * FROM ({sql}) LIMIT 0", params).description]
+
+    def chunks() -> Iterator[Rows]:
+        with read_conn(db_path) as conn:
+            cur = conn.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    return
+                yield rows
+
+    return columns, chunks()
+
+
+def frame_rows(df: pd.DataFrame, chunk_rows: int) -> Tuple[List[str], Iterator[Rows]]:
+    """Same as sql_rows for results already in memory (fuzzy top-k)."""
+    def chunks() -> Iterator[Rows]:
+        for start in range(0, len(df), chunk_rows):
+            part = df.iloc[start:start + chunk_rows].astype(object)
+            yield list(part.where(part.notna(), None).itertuples(index=False, name=None))
+
+    return list(df.columns), chunks()
+
+
+def frame_column_types(df: pd.DataFrame) -> Dict[str, str]:
+    """result_column_types for a DataFrame."""
+    types = {}
+    for col in df.columns:
+        values = df[col].dropna()
+        if values.map(lambda v: isinstance(v, (str, bytes))).any():
+            types[col] = "text"
+        elif values.map(lambda v: isinstance(v, (float, np.floating))).any():
+            types[col] = "real"
+        elif len(values):
+            types[col] = "integer"
+        else:
+            types[col] = "null"
+    return types
+
+
+# ---------------- Shaping ----------------
+
+def _year_text(value) -> str:
+    """Invoice Year as shown in the table (2025.0 -> '2025', missing -> '')."""
+    try:
+        return str(int(float(value)))
+    except (TypeError, ValueError, OverflowError):
+        return ""
+
+
+def _shaped(columns: List[str], chunks: Iterator[Rows]) -> Tuple[List[str], Iterator[Rows]]:
+    """
+    Rows as the results table shows them: S. No. first, internal columns
+    dropped and Invoice Year formatted (see format_output_df).
+    """
+    keep = [i for i, col in enumerate(columns) if col not in HIDDEN_COLUMNS]
+    header = ["S. No."] + [columns[i] for i in keep]
+    year = columns.index("Invoice Year") if "Invoice Year" in columns else -1
+
+    def rows() -> Iterator[Rows]:
+        serial = 0
+        for chunk in chunks:
+            out = []
+            for row in chunk:
+                serial += 1
+                out.append((serial,) + tuple(
+                    _year_text(row[i]) if i == year else row[i] for i in keep
+                ))
+            yield out
+
+    return header, rows()
+
+
+# ---------------- Writers ----------------
+
+def write_csv(header: List[str], chunks: Iterator[Rows], out: BinaryIO):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(header)
+    for rows in chunks:
+        writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+def write_xlsx(header: List[str], chunks: Iterator[Rows], out: BinaryIO):
+    # write_only streams rows to the sheet instead of building a cell grid
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Search Results")
+    ws.append(header)
+    for rows in chunks:
+        for row in rows:
+            ws.append(row)
+    wb.save(out)
+
+
+def write_parquet(header: List[str], chunks: Iterator[Rows], out: BinaryIO, types: Dict[str, str]):
+    """One row group per chunk; `types` (storage class per column) fixes the schema up front."""
+    schema = pa.schema([(col, ARROW_TYPES[types.get(col, "text")]) for col in header])
+    text_columns = {i for i, field in enumerate(schema) if field.type == pa.string()}
+
+    with pq.ParquetWriter(out, schema) as writer:
+        wrote = False
+        for rows in chunks:
+            if not rows:
+                continue
+            columns = [list(values) for values in zip(*rows)]
+            for i in text_columns:
+                columns[i] = [None if v is None else str(v) for v in columns[i]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type, from_pandas=True) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            wrote = True
+        if not wrote:
+            writer.write_table(schema.empty_table())
+
+
+def _write(fmt: str, columns: List[str], chunks: Iterator[Rows], types: Dict[str, str]) -> BinaryIO:
+    header, rows = _shaped(columns, chunks)
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+    ext = EXPORT_FORMATS[fmt][0]
+    with span(f"export.write_{ext}"):
+        if ext == "csv":
+            write_csv(header, rows, out)
+        elif ext == "xlsx":
+            write_xlsx(header, rows, out)
+        else:
+            types = {**types, "S. No.": "integer", "Invoice Year": "text"}
+            write_parquet(header, rows, out, types)
+        count(bytes=out.tell())
+
+    out.seek(0)
+    return out
+
+
+def export_sql(fmt: str, db_path: str, sql: str, params: List, chunk_rows: int = 10_000) -> BinaryIO:
+    """
+    Every row of a search query (not just the current page) as a file in
+    `fmt` (a key of EXPORT_FORMATS), streamed from SQLite chunk by chunk.
+    """
+    types = result_column_types(db_path, sql, params) if fmt == "Parquet" else {}
+    columns, chunks = sql_rows(db_path, sql, params, chunk_rows)
+    return _write(fmt, columns, chunks, types)
+
+
+def export_frame(fmt: str, df: pd.DataFrame, chunk_rows: int = 10_000) -> BinaryIO:
+    """export_sql for results already in memory."""
+    types = frame_column_types(df) if fmt == "Parquet" else {}
+    columns, chunks = frame_rows(df, chunk_rows)
+    return _write(fmt, columns, chunks, types)
\ No newline at end of file
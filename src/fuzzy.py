@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from rapidfuzz import process, fuzz
+
+from src.db import fetch_rows_by_rowid, has_table, read_conn, tokenize
+from src.memindex import FilteredIndex, IndexCache
+from src.trace import count, span, traced
+
+
+def normalize_text(text: str) -> str:
+    """Same normalization as the query side: lowercase alnum tokens, stopwords dropped."""
+    return " ".join(tokenize(text))
+
+
+def top_k_scores(
+    norm_query: str,
+    choices: np.ndarray,
+    limit: int,
+    min_score: int,
+    parallel_threshold: int = 50_000,
+    chunk_size: int = 100_000,
+    workers: int = -1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    token_set_ratio of `norm_query` against every choice, keeping the best
+    `limit` with score >= min_score. Returns (positions, scores), best first,
+    ties in choice order (like process.extract).
+
+    Above `parallel_threshold` choices the work is split into `chunk_size`
+    chunks scored on `workers` cores (-1 = all), merging each chunk's top-k.
+    rapidfuzz parallelizes cdist over its first argument, so the parallel path
+    puts the choices there (token_set_ratio is symmetric).
+    """
+    n = len(choices)
+    parallel = n >= parallel_threshold
+    step = chunk_size if parallel else max(n, 1)
+
+    pos_parts, score_parts = [], []
+    for start in range(0, n, step):
+        chunk = choices[start:start + step]
+        if parallel:
+            scores = process.cdist(
+                chunk, [norm_query], scorer=fuzz.token_set_ratio,
+                score_cutoff=min_score, dtype=np.uint8, workers=workers,
+            )[:, 0]
+        else:
+            scores = process.cdist(
+                [norm_query], chunk, scorer=fuzz.token_set_ratio,
+                score_cutoff=min_score, dtype=np.uint8,
+            )[0]
+
+        hits = np.flatnonzero(scores >= min_score)
+        if hits.size > limit:
+            hits = hits[np.argpartition(-scores[hits].astype(np.int16), limit - 1)[:limit]]
+        pos_parts.append(hits + start)
+        score_parts.append(scores[hits])
+
+    if not pos_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8)
+
+    positions = np.concatenate(pos_parts)
+    scores = np.concatenate(score_parts)
+    order = np.lexsort((positions, -scores.astype(np.int16)))[:limit]
+    return positions[order], scores[order]
+
+
+def descriptions_table(table: str) -> str:
+    """Name of the unique normalized description table built by import_excel.py for `table`."""
+    return f"{table}_descriptions"
+
+
+def description_rows_table(table: str) -> str:
+    """Name of the (description id, rowid) postings table built by import_excel.py for `table`."""
+    return f"{table}_description_rows"
+
+
+class FuzzyIndex(FilteredIndex):
+    """
+    Long-lived, in-memory copy of what fuzzy search needs: the distinct
+    normalized descriptions (`choices`) plus the filter codes (FilteredIndex)
+    and each row's choice (`row_choice`), aligned by position with `rowids`.
+    Each distinct description is scored once per query and its score fanned
+    out to its rows.
+    Full rows are only fetched from SQLite for the final top-k.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        db_path: str = "",
+        table: str = "",
+        descriptions: Optional[pd.DataFrame] = None,
+    ):
+        self.db_path = db_path
+        self.table = table
+        super().__init__(df["_rowid"].to_numpy(dtype=np.int64), df["Invoice Month"], {
+            "Invoice Year": pd.Categorical(pd.to_numeric(df["Invoice Year"], errors="coerce")),
+            "Province": pd.Categorical(df["Province"]),
+            "City": pd.Categorical(df["City"]),
+            "UOM": pd.Categorical(df["UOM"]) if "UOM" in df.columns else pd.Categorical([None] * len(df)),
+        })
+        if descriptions is not None:
+            # import_excel.py's description dictionary
+            choice_ids = descriptions["id"].to_numpy(dtype=np.int64)
+            self.choices = descriptions["description"].to_numpy(dtype=object)
+            self.row_choice = np.searchsorted(choice_ids, df["_desc_id"].to_numpy(dtype=np.int64))
+        else:
+            # Databases without the dictionary: deduplicate here
+            raw_codes, raw = pd.factorize(df["Item Description"].astype(str))
+            codes, uniques = pd.factorize(np.array([normalize_text(d) for d in raw], dtype=object))
+            self.choices = np.asarray(uniques, dtype=object)
+            self.row_choice = codes[raw_codes].astype(np.int64)
+
+    @classmethod
+    def load(cls, db_path: str, table: str) -> "FuzzyIndex":
+        dictionary = has_table(db_path, descriptions_table(table))
+        with read_conn(db_path) as conn:
+            df = pd.read_sql_query(
+                f'''SELECT rowid AS _rowid, {"" if dictionary else '"Item Description", '}
+                           "Invoice Year", "Invoice Month", "Province", "City", "UOM"
+                    FROM "{table}"
+                    WHERE "Item Description" IS NOT NULL
+                    ORDER BY rowid''',
+                conn,
+            )
+            if not dictionary:
+                return cls(df, db_path, table)
+
+            descriptions = pd.read_sql_query(
+                f'SELECT id, description FROM {descriptions_table(table)} ORDER BY id', conn
+            )
+            postings = pd.read_sql_query(
+                f'SELECT rid AS _rowid, desc_id AS _desc_id FROM {description_rows_table(table)}', conn
+            )
+        # Inner merge keeps the rowid order of `df`
+        return cls(df.merge(postings, on="_rowid"), db_path, table, descriptions)
+
+    def search(
+        self,
+        query: str,
+        mask: np.ndarray,
+        limit: int = 200,
+        min_score: int = 70,
+        **scoring,
+    ) -> List[Tuple[int, int]]:
+        """
+        Score the distinct descriptions of the masked rows against the query
+        in batch (see top_k_scores for the parallel options in `scoring`),
+        then fan the scores out to the rows. This is a full scan of the
+        distinct descriptions: token_set_ratio credits common pieces of one or
+        two characters, so at the app's min_scores no count of shared grams or
+        tokens bounds the matches and any candidate prefilter would lose some.
+        Returns [(rowid, score)] best first, ties in rowid order, at most
+        `limit`, all >= min_score.
+        """
+        norm_query = normalize_text(query) or query.strip().lower()
+
+        rows = np.flatnonzero(mask)
+        if not norm_query or rows.size == 0:
+            return []
+
+        active = np.zeros(len(self.choices), dtype=bool)
+        active[self.row_choice[rows]] = True
+
+        positions = np.flatnonzero(active)
+        if positions.size == 0:
+            return []
+
+        choices = self.choices if positions.size == len(self.choices) else self.choices[positions]
+        scanned = rows.size
+        with span("fuzzy.score"):
+            hits, scores = top_k_scores(norm_query, choices, positions.size, min_score, **scoring)
+
+            score_of = np.full(len(self.choices), -1, dtype=np.int16)
+            score_of[positions[hits]] = scores
+            row_scores = score_of[self.row_choice[rows]]
+            matched = row_scores >= 0
+            rows, row_scores = rows[matched], row_scores[matched]
+            top = np.lexsort((rows, -row_scores))[:limit]
+            count(
+                rows_scanned=scanned,
+                descriptions_scored=positions.size,
+                rows_returned=len(top),
+            )
+
+        return [(int(self.rowids[rows[i]]), int(row_scores[i])) for i in top]
+
+
+_FUZZY_INDEXES = IndexCache(FuzzyIndex.load, "fuzzy.index_build")
+
+
+def fuzzy_index_loaded(db_path: str, table: str) -> bool:
+    """Whether get_fuzzy_index would return without (re)building."""
+    return _FUZZY_INDEXES.loaded(db_path, table)
+
+
+def get_fuzzy_index(db_path: str, table: str) -> FuzzyIndex:
+    """The process-wide FuzzyIndex of the database (see IndexCache)."""
+    return _FUZZY_INDEXES.get(db_path, table)
+
+
+@traced("fuzzy.search")
+def fuzzy_search(
+    db_path: str,
+    table: str,
+    query: str,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    month_name_to_num: Dict[str, int],
+    uom: str = "(All)",
+    limit: int = 200,
+    min_score: int = 70,
+    **scoring,
+) -> pd.DataFrame:
+    """
+    Fuzzy search via the cached index. Same columns as fetch_rows_by_rowid
+    plus a leading 'Score' column, best matches first.
+    `scoring` takes top_k_scores' parallel options.
+    """
+    index = get_fuzzy_index(db_path, table)
+    mask = index.filter_mask(year_filter, month_filter, province, city, month_name_to_num, uom)
+    picked = index.search(query, mask, limit=limit, min_score=min_score, **scoring)
+
+    df = fetch_rows_by_rowid(db_path, table, [rowid for rowid, _ in picked])
+    df.insert(0, "Score", [score for _, score in picked])
+    return df
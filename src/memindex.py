@@ -0,0 +1,93 @@
+"""
+What the long-lived in-memory search indexes (src.fuzzy's FuzzyIndex,
+src.columnar's ColumnarIndex) share: the dropdown filters as categorical
+codes (FilteredIndex) and the process-wide cache that keeps one index per
+database version (IndexCache).
+"""
+import threading
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.pool import db_version
+from src.trace import span
+
+# Columns the filters compare by code (the month goes by number)
+FILTER_COLUMNS = ("Invoice Year", "Province", "City", "UOM")
+
+
+class FilteredIndex:
+    """
+    Rows in rowid order (`rowids`), with the four dropdown filters and the
+    UOM facet aligned by position: the month number (`months`) and the
+    FILTER_COLUMNS as categoricals (`codes`), so a filter is one comparison
+    of codes instead of one of values.
+    """
+
+    def __init__(self, rowids: np.ndarray, months: pd.Series, codes: Dict[str, pd.Categorical]):
+        self.rowids = rowids
+        self.months = pd.to_numeric(months, errors="coerce").fillna(-1).to_numpy(dtype=np.int16)
+        self.codes = codes
+        self.lookups = {col: {v: i for i, v in enumerate(cat.categories)} for col, cat in codes.items()}
+
+    def __len__(self) -> int:
+        return len(self.rowids)
+
+    def _equals(self, col: str, value) -> np.ndarray:
+        return self.codes[col].codes == self.lookups[col].get(value, -2)
+
+    def filter_mask(
+        self,
+        year_filter: str,
+        month_filter: str,
+        province: str,
+        city: str,
+        month_name_to_num: Dict[str, int],
+        uom: str = "(All)",
+    ) -> np.ndarray:
+        """Boolean mask of rows passing the four dropdown filters and the UOM facet."""
+        mask = np.ones(len(self), dtype=bool)
+
+        if year_filter != "(All)":
+            mask &= self._equals("Invoice Year", int(year_filter))
+        if month_filter != "(All)":
+            mask &= self.months == int(month_name_to_num[month_filter])
+        if province != "(All)":
+            mask &= self._equals("Province", province)
+        if city != "(All)":
+            mask &= self._equals("City", city)
+        if uom != "(All)":
+            mask &= self._equals("UOM", uom)
+
+        return mask
+
+
+class IndexCache:
+    """
+    One index per (db_path, table), built by `load(db_path, table)` and
+    shared by all sessions (and the API) in this process; rebuilt when
+    import_excel.py rewrites the DB. Concurrent callers wait for one build.
+    """
+
+    def __init__(self, load: Callable[[str, str], object], span_name: str):
+        self.load = load
+        self.span_name = span_name
+        # (db_path, table) -> (db_version, index); only the current version is kept
+        self._indexes: Dict[Tuple[str, str], Tuple[Tuple, object]] = {}
+        self._lock = threading.Lock()
+
+    def loaded(self, db_path: str, table: str) -> bool:
+        """Whether get() would return without (re)building."""
+        cached = self._indexes.get((db_path, table))
+        return cached is not None and cached[0] == db_version(db_path)
+
+    def get(self, db_path: str, table: str):
+        version = db_version(db_path)
+        with self._lock:
+            cached = self._indexes.get((db_path, table))
+            if cached is None or cached[0] != version:
+                self._indexes.pop((db_path, table), None)  # free the stale index first
+                with span(self.span_name):
+                    cached = self._indexes[(db_path, table)] = (version, self.load(db_path, table))
+            return cached[1]
@@ -0,0 +1,148 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from src.config import CONFIG
+
+
+def db_version(db_path: str) -> Tuple[int, int, int]:
+    """
+    Changes whenever import_excel.py rewrites the database file; used to key
+    caches that must not outlive the data they were built from.
+    """
+    st_ = os.stat(db_path)
+    return st_.st_ino, st_.st_mtime_ns, st_.st_size
+
+
+class ConnectionPool:
+    """
+    Read-only SQLite connections shared by all sessions of the app.
+
+    Connections are opened with `mode=ro`, tuned with read-side pragmas and
+    handed out one caller (thread) at a time. When import_excel.py rewrites
+    the database, idle connections are dropped and new ones see the new file.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 8,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kib: int = 64 * 1024,
+    ):
+        self.db_path = db_path
+        self.size = size
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+
+        self._idle: "queue.LifoQueue[Tuple[sqlite3.Connection, Tuple]]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._stats = {"checkouts": 0, "opened": 0, "reused": 0, "waited": 0, "discarded": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")  # negative = KiB
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _checkout(self) -> Tuple[sqlite3.Connection, Tuple]:
+        version = db_version(self.db_path)
+
+        while True:
+            try:
+                conn, conn_version = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn_version == version:
+                with self._lock:
+                    self._stats["reused"] += 1
+                return conn, conn_version
+            self._discard(conn)
+
+        with self._lock:
+            can_open = self._open < self.size
+            if can_open:
+                self._open += 1
+                self._stats["opened"] += 1
+        if can_open:
+            try:
+                return self._connect(), version
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+
+        # Pool exhausted: wait for another session to hand one back
+        with self._lock:
+            self._stats["waited"] += 1
+        conn, conn_version = self._idle.get()
+        if conn_version != version:
+            self._discard(conn)
+            return self._checkout()
+        return conn, conn_version
+
+    def _discard(self, conn: sqlite3.Connection):
+        conn.close()
+        with self._lock:
+            self._open -= 1
+            self._stats["discarded"] += 1
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn, version = self._checkout()
+        with self._lock:
+            self._stats["checkouts"] += 1
+        try:
+            yield conn
+        finally:
+            self._idle.put((conn, version))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "size": self.size,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+            }
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Process-wide pool for `db_path`, sized/tuned from AppConfig."""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(
+                db_path,
+                size=CONFIG.db_pool_size,
+                mmap_size=CONFIG.db_mmap_size,
+                cache_size_kib=CONFIG.db_cache_size_kib,
+            )
+            _POOLS[db_path] = pool
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Stats of every pool opened in this process, by database path."""
+    with _POOLS_LOCK:
+        pools = dict(_POOLS)
+    return {path: pool.stats() for path, pool in pools.items()}
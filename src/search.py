@@ -0,0 +1,296 @@
+from functools import partial
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.cache import get_result_cache, result_cache_key
+from src.columnar import ColumnarIndex, columnar_search, get_columnar_index, match_score
+from src.config import CONFIG
+from src.db import (
+    build_query_sql,
+    description_groups_sql,
+    frame_facets,
+    page_cursor,
+    paginate_sql,
+    rowids_sql,
+    run_facets,
+    run_search,
+    tokenize,
+    within_rowids_sql,
+)
+from src.export import export_frame, export_sql
+from src.fuzzy import fuzzy_search
+from src.stats import format_rate_stats, lookup_rate_stats, matched_descriptions
+from src.trace import count, span
+
+# Fuzzy search returns a bounded top-k (best first) instead of every match
+FUZZY_MAX_RESULTS = 500  # or 2000
+
+# Internal columns of the result frames, not shown to users
+INTERNAL_COLUMNS = ["_score", "Score", "_rowid"]
+
+Facets = Dict[str, Dict[str, int]]
+
+
+def is_refinement(mode: str, previous: str, query: str) -> bool:
+    """
+    Whether every match of `query` is also a match of `previous` (same mode
+    and filters), so it can be searched within the previous matches: each
+    previous token is a prefix (ranked: FTS prefix tokens) or substring
+    (contains) of a token of `query`. Queries without tokens (a LIKE on the
+    whole text) and fuzzy scores don't narrow that way. In contains mode both
+    need a 3+ character token or neither: without one the search falls back
+    to Item Description only.
+    """
+    if mode == "fuzzy":
+        return False
+    before, after = tokenize(previous), tokenize(query)
+    if not before or not after:
+        return False
+    if mode == "contains":
+        if any(len(t) >= 3 for t in before) != any(len(t) >= 3 for t in after):
+            return False
+        return all(any(t in u for u in after) for t in before)
+    return all(any(u.startswith(t) for u in after) for t in before)
+
+
+def _export_columnar(fmt: str, index: ColumnarIndex, positions: np.ndarray, score: int, chunk_rows: int):
+    """export_frame of columnar matches, the frame only built when a download is asked for."""
+    return export_frame(fmt, index.frame(positions, score), chunk_rows)
+
+
+class Search:
+    """
+    One search (query, mode, filters) run against the shared connection pool
+    and result cache. Used by the Streamlit app and the JSON API alike.
+
+    `controls` has the keys render_controls returns: query, mode ("ranked",
+    "contains" or "fuzzy"), min_score, year_filter, month_filter, province,
+    city, uom.
+
+    Pages are keyset pages: `after` is None for the first page and the
+    `next_after` page() returned for the following ones ((_score, _rowid) of
+    the last row; the offset for fuzzy results, which are a top-k slice).
+
+    With AppConfig.search_backend "columnar", ranked / contains searches run
+    on src.columnar's in-memory arrays instead of SQLite: the same matches
+    and columns, but _score counts tokens (no bm25), so rows come in rowid
+    order.
+
+    `within_rowids`, a known superset of the matches (the previous query's
+    when this one refines it, see is_refinement), limits the search to
+    those rows; the results are the same.
+    """
+
+    def __init__(
+        self,
+        controls: Dict,
+        month_name_to_num: Dict[str, int],
+        db_path: str = CONFIG.db_path,
+        table: str = CONFIG.table,
+        within_rowids: Optional[Sequence[int]] = None,
+    ):
+        self.controls = {"uom": "(All)", "min_score": 70, **controls}
+        self.within_rowids = within_rowids
+        self.month_name_to_num = month_name_to_num
+        self.db_path = db_path
+        self.table = table
+        self.cache = get_result_cache()
+        self.key = result_cache_key(
+            self.mode,
+            self.controls["query"],
+            self.controls["min_score"],
+            self.controls["year_filter"],
+            self.controls["month_filter"],
+            self.controls["province"],
+            self.controls["city"],
+            self.controls["uom"],
+        )
+
+    @property
+    def mode(self) -> str:
+        return self.controls["mode"]
+
+    @property
+    def columnar(self) -> bool:
+        return CONFIG.search_backend == "columnar" and self.mode != "fuzzy"
+
+    def _filters(self) -> Dict:
+        c = self.controls
+        return dict(
+            year_filter=c["year_filter"],
+            month_filter=c["month_filter"],
+            province=c["province"],
+            city=c["city"],
+            month_name_to_num=self.month_name_to_num,
+            uom=c["uom"],
+        )
+
+    def sql(self) -> Tuple[str, list]:
+        """Ranked (FTS5 index) or "contains" (trigram index / LIKE) search query."""
+        sql, params = build_query_sql(
+            db_path=self.db_path,
+            mode=self.mode,
+            table=self.table,
+            query=self.controls["query"],
+            **self._filters(),
+        )
+        if self.within_rowids is not None:
+            sql, params = within_rowids_sql(sql, params, self.within_rowids)
+        return sql, params
+
+    def fuzzy_results(self) -> pd.DataFrame:
+        """Top fuzzy matches (bounded by FUZZY_MAX_RESULTS), best first; cached."""
+        df = self.cache.get(self.db_path, self.key)
+        count(cache_hits=df is not None)
+        if df is None:
+            # Filter + rank in the cached in-memory fuzzy index, fetch only the top rows
+            df = fuzzy_search(
+                db_path=self.db_path,
+                table=self.table,
+                query=self.controls["query"],
+                **self._filters(),
+                limit=FUZZY_MAX_RESULTS,
+                min_score=self.controls["min_score"],
+                parallel_threshold=CONFIG.fuzzy_parallel_threshold,
+                chunk_size=CONFIG.fuzzy_chunk_size,
+                workers=CONFIG.fuzzy_workers,
+            )
+            self.cache.put(self.db_path, self.key, df)
+        return df
+
+    def columnar_matches(self) -> Tuple[ColumnarIndex, np.ndarray]:
+        """The in-memory index and the positions of the matches in it (cached)."""
+        index = get_columnar_index(self.db_path, self.table)
+        positions = self.cache.get(self.db_path, self.key + ("columnar",))
+        count(cache_hits=positions is not None)
+        if positions is None:
+            positions = columnar_search(
+                self.db_path, self.table, self.mode, self.controls["query"], **self._filters(),
+                within_rowids=None if self.within_rowids is None else np.asarray(self.within_rowids),
+            )
+            self.cache.put(self.db_path, self.key + ("columnar",), positions)
+        return index, positions
+
+    def summary(self) -> Tuple[int, Facets]:
+        """Total matches and facet counts (one GROUP BY pass, cached)."""
+        with span("search.summary"):
+            if self.mode == "fuzzy":
+                return frame_facets(self.fuzzy_results())
+            if self.columnar:
+                index, positions = self.columnar_matches()
+                return index.facets(positions)
+
+            facets_key = self.key + ("facets",)
+            counted = self.cache.get(self.db_path, facets_key)
+            count(cache_hits=counted is not None)
+            if counted is None:
+                counted = run_facets(self.db_path, *self.sql())
+                self.cache.put(self.db_path, facets_key, counted)
+            return counted
+
+    def page(self, page_size: int, after=None) -> Tuple[pd.DataFrame, Optional[object]]:
+        """(rows of the page, `after` of the next page or None after the last one)."""
+        with span("search.page"):
+            if self.mode == "fuzzy":
+                df = self.fuzzy_results()
+                start = after or 0
+                page_df = df.iloc[start:start + page_size]
+                count(rows_returned=len(page_df))
+                return page_df, (start + page_size if start + page_size < len(df) else None)
+
+            if self.columnar:
+                index, positions = self.columnar_matches()
+                page_df = index.page(positions, match_score(self.controls["query"]), page_size, after)
+                count(rows_returned=len(page_df))
+                return page_df, (page_cursor(page_df) if len(page_df) == page_size else None)
+
+            page_key = self.key + ("page", page_size, after)
+            page_df = self.cache.get(self.db_path, page_key)
+            count(cache_hits=page_df is not None)
+            if page_df is None:
+                page_df = run_search(self.db_path, *paginate_sql(*self.sql(), page_size, after))
+                self.cache.put(self.db_path, page_key, page_df)
+            count(rows_returned=len(page_df))
+            return page_df, (page_cursor(page_df) if len(page_df) == page_size else None)
+
+    def matched_rowids(self, total: int, limit: int) -> Optional[np.ndarray]:
+        """
+        Rowids of every match, the scope of a next query refining this one;
+        None for fuzzy searches and past `limit` matches (`total`, from summary()).
+        """
+        if self.mode == "fuzzy" or total > limit:
+            return None
+        if self.columnar:
+            index, positions = self.columnar_matches()
+            return index.rowids[positions]
+
+        rowids_key = self.key + ("rowids",)
+        rowids = self.cache.get(self.db_path, rowids_key)
+        count(cache_hits=rowids is not None)
+        if rowids is None:
+            rowids = run_search(self.db_path, *rowids_sql(*self.sql()))
+            self.cache.put(self.db_path, rowids_key, rowids)
+        return rowids["_rowid"].to_numpy(dtype=np.int64)
+
+    def description_groups(self) -> pd.DataFrame:
+        """Matches per (Item Description, UOM), for the rate statistics."""
+        if self.mode == "fuzzy":
+            return (
+                self.fuzzy_results()
+                .groupby(["Item Description", "UOM"], dropna=False)
+                .size()
+                .reset_index(name="n")
+            )
+        if self.columnar:
+            index, positions = self.columnar_matches()
+            return index.description_groups(positions)
+        return run_search(self.db_path, *description_groups_sql(*self.sql()))
+
+    def rate_stats(self, breakdown: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Rate statistics of the matched descriptions from the rollups
+        import_excel.py builds (see src.stats), cached; None without rollups.
+        """
+        with span("search.rate_stats"):
+            return self._rate_stats(breakdown)
+
+    def _rate_stats(self, breakdown: Optional[str]) -> Optional[pd.DataFrame]:
+        stats_key = self.key + ("rate_stats", breakdown)
+        stats = self.cache.get(self.db_path, stats_key)
+        count(cache_hits=stats is not None)
+        if stats is None:
+            c = self.controls
+            stats = lookup_rate_stats(
+                self.db_path,
+                self.table,
+                matched_descriptions(self.description_groups()),
+                year_filter=c["year_filter"],
+                month_filter=c["month_filter"],
+                province=c["province"],
+                city=c["city"],
+                uom=c["uom"],
+                breakdown=breakdown,
+            )
+            if stats is None:
+                return None
+            stats = format_rate_stats(stats, breakdown)
+            self.cache.put(self.db_path, stats_key, stats)
+        return stats
+
+    def exporter(self) -> Callable:
+        """export(format) -> file of every result (see src.export); nothing runs until called."""
+        if self.mode == "fuzzy":
+            return partial(export_frame, df=self.fuzzy_results(), chunk_rows=CONFIG.export_chunk_rows)
+        if self.columnar:
+            index, positions = self.columnar_matches()
+            return partial(
+                _export_columnar, index=index, positions=positions,
+                score=match_score(self.controls["query"]), chunk_rows=CONFIG.export_chunk_rows,
+            )
+        sql, params = self.sql()
+        return partial(
+            export_sql, db_path=self.db_path, sql=sql, params=params,
+            chunk_rows=CONFIG.export_chunk_rows,
+        )
\ No newline at end of file
@@ -0,0 +1,230 @@
+import itertools
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.db import has_table, read_conn
+from src.fuzzy import description_rows_table, descriptions_table, normalize_text
+
+# Dimensions of the rate rollups, each either a value or "(All)" (rolled up);
+# the same vocabulary as the filter dropdowns
+ROLLUP_DIMS = ("province", "city", "year", "month")
+
+# A city is only split out with its province and a month with its year
+ROLLUP_PARENTS = {"city": "province", "month": "year"}
+
+# The combinations of grouped dimensions that are materialized: the filter
+# selections of the usual drill-down (province -> city, year -> month) plus
+# one break-down dimension are plain lookups. The other levels (a city or a
+# month across all provinces / years) are aggregated from the records when
+# asked for (rate_stats_on_demand).
+ROLLUP_LEVELS = [
+    dims
+    for r in range(len(ROLLUP_DIMS) + 1)
+    for dims in itertools.combinations(ROLLUP_DIMS, r)
+    if all(ROLLUP_PARENTS[dim] in dims for dim in dims if dim in ROLLUP_PARENTS)
+]
+
+STAT_COLUMNS = ("n", "rate_min", "rate_p50", "rate_p90", "rate_max", "rate_mean")
+
+# Filter / break-down name in the app -> rollup dimension
+DIM_OF_FILTER = {"Province": "province", "City": "city", "Invoice Year": "year", "Invoice Month": "month"}
+
+
+def rate_stats_table(table: str) -> str:
+    """Name of the unit-rate rollup table built by import_excel.py for `table`."""
+    return f"{table}_rate_stats"
+
+
+def rate_rows_sql(table: str, where: str = "") -> str:
+    """
+    The rollup input rows (desc_id, desc_key, uom, province, city, year,
+    month, rate) of `table`, in description id order: every row with a Unit
+    Rate, keyed by import_excel.py's description dictionary. `where` adds
+    conditions on d (the dictionary) or r (the rows).
+    """
+    return f'''SELECT p.desc_id, d.description AS desc_key, r."UOM" AS uom, r."Province" AS province,
+                   r."City" AS city, r."Invoice Year" AS year, r."Invoice Month Name" AS month,
+                   r."Unit Rate" AS rate
+            FROM "{description_rows_table(table)}" AS p
+            JOIN "{descriptions_table(table)}" AS d ON d.id = p.desc_id
+            JOIN "{table}" AS r ON r.rowid = p.rid
+            WHERE r."Unit Rate" IS NOT NULL AND d.description != ''{where}
+            ORDER BY p.desc_id'''
+
+
+def clean_rate_rows(rows: pd.DataFrame) -> pd.DataFrame:
+    """rate_rows_sql rows in the filter vocabulary (no UOM -> "", years as "2024"), without desc_id."""
+    rows = rows.drop(columns="desc_id")
+    rows["uom"] = rows["uom"].fillna("")
+    rows["year"] = pd.to_numeric(rows["year"], errors="coerce").astype("Int64").astype(str).replace("<NA>", None)
+    return rows
+
+
+def rate_rollups(rows: pd.DataFrame, levels: Sequence[tuple] = ROLLUP_LEVELS) -> pd.DataFrame:
+    """
+    Unit Rate statistics per description key (normalize_text) x UOM at each
+    of `levels` (tuples of grouped ROLLUP_DIMS).
+    `rows` has desc_key, uom, province, city, year, month and rate; dimensions
+    a level doesn't group by are set to "(All)". Rows missing a grouped
+    dimension don't count at that level (no filter can select them).
+    """
+    parts = []
+    for level in levels:
+        keys = ["desc_key", "uom", *level]
+        grouped = rows.dropna(subset=list(level)).groupby(keys, sort=False)["rate"]
+        stats = pd.DataFrame({
+            "n": grouped.size(),
+            "rate_min": grouped.min(),
+            "rate_p50": grouped.median(),
+            "rate_p90": grouped.quantile(0.9),
+            "rate_max": grouped.max(),
+            "rate_mean": grouped.mean(),
+        }).reset_index()
+        for dim in ROLLUP_DIMS:
+            if dim not in level:
+                stats[dim] = "(All)"
+        parts.append(stats[["desc_key", "uom", *ROLLUP_DIMS, *STAT_COLUMNS]])
+    return pd.concat(parts, ignore_index=True)
+
+
+def rate_stats_on_demand(
+    db_path: str, table: str, level: tuple, selected: Dict[str, str], keys: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """
+    Rollup rows at a `level` that isn't materialized, aggregated from the
+    records under the `selected` filter values (dimension -> value or
+    "(All)"), for the description `keys` (None = all of them).
+    """
+    where, params = "", []
+    if keys is not None:
+        where = f" AND d.description IN ({', '.join('?' for _ in keys)})"
+        params = list(keys)
+    with read_conn(db_path) as conn:
+        rows = clean_rate_rows(pd.read_sql_query(rate_rows_sql(table, where), conn, params=params))
+    for dim in ROLLUP_DIMS:
+        if selected[dim] != "(All)":
+            rows = rows[rows[dim] == selected[dim]]
+    return rate_rollups(rows, [level])
+
+
+def load_rate_stats(
+    db_path: str,
+    table: str,
+    selected: Dict[str, str],
+    split: Optional[str] = None,
+    keys: Optional[Sequence[str]] = None,
+    uom: str = "(All)",
+) -> pd.DataFrame:
+    """
+    Rollup rows (desc_key, uom, ROLLUP_DIMS, STAT_COLUMNS) under the
+    `selected` filter values (dimension -> value or "(All)"), one per value
+    of the `split` dimension if given, for the description `keys` (None =
+    all of them). A lookup in the rollup table when the level is
+    materialized, else rate_stats_on_demand.
+    """
+    level = tuple(dim for dim in ROLLUP_DIMS if selected[dim] != "(All)" or dim == split)
+    if level not in ROLLUP_LEVELS:
+        stats = rate_stats_on_demand(db_path, table, level, selected, keys)
+        return stats if uom == "(All)" else stats[stats["uom"] == uom].reset_index(drop=True)
+
+    where, params = [], []
+    for dim in ROLLUP_DIMS:
+        if selected[dim] != "(All)":
+            where.append(f"{dim} = ?")
+            params.append(selected[dim])
+        elif dim == split:
+            where.append(f"{dim} != '(All)'")
+        else:
+            where.append(f"{dim} = '(All)'")
+    if uom != "(All)":
+        where.append("uom = ?")
+        params.append(uom)
+    if keys is not None:
+        where.append(f"desc_key IN ({', '.join('?' for _ in keys)})")
+        params += list(keys)
+
+    with read_conn(db_path) as conn:
+        return pd.read_sql_query(
+            f'''SELECT desc_key, uom, {", ".join(ROLLUP_DIMS)}, {", ".join(STAT_COLUMNS)}
+                FROM "{rate_stats_table(table)}"
+                WHERE {" AND ".join(where)}''',
+            conn,
+            params=params,
+        )
+
+
+def matched_descriptions(groups: pd.DataFrame, limit: int = 20) -> pd.DataFrame:
+    """
+    Description keys x UOM of a result set, most matches first, from rows of
+    ("Item Description", "UOM", n). `description` is the most common text of
+    each key, for display.
+    """
+    if groups.empty:
+        return pd.DataFrame(columns=["desc_key", "uom", "description", "matches"])
+
+    texts = groups["Item Description"].astype(str)
+    unique = texts.unique()
+    keys = dict(zip(unique, (normalize_text(t) for t in unique)))
+
+    df = pd.DataFrame({
+        "desc_key": texts.map(keys),
+        "uom": groups["UOM"].fillna(""),
+        "description": texts,
+        "matches": groups["n"].astype(int),
+    })
+    df = df[df["desc_key"] != ""]
+    shown = (
+        df.sort_values("matches", ascending=False, kind="stable")
+          .drop_duplicates(["desc_key", "uom"])[["desc_key", "uom", "description"]]
+    )
+    totals = df.groupby(["desc_key", "uom"], as_index=False)["matches"].sum()
+    out = totals.merge(shown, on=["desc_key", "uom"])
+    return out.sort_values(["matches", "desc_key"], ascending=[False, True]).head(limit).reset_index(drop=True)
+
+
+def lookup_rate_stats(
+    db_path: str,
+    table: str,
+    described: pd.DataFrame,
+    year_filter: str,
+    month_filter: str,
+    province: str,
+    city: str,
+    uom: str = "(All)",
+    breakdown: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Rollup rows for the (desc_key, uom) pairs of `described` (see
+    matched_descriptions) under the current filters, one row per value of
+    `breakdown` ("Province", "City", "Invoice Year", "Invoice Month") if given.
+    Returns None when the database has no rollup table.
+    """
+    if not has_table(db_path, rate_stats_table(table)):
+        return None
+
+    selected = {"province": province, "city": city, "year": year_filter, "month": month_filter}
+    split = DIM_OF_FILTER.get(breakdown) if breakdown else None
+    keys = described["desc_key"].unique().tolist()
+    stats = load_rate_stats(db_path, table, selected, split, keys, uom)
+
+    out = described.merge(stats, on=["desc_key", "uom"])
+    order = ["matches", "desc_key", "uom"] + ([split] if split else [])
+    out = out.sort_values(order, ascending=[False, True, True] + ([True] if split else []), kind="stable")
+    return out
+
+
+def format_rate_stats(stats: pd.DataFrame, breakdown: Optional[str] = None) -> pd.DataFrame:
+    """Display frame of lookup_rate_stats' rows."""
+    split = DIM_OF_FILTER.get(breakdown) if breakdown else None
+    out = pd.DataFrame({
+        "Item Description": stats["description"],
+        "UOM": stats["uom"],
+    })
+    if split:
+        out[breakdown] = stats[split]
+    out["Rows"] = stats["n"].astype(int)
+    for col, label in [("rate_min", "Min"), ("rate_p50", "Median"), ("rate_p90", "P90"), ("rate_max", "Max")]:
+        out[label] = np.round(stats[col].astype(float), 2)
+    return out.reset_index(drop=True)
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Lightweight tracing: nested, timed spans with counters per app run or API
+request, written as one JSON line per trace (AppConfig.trace_log_path).
+
+    with trace("app.run", mode="ranked") as t:
+        with span("search.page"):
+            ...
+            count(rows_returned=len(df))
+
+Spans outside a trace cost one context-variable lookup. Summarize a log,
+across sessions:
+
+    python -m src.trace traces.jsonl [--name app.run]
+"""
+import argparse
+import contextvars
+import datetime as dt
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.config import CONFIG
+
+
+class Span:
+    """One timed stage; `counters` (rows_returned, rows_scanned, vm_steps...) add up."""
+
+    __slots__ = ("name", "depth", "start_ms", "ms", "counters", "error")
+
+    def __init__(self, name: str, depth: int, start_ms: float):
+        self.name = name
+        self.depth = depth
+        self.start_ms = start_ms
+        self.ms = 0.0
+        self.counters: Dict[str, int] = {}
+        self.error = ""
+
+    def count(self, **counters: int):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + int(value)
+
+    def to_dict(self) -> Dict:
+        out = {"name": self.name, "depth": self.depth, "start_ms": round(self.start_ms, 3),
+               "ms": round(self.ms, 3), **self.counters}
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class Trace:
+    """The spans of one run, in start order."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = dt.datetime.now()
+        self._t0 = time.perf_counter()
+        self.ms = 0.0
+        self.spans: List[Span] = []
+        self._open: List[Span] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def to_dict(self) -> Dict:
+        return {
+            "ts": self.started.isoformat(timespec="milliseconds"),
+            "name": self.name,
+            "attrs": self.attrs,
+            "ms": round(self.ms or self.elapsed_ms(), 3),
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+_CURRENT: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_LOG_LOCK = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def trace(name: str, log_path: Optional[str] = None, **attrs) -> Iterator[Trace]:
+    """
+    Collect the spans of everything run inside; appended to `log_path`
+    (default AppConfig.trace_log_path, "" = off) when done.
+    """
+    t = Trace(name, **attrs)
+    token = _CURRENT.set(t)
+    try:
+        yield t
+    finally:
+        _CURRENT.reset(token)
+        t.ms = t.elapsed_ms()
+        path = CONFIG.trace_log_path if log_path is None else log_path
+        if path:
+            write_trace(t, path)
+
+
+@contextmanager
+def span(name: str) -> Iterator[Optional[Span]]:
+    """Time a stage of the current trace (nothing happens outside one)."""
+    t = _CURRENT.get()
+    if t is None:
+        yield None
+        return
+
+    s = Span(name, len(t._open), t.elapsed_ms())
+    t.spans.append(s)
+    t._open.append(s)
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.ms = (time.perf_counter() - start) * 1000
+        t._open.remove(s)
+
+
+def count(**counters: int):
+    """Add to the counters of the innermost open span."""
+    t = _CURRENT.get()
+    if t is not None and t._open:
+        t._open[-1].count(**counters)
+
+
+def traced(name: str) -> Callable:
+    """Decorator: run the function in span(name)."""
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def in_trace(name: str, fn: Callable, **attrs) -> Callable:
+    """`fn` run in a trace of its own, for work that happens outside the run (deferred downloads)."""
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        with trace(name, **attrs), span(name):
+            return fn(*args, **kwargs)
+    return inner
+
+
+def write_trace(t: Trace, path: str):
+    line = json.dumps(t.to_dict(), default=str)
+    with _LOG_LOCK, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+# ---------------- Summary ----------------
+
+def summarize(path: str, name: str = "") -> Dict[str, Dict]:
+    """Per span name (plus the whole trace, "total"): count, p50 / p95 / max ms and mean counters."""
+    times: Dict[str, List[float]] = defaultdict(list)
+    counters: Dict[str, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if name and entry["name"] != name:
+                continue
+            times["total"].append(entry["ms"])
+            for s in entry["spans"]:
+                times[s["name"]].append(s["ms"])
+                for key, value in s.items():
+                    if key not in ("name", "depth", "start_ms", "ms", "error"):
+                        counters[s["name"]][key].append(value)
+
+    out = {}
+    for stage, values in times.items():
+        ms = np.array(values)
+        out[stage] = {
+            "count": len(values),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "max_ms": round(float(ms.max()), 3),
+            **{f"mean_{key}": round(float(np.mean(v)), 1) for key, v in counters[stage].items()},
+        }
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a JSON-lines trace log (AppConfig.trace_log_path).")
+    parser.add_argument("log")
+    parser.add_argument("--name", default="", help="only traces with this name (e.g. app.run, api.search)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize(args.log, args.name)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"{'stage':<32} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}  counters (mean)")
+    for stage, s in sorted(summary.items(), key=lambda kv: -kv[1]["p95_ms"]):
+        extra = ", ".join(f"{k[5:]}={v:g}" for k, v in s.items() if k.startswith("mean_"))
+        print(f"{stage:<32} {s['count']:>7} {s['p50_ms']:>10.1f} {s['p95_ms']:>10.1f} {s['max_ms']:>10.1f}  {extra}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,110 +1,300 @@
-import base64
-import html as html_lib
-from typing import Dict, List
-import streamlit as st
-import pandas as pd
-from src.render import inject_controls_css
-
-@st.cache_data(show_spinner=False)
-def get_base64_image(path: str) -> str:
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
-
-
-def render_header(page_title: str, logo_path: str):
-    st.set_page_config(page_title=page_title, layout="wide")
-    inject_controls_css()
-    logo_b64 = get_base64_image(logo_path)
-
-    st.markdown(
-        f"""
-        <style>
-          .block-container {{
-              max-width: 100% !important;
-              padding-top: 4.5rem;
-              padding-left: 2rem;
-              padding-right: 2rem;
-          }}
-          .header-container {{
-              width: 100%;
-              display: flex;
-              align-items: center;
-              gap: 14px;
-              padding: 4px 0 6px 0;
-          }}
-          .header-logo {{ width: 90px; height: auto; }}
-          .header-title {{ font-size: 40px; font-weight: 700; line-height: 1.05; margin: 0; }}
-          .header-subtitle {{ font-size: 14px; color: #9aa0a6; margin-top: 2px; }}
-          .thin-hr {{ margin: 6px 0 10px 0; border: none; border-top: 1px solid rgba(255,255,255,0.12); }}
-        </style>
-
-        <div class="header-container">
-            <img src="data:image/jpeg;base64,{logo_b64}" class="header-logo" />
-            <div>
-                <div class="header-title">{html_lib.escape(page_title)}</div>
-                <div class="header-subtitle">Unit rates by province, city, year &amp; month</div>
-            </div>
-        </div>
-        <hr class="thin-hr" />
-        """,
-        unsafe_allow_html=True,
-    )
-
-
-def render_controls(
-    years: List[str], months: List[str], provinces: List[str], cities: List[str]
-) -> Dict:
-    st.title("Search in Item Description")
-
-    fuzzy_on = st.checkbox(
-        "Fuzzy (typo tolerant)", 
-        value=False, 
-        help=( "Fuzzy search finds close matches even with typos or different word order.\n\n"
-        "Example: 'demoltion' → matches 'demolition'.\n"
-        "Tip: Increase the strength slider to make results stricter."),
-    )
-
-    min_score = st.slider("Fuzzy match strength (higher = stricter)", 50, 95, 70, step=1) if fuzzy_on else 70
-    
-    query = st.text_input(
-        "Type search text (e.g., 'drywall', 'demolition', 'invoice 123')"
-    ).strip()
-    # limit = st.slider("Max results", 50, 2000, 50, step=50)
-
-    c1, c2 = st.columns(2)
-    c3, c4 = st.columns(2)
-
-    with c1:
-        year_filter = st.selectbox("Invoice Year", years)
-    with c2:
-        month_filter = st.selectbox("Invoice Month", months)
-    with c3:
-        province = st.selectbox("Province", provinces)
-    with c4:
-        city = st.selectbox("City", cities)
-
-    return {
-    "query": query,
-    "year_filter": year_filter,
-    "month_filter": month_filter,
-    "province": province,
-    "city": city,
-    "fuzzy_on": fuzzy_on,
-    "min_score": min_score,
-    }
-
-
-def render_results(df: pd.DataFrame):
-    df = df.copy()
-    df.insert(0, "S. No.", range(1, len(df) + 1))
-
-    st.write(f"Found: {len(df)} rows")
-
-    st.download_button(
-        "Download results as CSV",
-        df.to_csv(index=False).encode("utf-8"),
-        file_name="search_results.csv",
-        mime="text/csv",
-    )
-
-    return df
\ No newline at end of file
+import base64
+import html as html_lib
+import math
+from functools import partial
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+import streamlit as st
+import pandas as pd
+from src.db import SEARCH_MODES, filter_options
+from src.export import EXPORT_FORMATS
+from src.render import inject_controls_css
+from src.trace import Trace
+
+MODE_LABELS = {
+    "contains": "Contains (any text)",
+    "ranked": "Ranked (word index)",
+}
+
+@st.cache_data(show_spinner=False)
+def get_base64_image(path: str) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+def render_header(page_title: str, logo_path: str):
+    st.set_page_config(page_title=page_title, layout="wide")
+    inject_controls_css()
+    logo_b64 = get_base64_image(logo_path)
+
+    st.markdown(
+        f"""
+        <style>
+          .block-container {{
+              max-width: 100% !important;
+              padding-top: 4.5rem;
+              padding-left: 2rem;
+              padding-right: 2rem;
+          }}
+          .header-container {{
+              width: 100%;
+              display: flex;
+              align-items: center;
+              gap: 14px;
+              padding: 4px 0 6px 0;
+          }}
+          .header-logo {{ width: 90px; height: auto; }}
+          .header-title {{ font-size: 40px; font-weight: 700; line-height: 1.05; margin: 0; }}
+          .header-subtitle {{ font-size: 14px; color: #9aa0a6; margin-top: 2px; }}
+          .thin-hr {{ margin: 6px 0 10px 0; border: none; border-top: 1px solid rgba(255,255,255,0.12); }}
+        </style>
+
+        <div class="header-container">
+            <img src="data:image/jpeg;base64,{logo_b64}" class="header-logo" />
+            <div>
+                <div class="header-title">{html_lib.escape(page_title)}</div>
+                <div class="header-subtitle">Unit rates by province, city, year &amp; month</div>
+            </div>
+        </div>
+        <hr class="thin-hr" />
+        """,
+        unsafe_allow_html=True,
+    )
+
+
+RATE_BREAKDOWNS = ["Province", "City", "Invoice Year", "Invoice Month"]
+
+# Facet column -> st.session_state key of the filter a click on it sets
+FACET_FILTERS = {
+    "Province": "province",
+    "City": "city",
+    "Invoice Year": "year_filter",
+    "UOM": "uom",
+}
+
+
+def _set_filter(state_key: str, value: str):
+    st.session_state[state_key] = value
+
+
+def _option_selectbox(label: str, counts: Dict[str, int], key: str) -> str:
+    """
+    Selectbox over "(All)" + the values of `counts`, each shown with its row
+    count. A choice that is no longer offered (cascading) falls back to "(All)".
+    """
+    options = ["(All)"] + list(counts)
+    if st.session_state.get(key, "(All)") not in options:
+        st.session_state[key] = "(All)"
+    return st.selectbox(
+        label,
+        options,
+        key=key,
+        format_func=lambda v: v if v == "(All)" else f"{v} ({counts[v]:,})",
+    )
+
+
+def render_controls(dims: pd.DataFrame) -> Dict:
+    """
+    Search box, mode and the four filters. Filter options come from the
+    dimension table (`dims`, see db.load_filter_dims) and cascade: months
+    follow the selected year, cities the selected province.
+    """
+    st.title("Search in Item Description")
+
+    fuzzy_on = st.checkbox(
+        "Fuzzy (typo tolerant)", 
+        value=False, 
+        help=( "Fuzzy search finds close matches even with typos or different word order.\n\n"
+        "Example: 'demoltion' → matches 'demolition'.\n"
+        "Tip: Increase the strength slider to make results stricter."),
+    )
+
+    min_score = st.slider("Fuzzy match strength (higher = stricter)", 50, 95, 70, step=1) if fuzzy_on else 70
+
+    mode = "fuzzy"
+    if not fuzzy_on:
+        mode = st.radio(
+            "Match",
+            list(SEARCH_MODES),
+            format_func=lambda m: MODE_LABELS[m],
+            horizontal=True,
+            help=(
+                "Contains: the text can appear anywhere, e.g. inside a longer word, "
+                "or part of a File Name / GNC File number.\n\n"
+                "Ranked: whole words / word starts, best matches first (uses the search index)."
+            ),
+        )
+    
+    query = st.text_input(
+        "Type search text (e.g., 'drywall', 'demolition', 'invoice 123')"
+    ).strip()
+    # limit = st.slider("Max results", 50, 2000, 50, step=50)
+
+    c1, c2 = st.columns(2)
+    c3, c4 = st.columns(2)
+
+    options = filter_options(dims)
+    with c1:
+        year_filter = _option_selectbox("Invoice Year", options["year"], "year_filter")
+    with c3:
+        province = _option_selectbox("Province", options["province"], "province")
+
+    # Months / cities narrowed by the choices above
+    options = filter_options(dims, year_filter, province)
+    with c2:
+        month_filter = _option_selectbox("Invoice Month", options["month"], "month_filter")
+    with c4:
+        city = _option_selectbox("City", options["city"], "city")
+
+    # UOM is only set from its facet; show it as a removable chip
+    uom = st.session_state.get("uom", "(All)")
+    if uom != "(All)":
+        st.button(f"UOM: {uom}  ✕", on_click=_set_filter, args=("uom", "(All)"), help="Remove this filter")
+
+    return {
+    "query": query,
+    "year_filter": year_filter,
+    "month_filter": month_filter,
+    "province": province,
+    "city": city,
+    "uom": uom,
+    "fuzzy_on": fuzzy_on,
+    "mode": mode,
+    "min_score": min_score,
+    }
+
+
+def _move_page(step: int):
+    st.session_state["page"] += step
+
+
+def render_pager(total: int, page_size: int, signature) -> int:
+    """
+    Prev / Next page controls. Returns the 0-based page to show; a new
+    search (different `signature`) starts again at the first page.
+    Keyset cursors of visited pages live in st.session_state["page_cursors"].
+    """
+    state = st.session_state
+    if state.get("pager_signature") != signature:
+        state["pager_signature"] = signature
+        state["page"] = 0
+        state["page_cursors"] = {0: None}
+
+    pages = max(1, math.ceil(total / page_size))
+    page = state["page"] = max(0, min(state["page"], pages - 1))
+
+    c1, c2, c3 = st.columns([1, 3, 1])
+    with c1:
+        st.button("◀ Prev", on_click=_move_page, args=(-1,), disabled=page == 0)
+    with c2:
+        st.markdown(
+            f"<div style='text-align:center'>Page {page + 1} of {pages}</div>",
+            unsafe_allow_html=True,
+        )
+    with c3:
+        st.button("Next ▶", on_click=_move_page, args=(1,), disabled=page >= pages - 1)
+
+    return page
+
+
+def render_results(
+    df: pd.DataFrame,
+    total: int,
+    offset: int = 0,
+    export: Optional[Callable[[str], BinaryIO]] = None,
+):
+    """
+    Adds S. No. (continuing across pages) and the summary/download row.
+    `export(format)` builds the file of all results; it only runs when the
+    download button is clicked.
+    """
+    df = df.copy()
+    df.insert(0, "S. No.", range(offset + 1, offset + len(df) + 1))
+
+    st.write(f"Found: {total} rows")
+
+    if export is not None and total:
+        c1, c2 = st.columns([1, 3])
+        with c1:
+            fmt = st.selectbox("Export format", list(EXPORT_FORMATS), label_visibility="collapsed")
+        ext, mime = EXPORT_FORMATS[fmt]
+        with c2:
+            st.download_button(
+                f"Download all {total} rows",
+                partial(export, fmt),
+                file_name=f"search_results.{ext}",
+                mime=mime,
+                on_click="ignore",
+            )
+
+    return df
+
+
+def render_facets(facets: Dict[str, Dict[str, int]], controls: Dict, max_values: int = 8):
+    """
+    How the matches break down per facet (see db.facet_counts); clicking a
+    value applies it as a filter. Facets already filtered on are left out.
+    """
+    shown = [
+        col for col, counts in facets.items()
+        if counts and controls.get(FACET_FILTERS[col]) == "(All)"
+    ]
+    if not shown:
+        return
+
+    with st.expander("Refine by", expanded=True):
+        for c, col in zip(st.columns(len(shown)), shown):
+            with c:
+                st.caption(col)
+                for value, n in list(facets[col].items())[:max_values]:
+                    st.button(
+                        f"{value} ({n:,})",
+                        key=f"facet:{col}:{value}",
+                        on_click=_set_filter,
+                        args=(FACET_FILTERS[col], value),
+                        type="tertiary",
+                    )
+
+
+def render_rate_stats_controls() -> Tuple[bool, Optional[str]]:
+    """Toggle for the unit rate statistics and its break-down dimension (None = no split)."""
+    on = st.toggle(
+        "Unit rate statistics",
+        help="Min / median / P90 / max Unit Rate of the matched descriptions per UOM, "
+             "under the current filters.",
+    )
+    if not on:
+        return False, None
+    breakdown = st.selectbox("Break down by", ["(None)"] + RATE_BREAKDOWNS)
+    return True, None if breakdown == "(None)" else breakdown
+
+
+def render_rate_stats(stats: Optional[pd.DataFrame]):
+    if stats is None:
+        st.info("This database has no rate statistics yet; re-run import_excel.py to build them.")
+    elif stats.empty:
+        st.caption("No unit rates for these results.")
+    else:
+        st.dataframe(stats, hide_index=True, width="stretch")
+
+
+def render_stats_panel(title: str, stats: Dict):
+    """Small sidebar expander with counters (pool / cache sizing)."""
+    with st.sidebar.expander(title, expanded=False):
+        st.json(stats, expanded=True)
+
+
+def render_perf_panel(run: Trace):
+    """Sidebar table of this run's stages (src.trace spans) with their timings and counters."""
+    rows = []
+    for s in run.spans:
+        rows.append({
+            "Stage": "\u2003" * s.depth + s.name,
+            "ms": round(s.ms, 1),
+            "Rows returned": s.counters.get("rows_returned"),
+            "Rows scanned": s.counters.get("rows_scanned"),
+            "VM steps": s.counters.get("vm_steps"),
+            "Cached": s.counters.get("cache_hits"),
+        })
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(f"Run so far: {run.elapsed_ms():,.0f} ms")
+        st.dataframe(pd.DataFrame(rows), hide_index=True, width="stretch")
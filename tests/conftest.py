@@ -0,0 +1,34 @@
+"""
+Shared fixtures: small synthetic databases (benchmarks.synthetic) built
+through the importer's bulk_load, once per test session.
+"""
+import pytest
+
+import import_excel
+from benchmarks.synthetic import merged_chunks
+
+ROWS = 3_000
+SEED = 0
+
+MONTHS = {
+    name: i for i, name in enumerate(
+        ["January", "February", "March", "April", "May", "June", "July",
+         "August", "September", "October", "November", "December"], start=1)
+}
+
+
+def build_db(path: str, schema: str = "wide", index_set: str = "basic") -> str:
+    import_excel.bulk_load(
+        str(path), merged_chunks(ROWS, SEED), import_excel.PhaseTimer(), index_set=index_set, schema=schema,
+    )
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def wide_db(tmp_path_factory) -> str:
+    return build_db(tmp_path_factory.mktemp("wide") / "data.db")
+
+
+@pytest.fixture(scope="session")
+def normalized_db(tmp_path_factory) -> str:
+    return build_db(tmp_path_factory.mktemp("normalized") / "data.db", schema="normalized")
@@ -0,0 +1,25 @@
+import pytest
+
+from api import MODES, decode_cursor, encode_cursor
+from src.db import SEARCH_MODES
+
+NOT_CURSORS = [True, None, "x", {"after": 1}, []]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_decode_cursor_round_trips_page_cursors(mode):
+    after = 200 if mode == "fuzzy" else (-3.25, 42)
+    assert decode_cursor(encode_cursor(after), mode) == after
+
+
+@pytest.mark.parametrize("mode", SEARCH_MODES)
+@pytest.mark.parametrize("after", NOT_CURSORS + [5, [1.5], [1.5, "7"], [1.5, 7.0], [1.5, 7, 9]])
+def test_decode_cursor_rejects_other_shapes(mode, after):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(after), mode)
+
+
+@pytest.mark.parametrize("after", NOT_CURSORS + [-1, 2.0, [1.5, 7]])
+def test_decode_fuzzy_cursor_rejects_other_shapes(after):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(after), "fuzzy")
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+from rapidfuzz import fuzz, process
+
+from src.boq import match_boq, top_matches
+from src.db import read_conn
+from src.fuzzy import normalize_text
+from tests.test_fuzzy import QUERIES
+
+
+@pytest.fixture(scope="module")
+def choices(wide_db) -> np.ndarray:
+    with read_conn(wide_db) as conn:
+        descriptions = pd.read_sql_query('SELECT DISTINCT "Item Description" FROM records', conn)
+    return np.array(
+        sorted({normalize_text(d) for d in descriptions["Item Description"].dropna().astype(str)}),
+        dtype=object,
+    )
+
+
+@pytest.mark.parametrize("min_score", [40, 50, 60, 70, 80, 90, 95, 100])
+def test_top_matches_match_full_scoring(choices, min_score):
+    queries = [normalize_text(q) for q in QUERIES]
+    picked = top_matches(queries, choices, len(choices), min_score, workers=1)
+    scores = process.cdist(queries, choices, scorer=fuzz.token_set_ratio, dtype=np.uint8)
+    for q, hits in enumerate(picked):
+        expected = {int(i): int(s) for i, s in enumerate(scores[q]) if s >= min_score}
+        assert dict(hits) == expected, QUERIES[q]
+    assert top_matches(queries * 2, choices, len(choices), min_score, workers=1) == picked * 2
+
+
+def test_match_boq_prices_every_matched_line(wide_db):
+    lines = pd.DataFrame({"Item Description": ["remove wet drywall", "carpt pad", "zzzz"], "Qty": [10, 5, 1]})
+    priced = match_boq(lines, wide_db, "records", limit=3, min_score=50, workers=1)
+    assert list(priced.columns[:3]) == ["Line", "Item Description", "Qty"]
+    matched = priced.dropna(subset=["Match"])
+    assert set(matched["Line"]) == {1, 2}
+    assert (matched["Score"] >= 50).all()
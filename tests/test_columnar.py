@@ -0,0 +1,47 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src.columnar import ColumnarIndex, fts_words
+from src.db import SEARCH_MODES, build_query_sql, run_facets, run_search
+from tests.conftest import MONTHS
+from tests.test_search import FILTERS
+
+QUERIES = [
+    "drywall", "dryw", "rywall", "x-ray", "wet drywall basement", "ft", "4ft flood", "air mover",
+    "5/8 type", "hourly", "disposal haul", "2024", "a", "%", "", "zzz",
+]
+
+
+@pytest.mark.parametrize("text", [
+    "x-ray", '5/8" type X', "Café CRÈME", "o'brien", "#3 grade", "a_b c", "ÉTÉ", "1/2in",
+    "$100 fee", "2x4", "naïve", "ﬁne", "½ inch", "x×y", "tile+grout", "İstanbul", "straße",
+])
+def test_fts_words_match_fts5_prefix_queries(text):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE VIRTUAL TABLE f USING fts5(d, tokenize='unicode61 remove_diacritics 2')")
+    conn.execute("INSERT INTO f(rowid, d) VALUES (1, ?)", (text,))
+    for term in ["x", "ray", "type", "cafe", "creme", "brien", "grade", "b", "ete", "in", "inch", "100",
+                 "x4", "naive", "fine", "y", "grout", "istanbul", "strasse", "stra", "2in"]:
+        fts = bool(conn.execute("SELECT 1 FROM f WHERE f MATCH ?", (f'"{term}"*',)).fetchall())
+        assert (f" {term}" in fts_words(text)) == fts, (text, term)
+
+
+@pytest.mark.parametrize("mode", SEARCH_MODES)
+@pytest.mark.parametrize("db", ["wide_db", "normalized_db"])
+def test_columnar_matches_sqlite(request, db, mode):
+    db_path = request.getfixturevalue(db)
+    index = ColumnarIndex.load(db_path, "records")
+    for filters in FILTERS:
+        for query in QUERIES:
+            sql, params = build_query_sql(db_path, mode, "records", query, *filters, MONTHS)
+            expected = run_search(db_path, sql, params).sort_values("_rowid", ignore_index=True)
+            positions = index.match(mode, query, *filters, MONTHS)
+            got = index.frame(positions, 0)
+
+            pd.testing.assert_frame_equal(
+                got.drop(columns="_score"), expected.drop(columns="_score"), check_dtype=False,
+                obj=f"{mode} {query!r} {filters}",
+            )
+            assert index.facets(positions) == run_facets(db_path, sql, params), (mode, query, filters)
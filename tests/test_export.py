@@ -0,0 +1,33 @@
+from dataclasses import replace
+
+import pandas as pd
+import pytest
+
+from src import search
+from src.db import SEARCH_MODES
+from src.export import EXPORT_FORMATS, HIDDEN_COLUMNS
+from tests.test_search import backend, make_search  # noqa: F401 (fixture)
+
+READERS = {"CSV": pd.read_csv, "Excel": pd.read_excel, "Parquet": pd.read_parquet}
+NO_FILTERS = ("(All)", "(All)", "(All)", "(All)")
+
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+@pytest.mark.parametrize("mode", SEARCH_MODES + ("fuzzy",))
+@pytest.mark.parametrize("db", ["wide_db", "normalized_db"])
+def test_export_every_result(request, monkeypatch, backend, db, mode, fmt):
+    db_path = request.getfixturevalue(db)
+    # Small chunks, so Parquet writes several row groups
+    monkeypatch.setattr(search, "CONFIG", replace(search.CONFIG, export_chunk_rows=50))
+
+    for query in ["drywall", "dr", "zzzz"]:
+        s = make_search(db_path, mode, query, NO_FILTERS)
+        total, _ = s.summary()
+        page_df, _ = s.page(10**6)
+
+        df = READERS[fmt](s.exporter()(fmt))
+
+        assert len(df) == total, (query, fmt)
+        assert list(df.columns) == ["S. No."] + [c for c in page_df.columns if c not in HIDDEN_COLUMNS]
+        assert df["S. No."].tolist() == list(range(1, total + 1))
+        assert sorted(df["Item Description"].astype(str)) == sorted(page_df["Item Description"].astype(str))
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from rapidfuzz import fuzz, process
+
+from src.db import read_conn
+from src.fuzzy import FuzzyIndex, normalize_text
+from tests.conftest import MONTHS
+
+QUERIES = [
+    "sheetrock", "plumbing fixture", "demoltion of drywal", "carpt", "air mover",
+    "remove wet drywall in basement", "hepa vacum", "x", "baseboard trim paint",
+]
+
+
+def full_scores(db_path: str, query: str, min_score: int, province: str = "(All)"):
+    """{rowid: score} of every row, scored one by one without any prefilter."""
+    with read_conn(db_path) as conn:
+        df = pd.read_sql_query(
+            '''SELECT rowid AS _rowid, "Item Description", "Province" FROM records
+               WHERE "Item Description" IS NOT NULL''',
+            conn,
+        )
+    if province != "(All)":
+        df = df[df["Province"] == province]
+    norm_query = normalize_text(query) or query.strip().lower()
+    choices = [normalize_text(d) for d in df["Item Description"].astype(str)]
+    scores = process.cdist([norm_query], choices, scorer=fuzz.token_set_ratio, dtype=np.uint8)[0]
+    return {int(r): int(s) for r, s in zip(df["_rowid"], scores) if s >= min_score}
+
+
+@pytest.mark.parametrize("min_score", [40, 50, 60, 70, 80, 85, 90, 95, 100])
+@pytest.mark.parametrize("db", ["wide_db", "normalized_db"])
+def test_search_matches_full_scoring(request, db, min_score):
+    db_path = request.getfixturevalue(db)
+    index = FuzzyIndex.load(db_path, "records")
+    for province in ("(All)", "Ontario"):
+        mask = index.filter_mask("(All)", "(All)", province, "(All)", MONTHS)
+        for query in QUERIES:
+            picked = index.search(query, mask, limit=len(index), min_score=min_score)
+            assert dict(picked) == full_scores(db_path, query, min_score, province), (query, province)
+
+
+def test_search_is_best_first_in_rowid_order(wide_db):
+    index = FuzzyIndex.load(wide_db, "records")
+    mask = index.filter_mask("(All)", "(All)", "(All)", "(All)", MONTHS)
+    full = index.search("drywall", mask, limit=len(index), min_score=60)
+    top = index.search("drywall", mask, limit=50, min_score=60)
+    assert top == full[:50]
+    assert full == sorted(full, key=lambda p: (-p[1], p[0]))
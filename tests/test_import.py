@@ -0,0 +1,190 @@
+import itertools
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import import_excel
+from benchmarks.synthetic import write_workbook
+from src.advisor import analyze_workload, generate_workload
+from src.fuzzy import normalize_text
+from src.stats import ROLLUP_DIMS, ROLLUP_LEVELS, load_rate_stats, rate_rollups
+from tests.conftest import build_db
+
+STATS_ORDER = ["desc_key", "uom", "province", "city", "year", "month"]
+
+
+def read_table(db_path: str, sql: str) -> pd.DataFrame:
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn)
+    finally:
+        conn.close()
+
+
+def records(db_path: str) -> pd.DataFrame:
+    return read_table(db_path, "SELECT rowid AS _rowid, * FROM records ORDER BY rowid")
+
+
+def column_types(db_path: str) -> dict:
+    return dict(read_table(db_path, "SELECT name, type FROM pragma_table_info('records')").values)
+
+
+def write_mixed_workbook(path: str, rows: int) -> str:
+    """
+    A workbook whose column types only show late in the sheet: ints that
+    turn to text, numbers and text that start after a run of empty cells,
+    ints next to floats, an empty column.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    details = wb.create_sheet(import_excel.DETAILS_SHEET)
+    details.append(["GNC File", "Province", "City"])
+    for gnc in range(10):
+        details.append([1000 + gnc, "Ontario", f"City {gnc}"])
+
+    compiled = wb.create_sheet(import_excel.COMPILED_SHEET)
+    compiled.append(["Mixed types"])
+    compiled.append([
+        "GNC File", "Item Description", "Invoice Date", "Qty", "UOM", "Unit Rate", "Subtotal",
+        "Days on site", "Comment", "Late number", "Late text", "Empty", "Rate or note",
+    ])
+    late = rows * 2 // 3
+    for i in range(rows):
+        compiled.append([
+            1000 + i % 10,
+            f"Item {i % 37}",
+            datetime(2024, 1 + i % 12, 1) if i % 50 else None,
+            i % 7,
+            ["EA", "SF", "LF"][i % 3],
+            1.25 * (i % 9),
+            None if i % 11 == 0 else 2.5 * i,
+            i % 20 if i < late else "TBD",
+            (0 if i % 3 else None) if i < late else "see notes",
+            None if i < late else i * 0.5,
+            None if i < late else f"note {i}",
+            None,
+            i % 4 + 0.25 if i % 2 else i,
+        ])
+    wb.save(path)
+    return path
+
+
+@pytest.fixture(params=["synthetic", "mixed types"])
+def workbook(request, tmp_path) -> str:
+    path = str(tmp_path / "master.xlsx")
+    if request.param == "synthetic":
+        return write_workbook(path, 500)
+    return write_mixed_workbook(path, 500)
+
+
+def test_import_modes_load_the_same_records(tmp_path, workbook):
+    def load(name: str, frames, **kwargs):
+        db_path = str(tmp_path / f"{name}.db")
+        import_excel.bulk_load(db_path, frames, import_excel.PhaseTimer(), **kwargs)
+        return column_types(db_path), records(db_path)
+
+    pandas_types, pandas_records = load("pandas", iter([import_excel.read_workbook(workbook)]))
+    assert len(pandas_records) == 500
+
+    # Chunks of 97 rows: the late types only show after several chunks
+    snapshot = import_excel.Snapshot(str(tmp_path / "snapshots"), workbook)
+    loaded = {
+        "stream": load("stream", snapshot.write_through(import_excel.iter_workbook_chunks(workbook, chunk_size=97))),
+    }
+    assert snapshot.is_fresh()
+    loaded["snapshot"] = load("snapshot", snapshot.read_frames(), column_types=snapshot.column_types())
+
+    for mode, (types, df) in loaded.items():
+        assert types == pandas_types, mode
+        pd.testing.assert_frame_equal(df, pandas_records, obj=mode)
+
+
+def rate_rows(db_path: str) -> pd.DataFrame:
+    """The rollup input rows, straight from the records table."""
+    rows = read_table(
+        db_path,
+        '''SELECT "Item Description" AS description, "UOM" AS uom, "Province" AS province,
+                  "City" AS city, "Invoice Year" AS year, "Invoice Month Name" AS month,
+                  "Unit Rate" AS rate
+           FROM records WHERE "Unit Rate" IS NOT NULL AND "Item Description" IS NOT NULL''',
+    )
+    rows["desc_key"] = rows.pop("description").astype(str).map(normalize_text)
+    rows["uom"] = rows["uom"].fillna("")
+    rows["year"] = pd.to_numeric(rows["year"], errors="coerce").astype("Int64").astype(str).replace("<NA>", None)
+    return rows[rows["desc_key"] != ""]
+
+
+def test_rate_stats_batches_equal_one_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(import_excel, "RATE_STATS_BATCH_ROWS", 97)
+    db_path = build_db(tmp_path / "data.db")
+
+    expected = rate_rollups(rate_rows(db_path))
+
+    stats = read_table(db_path, "SELECT * FROM records_rate_stats")
+    pd.testing.assert_frame_equal(
+        stats.sort_values(STATS_ORDER, ignore_index=True),
+        expected.sort_values(STATS_ORDER, ignore_index=True),
+        check_dtype=False,
+    )
+
+
+def test_rate_stats_of_every_level(wide_db):
+    every_level = [dims for r in range(len(ROLLUP_DIMS) + 1) for dims in itertools.combinations(ROLLUP_DIMS, r)]
+    assert len(ROLLUP_LEVELS) < len(every_level)
+    rows = rate_rows(wide_db)
+    expected = rate_rollups(rows, every_level)
+    # The most common descriptions and filter values, so every level has rows
+    keys = rows["desc_key"].value_counts().index[:5].tolist()
+    values = dict(zip(ROLLUP_DIMS, rows.groupby(list(ROLLUP_DIMS)).size().idxmax()))
+
+    # Each level as selected filters, and with its last dimension as the break-down
+    for level in every_level:
+        for split in [None, *level[-1:]]:
+            selected = {dim: values[dim] if dim in level and dim != split else "(All)" for dim in ROLLUP_DIMS}
+            want = expected[expected["desc_key"].isin(keys)]
+            for dim in ROLLUP_DIMS:
+                want = want[want[dim] == selected[dim]] if dim != split else want[want[dim] != "(All)"]
+            got = load_rate_stats(wide_db, "records", selected, split, keys)
+            pd.testing.assert_frame_equal(
+                got.sort_values(STATS_ORDER, ignore_index=True),
+                want.sort_values(STATS_ORDER, ignore_index=True),
+                check_dtype=False,
+                obj=f"{level} split by {split}",
+            )
+
+
+def test_recommended_indexes_on_normalized_schema(tmp_path):
+    db_path = build_db(tmp_path / "data.db", schema="normalized", index_set="recommended")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        report = analyze_workload(conn, import_excel.TABLE_NAME, generate_workload(conn, import_excel.TABLE_NAME))
+        built = {
+            name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (import_excel.DATA_TABLE,)
+            )
+        }
+    finally:
+        conn.close()
+
+    assert report["table"] == import_excel.DATA_TABLE
+    assert report["recommended"]
+    assert all(sql.split()[5] in built for sql in report["recommended"])
+    filtered = [q for q in report["queries"] if q["name"].startswith("like page [") and "no filters" not in q["name"]]
+    assert all(q["access"] in ("index", "covering") for q in filtered)
+
+
+def test_normalized_stream_import_keeps_dictionary_ids_unique(tmp_path):
+    excel = write_workbook(str(tmp_path / "master.xlsx"), 500)
+
+    def load(name: str, frames) -> pd.DataFrame:
+        db_path = str(tmp_path / f"{name}.db")
+        import_excel.bulk_load(db_path, frames, import_excel.PhaseTimer(), schema="normalized")
+        return read_table(db_path, "SELECT * FROM records ORDER BY rowid")
+
+    # Each chunk adds values unseen in the earlier ones to the dictionaries
+    stream = load("stream", import_excel.iter_workbook_chunks(excel, chunk_size=97))
+    pd.testing.assert_frame_equal(stream, load("pandas", iter([import_excel.read_workbook(excel)])))
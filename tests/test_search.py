@@ -0,0 +1,97 @@
+from dataclasses import replace
+
+import pytest
+
+from src import search
+from src.config import CONFIG
+from src.db import SEARCH_MODES, build_query_sql, build_search_sql, run_search
+from src.search import Search, is_refinement
+from tests.conftest import MONTHS
+
+QUERIES = ["drywall", "dryw", "x-ray", "paint wall", "remove and dispose carpet", "air mover 4ft", "a"]
+FILTERS = [
+    ("(All)", "(All)", "(All)", "(All)"),
+    ("(All)", "(All)", "Ontario", "(All)"),
+    ("2023", "March", "(All)", "(All)"),
+]
+
+
+# Search-as-you-type sequences: each query refines the previous one in some mode
+TYPING = [
+    ["dr", "dry", "dryw", "drywall", "drywall re", "drywall repair"],
+    ["ai", "air", "air mo", "air mover", "air mover 4", "air mover 4ft"],
+    ["pa", "pai", "paint", "paint wa", "paint wall"],
+    ["ray", "x-ray"],
+    ["car", "carpet", "remove carpet", "remove and dispose carpet"],
+    ["ap", "apa", "apartments"],
+    ["10", "101", "1010"],
+]
+
+
+def rowids(db_path: str, sql_params) -> set:
+    return set(run_search(db_path, *sql_params)["_rowid"])
+
+
+def make_search(db_path: str, mode: str, query: str, filters, within_rowids=None) -> Search:
+    year, month, province, city = filters
+    controls = dict(query=query, mode=mode, year_filter=year, month_filter=month, province=province, city=city)
+    return Search(controls, MONTHS, db_path=db_path, table="records", within_rowids=within_rowids)
+
+
+@pytest.fixture(params=["sqlite", "columnar"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(search, "CONFIG", replace(CONFIG, search_backend=request.param))
+    return request.param
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("db", ["wide_db", "normalized_db"])
+def test_default_mode_keeps_every_like_match(request, db, filters):
+    db_path = request.getfixturevalue(db)
+    for query in QUERIES:
+        like = rowids(db_path, build_search_sql("records", query, *filters, MONTHS))
+        default = rowids(db_path, build_query_sql(db_path, SEARCH_MODES[0], "records", query, *filters, MONTHS))
+        assert like <= default, query
+
+
+@pytest.mark.parametrize("mode", SEARCH_MODES)
+@pytest.mark.parametrize("db", ["wide_db", "normalized_db"])
+def test_pages_cover_every_match_once(request, backend, db, mode):
+    db_path = request.getfixturevalue(db)
+    for filters in FILTERS:
+        for query in QUERIES:
+            s = make_search(db_path, mode, query, filters)
+            total, _ = s.summary()
+            seen, after = [], None
+            while True:
+                page_df, after = s.page(37, after)
+                seen += page_df["_rowid"].tolist()
+                if after is None:
+                    break
+            expected = rowids(db_path, build_query_sql(db_path, mode, "records", query, *filters, MONTHS))
+            assert len(seen) == len(set(seen)) == total, (query, filters)
+            assert set(seen) == expected, (query, filters)
+
+
+@pytest.mark.parametrize("mode", SEARCH_MODES)
+@pytest.mark.parametrize("db", ["wide_db", "normalized_db"])
+def test_refinement_within_previous_matches_equals_full_search(request, backend, db, mode):
+    db_path = request.getfixturevalue(db)
+    refined = 0
+    for filters in FILTERS:
+        for typing in TYPING:
+            for previous, query in zip(typing, typing[1:]):
+                if not is_refinement(mode, previous, query):
+                    continue
+                before = make_search(db_path, mode, previous, filters)
+                within = before.matched_rowids(before.summary()[0], limit=10**9)
+                full = make_search(db_path, mode, query, filters)
+                narrowed = make_search(db_path, mode, query, filters, within_rowids=within)
+                # Each its own cache entry, the same key would serve the full search's results
+                narrowed.key += ("within",)
+
+                total = full.summary()[0]
+                assert narrowed.summary() == full.summary(), (previous, query, filters)
+                assert set(narrowed.matched_rowids(total, 10**9)) == set(full.matched_rowids(total, 10**9))
+                refined += 1
+    assert refined